@@ -0,0 +1,558 @@
+"""
+回测引擎 - 用本地历史K线回放实盘决策流程
+技术指标对全部历史一次性向量化计算（indicators.calculate_indicators_batch），
+逐根K线调用实盘同一套函数：identify_market_state、validate_ai_signal、
+apply_dynamic_tp_sl（calculate_dynamic_tp_sl）、calculate_intelligent_position，
+并模拟K线内止盈止损触发、手续费和资金费。
+
+    python backtest.py data/btc_1h.csv --source rule
+
+信号来源可替换：
+    RuleSignalSource      按提示词中的决策规则生成信号（不调用AI）
+    RecordedSignalSource  回放记录的AI回复
+    StubSignalSource      固定信号（调试用）
+
+时间约定：第j根K线收盘时决策（指标含该K线），以收盘价成交，
+止盈止损从第j+1根K线开始按最高/最低价判断，同一根K线内同时触及时按先止损处理。
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import deepseekok2 as bot
+from indicators import calculate_indicators_batch
+from market_data import load_ohlcv_file
+from market_snapshot import MarketSnapshot
+from performance import PerformanceAggregate
+
+INITIAL_BALANCE = 10000.0  # 初始资金（USDT）
+TAKER_FEE_RATE = 0.0005  # OKX永续合约吃单手续费率
+FUNDING_RATE = 0.0001  # K线文件没有funding_rate列时使用的资金费率（每8小时）
+FUNDING_INTERVAL_MS = 8 * 3600 * 1000  # 资金费结算间隔（UTC 0/8/16点）
+WARMUP_BARS = 50  # 指标预热K线数（sma_50），之前不交易
+CONTRACT_SIZE = 0.01  # 合约乘数（setup_exchange从交易所读取，回测时没有则使用该值）
+MIN_AMOUNT = 0.01  # 最小下单张数
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 读取本地K线文件（CSV/JSON/JSONL）
+load_candles = load_ohlcv_file
+
+
+def compute_indicators(candles: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """一次向量化计算全部历史的技术指标（与实盘增量引擎的指标列相同）"""
+    batch = calculate_indicators_batch(
+        candles['high'][None, :], candles['low'][None, :],
+        candles['close'][None, :], candles['volume'][None, :]
+    )
+    return {key: values[0] for key, values in batch.items()}
+
+
+@contextlib.contextmanager
+def trade_config(overrides: Optional[Dict] = None):
+    """
+    临时修改deepseekok2.TRADE_CONFIG（嵌套字典按键合并），退出时恢复
+
+    参数:
+        overrides: 如 {'position_management': {'max_position_ratio': 10}}
+    """
+    saved = copy.deepcopy(bot.TRADE_CONFIG)
+    try:
+        bot.TRADE_CONFIG.setdefault('contract_size', CONTRACT_SIZE)
+        bot.TRADE_CONFIG.setdefault('min_amount', MIN_AMOUNT)
+        for key, value in (overrides or {}).items():
+            if isinstance(value, dict) and isinstance(bot.TRADE_CONFIG.get(key), dict):
+                bot.TRADE_CONFIG[key].update(value)
+            else:
+                bot.TRADE_CONFIG[key] = value
+        yield bot.TRADE_CONFIG
+    finally:
+        bot.TRADE_CONFIG.clear()
+        bot.TRADE_CONFIG.update(saved)
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽实盘函数的打印输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# ----------------------------------------------------------------------
+# 信号来源：source(price_data, market_state, position) -> 原始信号dict，
+# 返回None表示该K线不决策（如没有记录）
+# ----------------------------------------------------------------------
+class RuleSignalSource:
+    """按提示词中的决策规则生成信号：强趋势跟随，震荡观望（不调用AI）"""
+
+    def __call__(self, price_data: Dict, market_state: Dict, position: Optional[Dict]) -> Dict:
+        trend = price_data['trend_analysis']
+        if trend.get('overall') == '强势上涨' and trend.get('macd') == 'bullish':
+            signal = 'BUY'
+        elif trend.get('overall') == '强势下跌' and trend.get('macd') == 'bearish':
+            signal = 'SELL'
+        else:
+            signal = 'HOLD'
+
+        # 均线排列与信号同向时为高信心
+        aligned = {'BUY': '强上涨', 'SELL': '强下跌'}.get(signal) == market_state.get('trend_strength')
+        confidence = 'HIGH' if aligned else 'MEDIUM'
+
+        # 观望时按持仓方向给出止盈止损
+        side = signal
+        if signal == 'HOLD' and position:
+            side = 'BUY' if position['side'] == 'long' else 'SELL'
+        tp_sl = bot.calculate_dynamic_tp_sl(side, price_data['price'], market_state, position)
+
+        return {
+            'signal': signal,
+            'reason': f"规则信号: {trend.get('overall')} MACD{trend.get('macd')}",
+            'stop_loss': tp_sl['stop_loss'],
+            'take_profit': tp_sl['take_profit'],
+            'confidence': confidence
+        }
+
+
+class RecordedSignalSource:
+    """
+    回放记录的AI回复：交易周期时间落在某根K线收盘后一个周期内时使用该记录
+
+    记录格式: {'timestamp': 毫秒或UTC时间字符串, 'response': AI原始回复}，
+    或直接包含signal/reason/stop_loss/take_profit/confidence字段
+    """
+
+    def __init__(self, records: List[Dict], timeframe_ms: int):
+        self.timeframe_ms = timeframe_ms
+        parsed = []
+        for record in records:
+            timestamp = record['timestamp']
+            if not isinstance(timestamp, (int, float)):
+                timestamp = pd.Timestamp(timestamp).value // 1_000_000
+            parsed.append((int(timestamp), record))
+        parsed.sort(key=lambda item: item[0])
+        self.times = np.array([item[0] for item in parsed], dtype=np.int64)
+        self.records = [item[1] for item in parsed]
+
+    @classmethod
+    def from_file(cls, path: str, timeframe_ms: int) -> 'RecordedSignalSource':
+        """读取JSON数组或JSONL文件"""
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                records = [json.loads(line) for line in f if line.strip()]
+            else:
+                records = json.load(f)
+        return cls(records, timeframe_ms)
+
+    def __call__(self, price_data: Dict, market_state: Dict, position: Optional[Dict]) -> Optional[Dict]:
+        close_time = price_data['close_time']
+        index = int(np.searchsorted(self.times, close_time, side='left'))
+        if index >= len(self.times) or self.times[index] >= close_time + self.timeframe_ms:
+            return None
+
+        record = self.records[index]
+        if 'response' in record:
+            signal_data = bot.parse_signal_response(record['response'])
+            return signal_data if signal_data is not None else bot.create_fallback_signal(price_data)
+        return {key: value for key, value in record.items() if key != 'timestamp'}
+
+
+class StubSignalSource:
+    """固定信号：signals为单个信号dict，或按K线依次循环使用的信号列表"""
+
+    def __init__(self, signals):
+        self.signals = [signals] if isinstance(signals, dict) else list(signals)
+        self.calls = 0
+
+    def __call__(self, price_data: Dict, market_state: Dict, position: Optional[Dict]) -> Dict:
+        signal_data = dict(self.signals[self.calls % len(self.signals)])
+        self.calls += 1
+        signal_data.setdefault('reason', '固定信号')
+        signal_data.setdefault('confidence', 'MEDIUM')
+        signal_data.setdefault('stop_loss', 0)
+        signal_data.setdefault('take_profit', 0)
+        return signal_data
+
+
+# ----------------------------------------------------------------------
+# 回测
+# ----------------------------------------------------------------------
+@dataclass
+class BacktestResult:
+    """回测结果：summary为汇总统计，equity为每根K线收盘时的权益"""
+    summary: Dict
+    timestamps: np.ndarray
+    equity: np.ndarray
+    trades: List[Dict] = field(default_factory=list)
+
+
+class _Account:
+    """模拟全仓账户：单向持仓，条件单为止盈止损各一张（对应OKX条件单）"""
+
+    def __init__(self, balance: float, fee_rate: float, slippage: float, contract_size: float, leverage: float):
+        self.balance = balance  # 已实现余额（含手续费和资金费）
+        self.fee_rate = fee_rate
+        self.slippage = slippage
+        self.contract_size = contract_size
+        self.leverage = leverage
+
+        self.side = None
+        self.size = 0.0
+        self.entry_price = 0.0
+        self.entry_fees = 0.0  # 当前持仓开仓手续费（平仓时按比例计入交易盈亏）
+        self.stop_loss = None
+        self.take_profit = None
+
+        self.fees = 0.0
+        self.funding = 0.0
+        self.trades = []
+        self.performance = PerformanceAggregate()
+
+    def direction(self) -> int:
+        return 1 if self.side == 'long' else -1
+
+    def unrealized_pnl(self, price: float) -> float:
+        if self.side is None:
+            return 0.0
+        return self.direction() * (price - self.entry_price) * self.size * self.contract_size
+
+    def equity(self, price: float) -> float:
+        return self.balance + self.unrealized_pnl(price)
+
+    def free_balance(self, price: float) -> float:
+        margin = self.entry_price * self.size * self.contract_size / self.leverage if self.side else 0.0
+        return self.equity(price) - margin
+
+    def position(self, price: float) -> Optional[Dict]:
+        """与fetch_current_position相同格式的持仓"""
+        if self.side is None:
+            return None
+        return {
+            'side': self.side,
+            'size': self.size,
+            'entry_price': self.entry_price,
+            'unrealized_pnl': self.unrealized_pnl(price),
+            'leverage': self.leverage,
+            'symbol': bot.TRADE_CONFIG['symbol']
+        }
+
+    def _fill_price(self, price: float, side: str) -> float:
+        """市价单成交价（按滑点向不利方向调整）"""
+        return price * (1 + self.slippage) if side == 'buy' else price * (1 - self.slippage)
+
+    def _charge_fee(self, price: float, size: float) -> float:
+        fee = price * size * self.contract_size * self.fee_rate
+        self.balance -= fee
+        self.fees += fee
+        return fee
+
+    def open(self, side: str, size: float, price: float, timestamp: str, signal_data: Dict):
+        """开仓或同方向加仓（持仓均价加权）"""
+        fill = self._fill_price(price, 'buy' if side == 'long' else 'sell')
+        fee = self._charge_fee(fill, size)
+        if self.side == side:
+            self.entry_price = (self.entry_price * self.size + fill * size) / (self.size + size)
+            self.size = round(self.size + size, 8)
+        else:
+            self.side, self.size, self.entry_price = side, size, fill
+        self.entry_fees += fee
+        self.trades.append({
+            'timestamp': timestamp, 'signal': signal_data['signal'], 'price': fill, 'amount': size,
+            'confidence': signal_data['confidence'], 'reason': signal_data['reason'], 'type': 'open', 'pnl': 0
+        })
+
+    def close(self, size: float, price: float, timestamp: str, kind: str, signal_data: Optional[Dict] = None):
+        """平仓或减仓，kind为close/reduce/stop_loss/take_profit"""
+        size = min(size, self.size)
+        fill = self._fill_price(price, 'sell' if self.side == 'long' else 'buy')
+        fee = self._charge_fee(fill, size)
+        share = size / self.size
+        entry_fee = self.entry_fees * share
+        gross = self.direction() * (fill - self.entry_price) * size * self.contract_size
+        self.balance += gross
+        self.entry_fees -= entry_fee
+
+        trade = {
+            'timestamp': timestamp,
+            'signal': signal_data['signal'] if signal_data else ('SELL' if self.side == 'long' else 'BUY'),
+            'price': fill,
+            'amount': size,
+            'confidence': signal_data['confidence'] if signal_data else None,
+            'reason': signal_data['reason'] if signal_data else kind,
+            'type': kind,
+            'pnl': gross - fee - entry_fee
+        }
+        self.trades.append(trade)
+        self.performance.add(trade)
+
+        self.size = round(self.size - size, 8)
+        if self.size <= 0:
+            self.side, self.size, self.entry_price, self.entry_fees = None, 0.0, 0.0, 0.0
+            self.stop_loss = self.take_profit = None
+
+    def apply_funding(self, price: float, rate: float):
+        """资金费：费率为正时多头支付空头"""
+        if self.side is None or not rate:
+            return
+        payment = self.direction() * price * self.size * self.contract_size * rate
+        self.balance -= payment
+        self.funding += payment
+
+    def check_stops(self, open_: float, high: float, low: float, timestamp: str):
+        """K线内止盈止损：开盘跳空越过触发价按开盘价成交，同时触及时先止损"""
+        if self.side is None:
+            return
+        sl, tp = self.stop_loss, self.take_profit
+        if self.side == 'long':
+            sl_hit = sl is not None and low <= sl
+            tp_hit = tp is not None and high >= tp
+            gap_sl = sl is not None and open_ <= sl
+            gap_tp = tp is not None and open_ >= tp
+        else:
+            sl_hit = sl is not None and high >= sl
+            tp_hit = tp is not None and low <= tp
+            gap_sl = sl is not None and open_ >= sl
+            gap_tp = tp is not None and open_ <= tp
+
+        if gap_sl or gap_tp:
+            self.close(self.size, open_, timestamp, 'stop_loss' if gap_sl else 'take_profit')
+        elif sl_hit:
+            self.close(self.size, sl, timestamp, 'stop_loss')
+        elif tp_hit:
+            self.close(self.size, tp, timestamp, 'take_profit')
+
+
+class Backtester:
+    """
+    回测器：构造时一次性计算指标和每根K线的行情数据，run()可用不同配置重复执行
+
+    参数:
+        candles: load_candles返回的K线数组
+        warmup: 预热K线数，之前只计算指标不交易
+    """
+
+    def __init__(self, candles: Dict[str, np.ndarray], warmup: int = WARMUP_BARS):
+        self.candles = candles
+        self.warmup = warmup
+        self.timeframe_ms = int(np.median(np.diff(candles['timestamp']))) if len(candles['timestamp']) > 1 else 0
+        self.indicators = compute_indicators(candles)
+
+        close_times = candles['timestamp'] + self.timeframe_ms
+        self.close_time_text = pd.to_datetime(close_times, unit='ms').strftime(TIME_FORMAT).tolist()
+        self.bar_time_text = pd.to_datetime(candles['timestamp'], unit='ms').strftime(TIME_FORMAT).tolist()
+        self.funding_due = candles['timestamp'] % FUNDING_INTERVAL_MS == 0
+        self.bars = self._build_bars(close_times)
+
+    def _build_bars(self, close_times: np.ndarray) -> List[Optional[Dict]]:
+        """每根K线收盘时的price_data和market_state（与get_btc_ohlcv_enhanced格式相同）"""
+        keys = list(self.indicators)
+        rows = zip(*[self.indicators[key].tolist() for key in keys])
+        closes = self.candles['close'].tolist()
+        highs = self.candles['high'].tolist()
+        lows = self.candles['low'].tolist()
+        volumes = self.candles['volume'].tolist()
+        timeframe = bot.TRADE_CONFIG['timeframe']
+
+        bars = []
+        with quiet():
+            for i, row in enumerate(rows):
+                if i < self.warmup or i == 0:
+                    bars.append(None)
+                    continue
+                latest = dict(zip(keys, row))
+                price_data = {
+                    'price': closes[i],
+                    'timestamp': self.close_time_text[i],
+                    'close_time': int(close_times[i]),
+                    'high': highs[i],
+                    'low': lows[i],
+                    'volume': volumes[i],
+                    'timeframe': timeframe,
+                    'price_change': (closes[i] - closes[i - 1]) / closes[i - 1] * 100,
+                    'technical_data': bot.build_technical_data(latest),
+                    'trend_analysis': bot.get_market_trend(None, latest),
+                    'levels_analysis': bot.get_support_resistance_levels(None, latest=latest),
+                    'indicators': latest
+                }
+                market_state = bot.identify_market_state(price_data, price_data['technical_data'])
+                bars.append((price_data, market_state))
+        return bars
+
+    def run(self, signal_source: Callable, initial_balance: float = INITIAL_BALANCE,
+            fee_rate: float = TAKER_FEE_RATE, funding_rate: float = FUNDING_RATE,
+            slippage: float = 0.0, config: Optional[Dict] = None, verbose: bool = False) -> BacktestResult:
+        """
+        执行回测
+
+        参数:
+            signal_source: 信号来源，见RuleSignalSource
+            fee_rate: 手续费率（开平仓均按吃单计算）
+            funding_rate: K线文件没有funding_rate列时每8小时的资金费率
+            slippage: 市价单和止盈止损成交的滑点比例
+            config: 覆盖TRADE_CONFIG的参数，见trade_config
+            verbose: 输出实盘函数的打印信息
+
+        返回:
+            BacktestResult
+        """
+        started = time.perf_counter()
+        candles = self.candles
+        opens, highs, lows, closes = (candles[key].tolist() for key in ('open', 'high', 'low', 'close'))
+        funding_rates = candles['funding_rate'].tolist() if 'funding_rate' in candles else None
+        funding_due = self.funding_due.tolist()
+        equity = np.empty(len(closes))
+
+        output = contextlib.nullcontext() if verbose else quiet()
+        saved_snapshot = bot.cycle_snapshot
+        with trade_config(config) as trade_cfg, output:
+            account = _Account(initial_balance, fee_rate, slippage,
+                               trade_cfg['contract_size'], trade_cfg['leverage'])
+            try:
+                for i in range(len(closes)):
+                    if i > 0:
+                        if funding_due[i]:
+                            account.apply_funding(opens[i], funding_rates[i] if funding_rates else funding_rate)
+                        account.check_stops(opens[i], highs[i], lows[i], self.bar_time_text[i])
+
+                    bar = self.bars[i]
+                    if bar is not None:
+                        self._decide(account, signal_source, *bar)
+                    equity[i] = account.equity(closes[i])
+            finally:
+                bot.cycle_snapshot = saved_snapshot
+
+        return BacktestResult(
+            summary=self._summarize(account, equity, initial_balance, time.perf_counter() - started),
+            timestamps=candles['timestamp'],
+            equity=equity,
+            trades=account.trades
+        )
+
+    def _decide(self, account: _Account, signal_source: Callable, price_data: Dict, market_state: Dict):
+        """K线收盘决策：信号校验同analyze_with_deepseek，下单同execute_intelligent_trade"""
+        price = price_data['price']
+        current_position = account.position(price)
+
+        signal_data = signal_source(price_data, market_state, current_position)
+        if signal_data is None:
+            return
+        signal_data = bot.validate_ai_signal(signal_data, price_data, price_data['technical_data'])
+        signal_data = bot.apply_dynamic_tp_sl(signal_data, price_data, market_state, current_position)
+
+        # 低信心信号不执行
+        if signal_data['confidence'] == 'LOW':
+            return
+
+        timestamp = price_data['timestamp']
+        signal = signal_data['signal']
+        if signal == 'HOLD':
+            # 有持仓时更新与信号不一致的止盈止损（check_existing_tp_sl_orders允许1美元误差）
+            stop_loss, take_profit = signal_data.get('stop_loss'), signal_data.get('take_profit')
+            if account.side and stop_loss and take_profit:
+                if (account.stop_loss is None or abs(account.stop_loss - stop_loss) >= 1
+                        or account.take_profit is None or abs(account.take_profit - take_profit) >= 1):
+                    account.stop_loss, account.take_profit = stop_loss, take_profit
+            return
+
+        # 余额通过周期快照提供给calculate_intelligent_position
+        balance = {'USDT': {'free': account.free_balance(price), 'total': account.equity(price)}}
+        bot.cycle_snapshot = MarketSnapshot(balance=balance, position=current_position)
+        position_size = bot.calculate_intelligent_position(signal_data, price_data, current_position)
+
+        side = 'long' if signal == 'BUY' else 'short'
+        if account.side and account.side != side:
+            account.close(account.size, price, timestamp, 'close', signal_data)
+            account.open(side, position_size, price, timestamp, signal_data)
+        elif account.side == side:
+            size_diff = position_size - account.size
+            if abs(size_diff) >= 0.01:
+                if size_diff > 0:
+                    account.open(side, round(size_diff, 2), price, timestamp, signal_data)
+                else:
+                    account.close(round(abs(size_diff), 2), price, timestamp, 'reduce', signal_data)
+        else:
+            account.open(side, position_size, price, timestamp, signal_data)
+
+        # 交易后强制更新止盈止损
+        if account.side:
+            account.stop_loss = signal_data.get('stop_loss') or None
+            account.take_profit = signal_data.get('take_profit') or None
+
+    def _summarize(self, account: _Account, equity: np.ndarray, initial_balance: float, elapsed: float) -> Dict:
+        peak = np.maximum.accumulate(equity) if len(equity) else equity
+        drawdown = (peak - equity) / peak if len(equity) else equity
+        final_equity = float(equity[-1]) if len(equity) else initial_balance
+
+        summary = account.performance.summary()
+        summary.update({
+            'bars': len(equity),
+            'start': self.bar_time_text[0] if self.bar_time_text else None,
+            'end': self.close_time_text[-1] if self.close_time_text else None,
+            'initial_balance': initial_balance,
+            'final_equity': final_equity,
+            'total_return_pct': (final_equity / initial_balance - 1) * 100,
+            'max_drawdown_pct': float(drawdown.max()) * 100 if len(equity) else 0.0,
+            'fees': account.fees,
+            'funding': account.funding,
+            'orders': len(account.trades),
+            'open_position': account.side,
+            'elapsed_seconds': round(elapsed, 4)
+        })
+        return summary
+
+
+def run_backtest(path: str, signal_source: Callable = None, **kwargs) -> BacktestResult:
+    """读取K线文件并回测（默认使用规则信号）"""
+    backtester = Backtester(load_candles(path))
+    return backtester.run(signal_source or RuleSignalSource(), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用本地历史K线回测交易规则')
+    parser.add_argument('candles', help='K线文件（CSV/JSON/JSONL）')
+    parser.add_argument('--source', choices=['rule', 'recorded', 'stub'], default='rule', help='信号来源')
+    parser.add_argument('--records', help='recorded信号来源的AI回复记录文件（JSON/JSONL）')
+    parser.add_argument('--stub-signal', default='HOLD', choices=['BUY', 'SELL', 'HOLD'], help='stub信号来源的固定信号')
+    parser.add_argument('--balance', type=float, default=INITIAL_BALANCE, help='初始资金（USDT）')
+    parser.add_argument('--fee', type=float, default=TAKER_FEE_RATE, help='手续费率')
+    parser.add_argument('--funding', type=float, default=FUNDING_RATE, help='每8小时资金费率')
+    parser.add_argument('--slippage', type=float, default=0.0, help='滑点比例')
+    parser.add_argument('--trades', help='把成交记录写入该JSON文件')
+    parser.add_argument('--verbose', action='store_true', help='输出实盘函数的打印信息')
+    args = parser.parse_args()
+
+    loading_started = time.perf_counter()
+    backtester = Backtester(load_candles(args.candles))
+    prepare_seconds = time.perf_counter() - loading_started
+
+    if args.source == 'recorded':
+        if not args.records:
+            parser.error('--source recorded 需要 --records')
+        source = RecordedSignalSource.from_file(args.records, backtester.timeframe_ms)
+    elif args.source == 'stub':
+        source = StubSignalSource({'signal': args.stub_signal})
+    else:
+        source = RuleSignalSource()
+
+    result = backtester.run(source, initial_balance=args.balance, fee_rate=args.fee,
+                            funding_rate=args.funding, slippage=args.slippage, verbose=args.verbose)
+
+    print(f"📊 回测结果（K线读取和指标计算 {prepare_seconds:.3f}秒）")
+    for key, value in result.summary.items():
+        print(f"   {key}: {value:.4f}" if isinstance(value, float) else f"   {key}: {value}")
+
+    if args.trades:
+        with open(args.trades, 'w', encoding='utf-8') as f:
+            json.dump(result.trades, f, ensure_ascii=False, indent=2)
+        print(f"✅ 成交记录已写入 {args.trades}")
+
+
+if __name__ == '__main__':
+    main()
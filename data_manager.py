@@ -1,67 +1,310 @@
 """
 数据管理模块 - 用于在交易程序和Web界面之间共享数据
 """
+import copy
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
-DATA_FILE = "trading_data.json"
+from dotenv import load_dotenv
+
+from equity_rollup import RAW_RETENTION, TIERS, EquityRollup, choose_resolution, closed_bars, merge_series
+from journal import Journal, JournalReader, migrate_json_array
+from performance import PerformanceAggregate
+from status_channel import StatusChannel, default_channel_path
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，只做进程内加锁
+    fcntl = None
+
+load_dotenv()
+
+# 系统状态放在data目录下（Docker中挂载的是目录，单文件挂载无法原子替换）
+DATA_FILE = os.path.join("data", "trading_data.json")
+DATA_LOCK_FILE = DATA_FILE + ".lock"  # 写入trading_data.json的进程间咨询锁
+LEGACY_DATA_FILE = "trading_data.json"  # 旧版位置，data目录下尚无文件时读取
+
+# 交易记录和权益快照使用追加写的JSONL日志（data目录在Docker中已挂载）
+TRADES_JOURNAL_FILE = os.path.join("data", "trades_history.jsonl")
+EQUITY_JOURNAL_FILE = os.path.join("data", "equity_history.jsonl")
+EQUITY_HISTORY_LIMIT = 1000  # load_equity_history默认返回的原始快照条数
+
+# 权益K线日志：原始快照保留48小时，更早的历史保存在小时/日K线中（交易记录全部保留）
+EQUITY_BAR_FILES = {tier: os.path.join("data", f"equity_{tier}.jsonl") for tier in TIERS}
+
+# 旧版JSON数组文件，首次写入日志时自动迁移
 TRADES_FILE = "trades_history.json"
 EQUITY_HISTORY_FILE = "equity_history.json"
 
+# 存储后端：json（默认，JSON + JSONL日志）或 sqlite（WAL模式，支持按时间范围查询）
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+SQLITE_FILE = os.getenv('SQLITE_FILE', os.path.join("data", "trading.db"))
+
+# 共享内存状态通道（Web界面读取最新状态不经过磁盘和JSON文件）
+STATUS_CHANNEL_FILE = os.getenv('STATUS_CHANNEL_FILE') or default_channel_path()
+
+# 累计绩效（每条交易记录O(1)更新）
+PERFORMANCE_FILE = os.path.join("data", "performance.json")
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 写入端日志（只在交易程序中首次写入时打开），读取端增量读取器
+_journals = {}
+_readers = {}
+_sqlite_store = None
+_performance = None
+_equity_rollup = None
+
+# trading_data.json写锁和读取缓存（文件未变化时不重新解析）
+_data_thread_lock = threading.RLock()
+_data_lock_depth = 0
+_data_cache = {'signature': None, 'data': None}
+
+# 状态通道：写入端（交易程序）和读取端（Web界面）
+_status_writer = None
+_status_reader = None
+
+def _get_journal(path: str, legacy_path: Optional[str] = None, max_records: Optional[int] = None) -> Journal:
+    """获取写入端日志，首次打开时迁移旧版JSON文件"""
+    journal = _journals.get(path)
+    if journal is None:
+        journal = Journal(path, max_records=max_records)
+        if legacy_path is not None:
+            migrate_json_array(legacy_path, journal)
+        _journals[path] = journal
+    return journal
+
+def _read_journal(path: str, legacy_path: Optional[str] = None) -> List[Dict]:
+    """增量读取日志（只解析新增行）；日志尚未生成时读取旧版JSON文件"""
+    if not os.path.exists(path) and legacy_path is not None and os.path.exists(legacy_path):
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    reader = _readers.get(path)
+    if reader is None:
+        reader = _readers[path] = JournalReader(path)
+    return list(reader.read())
+
+def _get_sqlite_store():
+    """SQLite后端（STORAGE_BACKEND=sqlite时启用），首次打开时导入已有的JSON/JSONL数据"""
+    global _sqlite_store
+    if STORAGE_BACKEND != 'sqlite':
+        return None
+    if _sqlite_store is None:
+        from sqlite_store import SQLiteStore
+
+        directory = os.path.dirname(SQLITE_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        store = SQLiteStore(SQLITE_FILE)
+        store.import_if_empty(
+            _read_journal(TRADES_JOURNAL_FILE, TRADES_FILE),
+            _read_journal(EQUITY_JOURNAL_FILE, EQUITY_HISTORY_FILE),
+            _load_trading_data_file(),
+            {tier: _read_journal(path) for tier, path in EQUITY_BAR_FILES.items()}
+        )
+        _sqlite_store = store
+    return _sqlite_store
+
+def _format_time(value: Union[str, datetime, None]) -> Optional[str]:
+    """时间参数统一为 'YYYY-MM-DD HH:MM:SS' 字符串（与记录中的格式一致，可直接比较）"""
+    if isinstance(value, datetime):
+        return value.strftime(TIME_FORMAT)
+    return value
+
+def _filter_records(records: List[Dict], since=None, until=None, signal: str = None,
+                    limit: int = None, offset: int = None) -> List[Dict]:
+    """JSON后端的范围过滤"""
+    since, until = _format_time(since), _format_time(until)
+    if since is not None or until is not None or signal is not None:
+        records = [
+            r for r in records
+            if (since is None or r.get('timestamp', '') >= since)
+            and (until is None or r.get('timestamp', '') <= until)
+            and (signal is None or r.get('signal') == signal)
+        ]
+    if offset:
+        records = records[:-offset]
+    if limit is not None:
+        records = records[-limit:] if limit > 0 else []
+    return records
+
+@contextmanager
+def _trading_data_lock():
+    """trading_data.json写锁：进程内线程锁 + 进程间fcntl咨询锁（可重入）"""
+    global _data_lock_depth
+    with _data_thread_lock:
+        if _data_lock_depth > 0 or fcntl is None:
+            _data_lock_depth += 1
+            try:
+                yield
+            finally:
+                _data_lock_depth -= 1
+            return
+
+        os.makedirs(os.path.dirname(DATA_LOCK_FILE), exist_ok=True)
+        with open(DATA_LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            _data_lock_depth += 1
+            try:
+                yield
+            finally:
+                _data_lock_depth -= 1
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _load_trading_data_file() -> Optional[Dict]:
+    """读取trading_data.json；文件（inode/修改时间/大小）未变化时直接返回缓存"""
+    try:
+        f = open(DATA_FILE, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        try:
+            f = open(LEGACY_DATA_FILE, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+    with f:
+        stat = os.fstat(f.fileno())
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if _data_cache['signature'] != signature:
+            _data_cache['data'] = json.load(f)
+            _data_cache['signature'] = signature
+    # 调用方会修改返回的数据，返回副本
+    return copy.deepcopy(_data_cache['data'])
+
+def _write_trading_data_file(data: Dict):
+    """写入临时文件后原子替换，读取端不会读到写了一半的文件；每次写入版本号+1"""
+    with _trading_data_lock():
+        current = _load_trading_data_file()
+        data['version'] = (current or {}).get('version', 0) + 1
+
+        tmp_path = f"{DATA_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, DATA_FILE)
+
 def save_trading_data(data: Dict):
     """保存交易数据"""
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        store = _get_sqlite_store()
+        if store is not None:
+            store.save_trading_data(data)
+            return
+
+        _write_trading_data_file(data)
     except Exception as e:
         print(f"保存交易数据失败: {e}")
 
 def load_trading_data() -> Optional[Dict]:
     """加载交易数据"""
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        store = _get_sqlite_store()
+        if store is not None:
+            return store.load_trading_data()
+        return _load_trading_data_file()
     except Exception as e:
         print(f"加载交易数据失败: {e}")
         return None
 
 def save_trade_record(trade: Dict):
-    """保存交易记录"""
+    """保存交易记录（追加写，保留全部历史），并增量更新累计绩效"""
     try:
-        # 加载现有记录
-        trades = []
-        if os.path.exists(TRADES_FILE):
-            with open(TRADES_FILE, 'r', encoding='utf-8') as f:
-                trades = json.load(f)
-        
-        # 添加新记录
-        trades.append(trade)
-        
-        # 只保留最近500条记录
-        if len(trades) > 500:
-            trades = trades[-500:]
-        
-        # 保存
-        with open(TRADES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(trades, f, ensure_ascii=False, indent=2)
+        store = _get_sqlite_store()
+        if store is not None:
+            store.save_trade(trade)
+            trade_count = store.count_trades()
+        else:
+            journal = _get_journal(TRADES_JOURNAL_FILE, TRADES_FILE)
+            journal.append(trade)
+            trade_count = journal.count
     except Exception as e:
         print(f"保存交易记录失败: {e}")
+        return
 
-def load_trades_history() -> List[Dict]:
-    """加载交易历史"""
     try:
-        if os.path.exists(TRADES_FILE):
-            with open(TRADES_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        performance = _get_performance()
+        # 先比较条数再累加：首次使用时从历史重建的结果已包含本条记录
+        if performance.total_trades == trade_count - 1:
+            performance.add(trade)
+            performance.save(PERFORMANCE_FILE)
+        elif performance.total_trades != trade_count:
+            # 与交易记录条数不一致（如上次保存中途退出）时从完整历史重建
+            rebuild_performance()
+    except Exception as e:
+        print(f"更新绩效统计失败: {e}")
+
+def load_trades_history(since: Union[str, datetime, None] = None,
+                        until: Union[str, datetime, None] = None,
+                        signal: Optional[str] = None,
+                        limit: Optional[int] = None,
+                        offset: Optional[int] = None) -> List[Dict]:
+    """
+    加载交易历史
+
+    参数:
+        since/until: 时间范围（含边界），字符串 'YYYY-MM-DD HH:MM:SS' 或 datetime
+        signal: 只返回指定信号（BUY/SELL/HOLD）
+        limit: 只返回最近的N条
+        offset: 跳过最近的N条（与limit配合分页，SQLite后端在查询中完成）
+    """
+    try:
+        store = _get_sqlite_store()
+        if store is not None:
+            return store.load_trades(_format_time(since), _format_time(until), signal, limit, offset)
+
+        trades = _read_journal(TRADES_JOURNAL_FILE, TRADES_FILE)
+        return _filter_records(trades, since, until, signal, limit, offset)
     except Exception as e:
         print(f"加载交易历史失败: {e}")
         return []
 
+def count_trades_history(since: Union[str, datetime, None] = None,
+                         until: Union[str, datetime, None] = None,
+                         signal: Optional[str] = None) -> int:
+    """统计交易记录条数（参数同load_trades_history）"""
+    try:
+        store = _get_sqlite_store()
+        if store is not None:
+            return store.count_trades(_format_time(since), _format_time(until), signal)
+
+        trades = _read_journal(TRADES_JOURNAL_FILE, TRADES_FILE)
+        return len(_filter_records(trades, since, until, signal))
+    except Exception as e:
+        print(f"统计交易记录失败: {e}")
+        return 0
+
+def _get_performance() -> PerformanceAggregate:
+    """累计绩效（首次使用时从磁盘加载，没有则从交易历史重建）"""
+    global _performance
+    if _performance is None:
+        _performance = PerformanceAggregate.load(PERFORMANCE_FILE)
+        if _performance is None:
+            rebuild_performance()
+    return _performance
+
+def rebuild_performance() -> PerformanceAggregate:
+    """从完整交易历史重建累计绩效并保存"""
+    global _performance
+    _performance = PerformanceAggregate.rebuild(load_trades_history())
+    try:
+        _performance.save(PERFORMANCE_FILE)
+    except Exception as e:
+        print(f"保存绩效统计失败: {e}")
+    return _performance
+
+def load_performance() -> Dict:
+    """加载绩效统计（总盈亏、胜率、最大回撤、盈亏比、平均盈亏等）"""
+    try:
+        return _get_performance().summary()
+    except Exception as e:
+        print(f"加载绩效统计失败: {e}")
+        return calculate_performance([])
+
 def calculate_performance(trades: List[Dict]) -> Dict:
     """计算交易绩效"""
     if not trades:
@@ -87,120 +330,286 @@ def calculate_performance(trades: List[Dict]) -> Dict:
         'losing_trades': losing_trades
     }
 
+def _get_equity_rollup() -> EquityRollup:
+    """
+    写入端的权益K线汇总，首次使用时从原始快照恢复未收盘的K线，
+    并补写停机前已收盘但尚未保存的K线（首次升级时即从全部旧快照生成K线）
+    """
+    global _equity_rollup
+    if _equity_rollup is None:
+        raw = _get_journal(EQUITY_JOURNAL_FILE, EQUITY_HISTORY_FILE).read_all()
+        last_closed = {}
+        for tier, path in EQUITY_BAR_FILES.items():
+            bars = _get_journal(path).read_all()
+            last_closed[tier] = bars[-1]['timestamp'] if bars else None
+
+        rollup = EquityRollup()
+        for tier, bars in rollup.recover(raw, last_closed).items():
+            journal = _get_journal(EQUITY_BAR_FILES[tier])
+            for bar in bars:
+                journal.append(bar)
+            if len(bars) > 1:
+                print(f"📦 已从权益快照生成 {len(bars)} 根{tier}K线")
+        _equity_rollup = rollup
+    return _equity_rollup
+
+def _prune_equity_journal(latest: str):
+    """删除超过保留时长的原始快照（已汇总到K线中）"""
+    cutoff = (datetime.strptime(latest, TIME_FORMAT) - RAW_RETENTION).strftime(TIME_FORMAT)
+    _get_journal(EQUITY_JOURNAL_FILE, EQUITY_HISTORY_FILE).compact(keep=lambda r: r.get('timestamp', '') >= cutoff)
+
 def save_equity_snapshot(equity: float, timestamp: str = None):
-    """保存账户权益快照"""
+    """保存账户权益快照，并增量更新小时/日K线；原始快照保留48小时"""
     try:
         if timestamp is None:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            timestamp = datetime.now().strftime(TIME_FORMAT)
 
-        # 加载现有历史
-        equity_history = []
-        if os.path.exists(EQUITY_HISTORY_FILE):
-            with open(EQUITY_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                equity_history = json.load(f)
+        store = _get_sqlite_store()
+        if store is not None:
+            store.save_equity(timestamp, equity)
+            return
 
-        # 添加新快照
-        equity_history.append({
+        rollup = _get_equity_rollup()
+        _get_journal(EQUITY_JOURNAL_FILE, EQUITY_HISTORY_FILE).append({
             'timestamp': timestamp,
             'equity': equity
         })
+        closed = rollup.add(timestamp, equity)
+        for tier, bar in closed.items():
+            _get_journal(EQUITY_BAR_FILES[tier]).append(bar)
 
-        # 保留最近1000条记录
-        if len(equity_history) > 1000:
-            equity_history = equity_history[-1000:]
-
-        # 保存
-        with open(EQUITY_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(equity_history, f, ensure_ascii=False, indent=2)
+        # 每小时K线收盘时清理一次原始快照
+        if closed:
+            _prune_equity_journal(timestamp)
 
     except Exception as e:
         print(f"保存权益快照失败: {e}")
 
-def load_equity_history() -> List[Dict]:
-    """加载账户权益历史"""
+def load_equity_history(since: Union[str, datetime, None] = None,
+                        until: Union[str, datetime, None] = None,
+                        limit: Optional[int] = EQUITY_HISTORY_LIMIT) -> List[Dict]:
+    """
+    加载账户权益原始快照（只保留最近48小时，更长时间范围使用load_equity_series）
+
+    参数:
+        since/until: 时间范围（含边界），如最近24小时: since=datetime.now() - timedelta(hours=24)
+        limit: 只返回最近的N条，默认EQUITY_HISTORY_LIMIT，None表示不限制
+    """
     try:
-        if os.path.exists(EQUITY_HISTORY_FILE):
-            with open(EQUITY_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        store = _get_sqlite_store()
+        if store is not None:
+            return store.load_equity(_format_time(since), _format_time(until), limit)
+
+        equity_history = _read_journal(EQUITY_JOURNAL_FILE, EQUITY_HISTORY_FILE)
+        return _filter_records(equity_history, since, until, limit=limit)
     except Exception as e:
         print(f"加载权益历史失败: {e}")
         return []
 
+def load_equity_bars(tier: str, since: Union[str, datetime, None] = None,
+                     until: Union[str, datetime, None] = None) -> List[Dict]:
+    """
+    加载权益K线
+
+    参数:
+        tier: '1h' / '1d'
+        since/until: 时间范围（按K线起始时间，含边界）
+    """
+    try:
+        store = _get_sqlite_store()
+        if store is not None:
+            return store.load_equity_bars(tier, _format_time(since), _format_time(until))
+
+        return _filter_records(_read_journal(EQUITY_BAR_FILES[tier]), since, until)
+    except Exception as e:
+        print(f"加载权益K线失败: {e}")
+        return []
+
+def load_equity_series(since: Union[str, datetime, None] = None,
+                       until: Union[str, datetime, None] = None) -> List[Dict]:
+    """
+    按时间跨度自动选择精度加载权益曲线：48小时内为原始快照，90天内为小时K线，更长为日K线；
+    粗粒度K线之后的最近一段由更细的数据补充（K线记录的equity为收盘权益）
+
+    参数:
+        since/until: 时间范围（含边界），since为None表示全部历史
+    """
+    try:
+        since, until = _format_time(since), _format_time(until)
+        raw = load_equity_history(since, until, limit=None)
+
+        start = since
+        if start is None:
+            coarsest = list(TIERS)[-1]
+            store = _get_sqlite_store()
+            if store is not None:
+                start = store.first_equity_timestamp()
+            else:
+                first_bars = load_equity_bars(coarsest)
+                start = first_bars[0]['timestamp'] if first_bars else None
+            if start is None and raw:
+                start = raw[0]['timestamp']
+        if start is None:
+            return raw
+
+        end = datetime.strptime(until, TIME_FORMAT) if until is not None else datetime.now()
+        resolution = choose_resolution(end - datetime.strptime(start, TIME_FORMAT))
+        if resolution == 'raw':
+            return raw
+
+        latest = raw[-1]['timestamp'] if raw else None
+        tiers = list(TIERS)
+        series = [
+            (tier, closed_bars(load_equity_bars(tier, since, until), tier, latest))
+            for tier in reversed(tiers[:tiers.index(resolution) + 1])
+        ]
+        return merge_series(*series, ('raw', raw))
+    except Exception as e:
+        print(f"加载权益曲线失败: {e}")
+        return []
+
+def _file_signature(*paths: str):
+    """第一个存在的文件的 (inode, 修改时间, 大小)"""
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            return path, stat.st_ino, stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            continue
+    return None
+
+def data_signature(kind: str):
+    """
+    数据变化标识（开销为一次stat或一次索引查询），Web界面据此判断是否需要重新加载
+
+    参数:
+        kind: 'status' / 'trades' / 'equity'
+    """
+    store = _get_sqlite_store()
+    if kind == 'trades':
+        if store is not None:
+            return 'sqlite', store.last_id('trades')
+        return _file_signature(TRADES_JOURNAL_FILE, TRADES_FILE)
+    if kind == 'equity':
+        if store is not None:
+            return 'sqlite', store.last_id('equity')
+        return _file_signature(EQUITY_JOURNAL_FILE, EQUITY_HISTORY_FILE)
+    if kind == 'status':
+        reader = _get_status_reader()
+        if reader is not None and reader.sequence > 0:
+            return 'channel', reader.sequence
+        if store is not None:
+            return 'sqlite', (store.load_trading_data() or {}).get('version')
+        return _file_signature(DATA_FILE)
+    raise ValueError(f"未知数据类型: {kind}")
+
+def _publish_status(data: Dict):
+    """将最新状态写入共享内存通道"""
+    global _status_writer
+    try:
+        if _status_writer is None:
+            _status_writer = StatusChannel(STATUS_CHANNEL_FILE, create=True)
+        _status_writer.publish(data)
+    except Exception as e:
+        print(f"写入状态通道失败: {e}")
+
+def _get_status_reader() -> Optional[StatusChannel]:
+    """状态通道读取端，交易程序尚未启动（通道不存在或尚未初始化）时返回None"""
+    global _status_reader
+    if _status_reader is None:
+        try:
+            _status_reader = StatusChannel(STATUS_CHANNEL_FILE)
+        except (OSError, ValueError):
+            return None
+    return _status_reader
+
+def load_live_status() -> Optional[Dict]:
+    """从共享内存通道读取最新状态（序列号未变化时不重新解析），通道不可用返回None"""
+    reader = _get_status_reader()
+    if reader is None:
+        return None
+    _, data = reader.read()
+    return data
+
 def update_system_status(
     status: str,
     account_info: Optional[Dict] = None,
     btc_info: Optional[Dict] = None,
     position: Optional[Dict] = None,
     ai_signal: Optional[Dict] = None,
-    tp_sl_orders: Optional[Dict] = None
+    tp_sl_orders: Optional[Dict] = None,
+    metrics: Optional[Dict] = None
 ):
     """更新系统状态"""
 
-    # 加载现有数据
-    current_data = load_trading_data()
-    if current_data is None:
-        current_data = {
-            "status": "stopped",
-            "last_update": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "account": {
-                "balance": 0,
-                "equity": 0,
-                "leverage": 0
-            },
-            "btc": {
-                "price": 0,
-                "change": 0,
-                "timeframe": "15m",
-                "mode": "全仓-单向"
-            },
-            "position": None,
-            "performance": {
-                "total_pnl": 0,
-                "win_rate": 0,
-                "total_trades": 0
-            },
-            "ai_signal": {
-                "signal": "HOLD",
-                "confidence": "N/A",
-                "reason": "等待AI分析...",
-                "stop_loss": 0,
-                "take_profit": 0,
-                "timestamp": "N/A"
-            },
-            "tp_sl_orders": {
-                "stop_loss_order_id": None,
-                "take_profit_order_id": None
+    # 读取-修改-写入期间持有写锁，避免并发更新互相覆盖
+    with _trading_data_lock():
+        # 加载现有数据
+        current_data = load_trading_data()
+        if current_data is None:
+            current_data = {
+                "status": "stopped",
+                "last_update": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "account": {
+                    "balance": 0,
+                    "equity": 0,
+                    "leverage": 0
+                },
+                "btc": {
+                    "price": 0,
+                    "change": 0,
+                    "timeframe": "15m",
+                    "mode": "全仓-单向"
+                },
+                "position": None,
+                "performance": {
+                    "total_pnl": 0,
+                    "win_rate": 0,
+                    "total_trades": 0
+                },
+                "ai_signal": {
+                    "signal": "HOLD",
+                    "confidence": "N/A",
+                    "reason": "等待AI分析...",
+                    "stop_loss": 0,
+                    "take_profit": 0,
+                    "timestamp": "N/A"
+                },
+                "tp_sl_orders": {
+                    "stop_loss_order_id": None,
+                    "take_profit_order_id": None
+                }
             }
-        }
 
-    # 更新状态
-    current_data['status'] = status
-    current_data['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 更新状态
+        current_data['status'] = status
+        current_data['last_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    if account_info:
-        current_data['account'].update(account_info)
+        if account_info:
+            current_data['account'].update(account_info)
 
-    if btc_info:
-        current_data['btc'].update(btc_info)
+        if btc_info:
+            current_data['btc'].update(btc_info)
 
-    if position is not None:
-        current_data['position'] = position
+        if position is not None:
+            current_data['position'] = position
 
-    if ai_signal:
-        current_data['ai_signal'].update(ai_signal)
-        current_data['ai_signal']['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if ai_signal:
+            current_data['ai_signal'].update(ai_signal)
+            current_data['ai_signal']['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    if tp_sl_orders is not None:
-        current_data['tp_sl_orders'] = tp_sl_orders
+        if tp_sl_orders is not None:
+            current_data['tp_sl_orders'] = tp_sl_orders
 
-    # 计算绩效
-    trades = load_trades_history()
-    performance = calculate_performance(trades)
-    current_data['performance'] = performance
+        if metrics:
+            current_data.setdefault('metrics', {}).update(metrics)
 
-    # 保存
-    save_trading_data(current_data)
+        # 累计绩效（增量维护，不再重新加载交易历史）
+        current_data['performance'] = load_performance()
+
+        # 保存
+        save_trading_data(current_data)
+        _publish_status(current_data)
 
     # 🆕 保存权益快照（如果有账户信息）
     if account_info and 'equity' in account_info:
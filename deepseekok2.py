@@ -1,24 +1,29 @@
 import os
 import time
 import schedule
-from openai import OpenAI
 import ccxt
 import pandas as pd
+import numpy as np
 import re
 from dotenv import load_dotenv
 import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from data_manager import update_system_status, save_trade_record
+from market_data import CandleStore, fetch_ohlcv_incremental
+from indicators import StreamingIndicators, calculate_indicators_batch
+from scheduler import CandleCloseScheduler
+from market_snapshot import MarketSnapshot
+from llm_cache import SemanticCache, build_cache_key, quantize, quantize_price
+from llm_client import HedgedLLMClient
+from llm_replay import wrap_client
+from exchange_sim import LiveFeed, SimulatedExchange
+import metrics
+from tracing import bind as trace_bind, span, traced, tracer
 
 load_dotenv()
 
-# 初始化DeepSeek客户端
-deepseek_client = OpenAI(
-    api_key=os.getenv('DEEPSEEK_API_KEY'),
-    base_url="https://api.deepseek.com"
-)
-
 # 初始化OKX交易所
 exchange = ccxt.okx({
     'options': {
@@ -34,13 +39,46 @@ TRADE_CONFIG = {
     'symbol': 'BTC/USDT:USDT',  # OKX的合约符号格式
     'leverage': 10,  # 杠杆倍数,只影响保证金不影响下单价值
     'timeframe': '1h',  # 使用1小时K线
-    'test_mode': False,  # 测试模式
+    'test_mode': os.getenv('TEST_MODE', 'false').lower() == 'true',  # 测试模式：订单发往本地模拟交易所（见simulator）
     'data_points': 168,  # 7天数据（168根1小时K线）
+    'scan_symbols': [],  # 批量扫描的品种列表，如 ['ETH/USDT:USDT', 'SOL/USDT:USDT']，为空则不扫描
     'analysis_periods': {
         'short_term': 20,  # 短期均线（20小时）
         'medium_term': 50,  # 中期均线（50小时，约2天）
         'long_term': 168  # 长期趋势（168小时，7天）
     },
+    # WebSocket行情推送（连接不可用时自动回退REST轮询）
+    'websocket': {
+        'enabled': True,
+        'public_url': 'wss://ws.okx.com:8443/ws/v5/public',
+        'business_url': 'wss://ws.okx.com:8443/ws/v5/business'
+    },
+    # DeepSeek调用：单次截止时间 + 对冲请求（base_url可指向本地OpenAI兼容服务）
+    'llm': {
+        'base_url': os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com'),
+        'model': 'deepseek-chat',
+        'deadline_seconds': 20,  # 超过截止时间仍无有效回复则使用备用信号
+        'hedge_percentile': 90,  # 首个请求超过历史延迟P90仍未返回时发出对冲请求
+        'hedge_default_delay': 8,  # 延迟样本不足时的对冲等待秒数
+        'max_attempts': 3  # 截止时间内最多发出的请求数（含对冲和失败重发）
+    },
+    # AI回复录制/回放：record记录每次请求，replay从文件回放不请求网络（离线复现和性能测试，两种模式下不使用AI回复缓存）
+    'llm_replay': {
+        'mode': os.getenv('LLM_REPLAY_MODE', 'off'),  # off / record / replay
+        'file': os.getenv('LLM_REPLAY_FILE', 'data/llm_replay.dat'),
+        'latency': os.getenv('LLM_REPLAY_LATENCY', 'zero')  # 回放延迟：zero立即返回 / recorded按录制时的延迟
+    },
+    # AI回复缓存：量化后的行情特征相同则复用上次回复，不再请求DeepSeek
+    'llm_cache': {
+        'enabled': True,  # 设为False则每个周期都请求DeepSeek
+        'file': 'data/llm_cache.json',  # data目录在Docker中已挂载，重启后保留
+        'ttl_seconds': 3 * 3600,  # 缓存有效期
+        'max_entries': 500,  # 超出后淘汰最久未使用的
+        'rsi_step': 5,  # RSI量化步长
+        'bb_step': 0.2,  # 布林带位置量化步长
+        'price_step_pct': 0.5,  # 价格量化步长（%）
+        'sentiment_step': 0.1  # 市场情绪净值量化步长
+    },
     # 新增智能仓位参数
     'position_management': {
         'enable_intelligent_position': True,  # 🆕 新增：是否启用智能仓位管理
@@ -50,9 +88,46 @@ TRADE_CONFIG = {
         'low_confidence_multiplier': 0.5,
         'max_position_ratio': 50,  # 单次最大仓位比例
         'trend_strength_multiplier': 1.2
+    },
+    # 动态止盈止损比例（calculate_dynamic_tp_sl，按市场波动状态选择）
+    'tp_sl': {
+        'high_volatility_sl_pct': 0.025,  # 高波动止损2.5%
+        'high_volatility_tp_pct': 0.06,  # 高波动止盈6%
+        'low_volatility_sl_pct': 0.015,  # 低波动止损1.5%
+        'low_volatility_tp_pct': 0.03,  # 低波动止盈3%
+        'normal_sl_pct': 0.02,  # 其他状态止损2%
+        'normal_tp_pct': 0.05  # 其他状态止盈5%
+    },
+    # AI信号量化校验（validate_ai_signal）
+    'signal_validation': {
+        'rsi_overbought': 80,  # RSI高于该值时降低BUY信号信心
+        'rsi_oversold': 20  # RSI低于该值时降低SELL信号信心
+    },
+    # 测试模式的本地模拟交易所：实盘行情，下单/持仓/条件单在本地撮合（不需要OKX API密钥）
+    'simulator': {
+        'balance': 10000,  # 模拟账户初始资金（USDT）
+        'state_file': 'data/exchange_sim.json',  # 模拟账户状态，重启后继续使用
+        'slippage': 0.0002  # 市价单滑点
     }
 }
 
+# 测试模式：下单、持仓和止盈止损在本地模拟交易所撮合，行情仍来自OKX
+if TRADE_CONFIG['test_mode']:
+    exchange = SimulatedExchange(
+        LiveFeed(exchange, TRADE_CONFIG['symbol']),
+        symbol=TRADE_CONFIG['symbol'],
+        balance=TRADE_CONFIG['simulator']['balance'],
+        slippage=TRADE_CONFIG['simulator']['slippage'],
+        leverage=TRADE_CONFIG['leverage'],
+        state_file=TRADE_CONFIG['simulator']['state_file']
+    )
+
+# 交易所接口耗时和限频错误计入指标（/metrics）
+metrics.instrument(exchange, [
+    'fetch_ohlcv', 'fetch_ticker', 'fetch_balance', 'fetch_positions', 'create_market_order',
+    'private_post_trade_order_algo', 'private_post_trade_cancel_algos', 'private_get_trade_orders_algo_pending'
+], rate_limit_errors=(ccxt.RateLimitExceeded, ccxt.DDoSProtection))
+
 
 def setup_exchange():
     """设置交易所参数 - 强制全仓模式"""
@@ -154,6 +229,70 @@ price_history = []
 signal_history = []
 position = None
 
+# K线增量缓存（只拉取新K线，替换未收盘K线）
+candle_store = CandleStore(TRADE_CONFIG['data_points'])
+
+# 增量技术指标引擎（每根新K线O(1)更新）
+indicator_engine = StreamingIndicators(TRADE_CONFIG['data_points'])
+
+# WebSocket行情推送
+market_feed = None
+
+# K线收盘调度器（周期由timeframe换算）
+cycle_scheduler = CandleCloseScheduler(exchange.parse_timeframe(TRADE_CONFIG['timeframe']))
+
+# 周期内并发读取交易所/情绪数据的线程池
+cycle_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix='cycle-io')
+
+# 当前交易周期快照（周期外为None，直接请求交易所）
+cycle_snapshot = None
+
+# DeepSeek客户端（异步对冲请求，对外同步调用）
+deepseek_client = HedgedLLMClient(
+    api_key=os.getenv('DEEPSEEK_API_KEY'),
+    base_url=TRADE_CONFIG['llm']['base_url'],
+    model=TRADE_CONFIG['llm']['model'],
+    deadline=TRADE_CONFIG['llm']['deadline_seconds'],
+    hedge_percentile=TRADE_CONFIG['llm']['hedge_percentile'],
+    hedge_default_delay=TRADE_CONFIG['llm']['hedge_default_delay'],
+    max_attempts=TRADE_CONFIG['llm']['max_attempts']
+)
+
+# 录制/回放模式下替换为接口相同的录制/回放客户端
+deepseek_client = wrap_client(deepseek_client, **TRADE_CONFIG['llm_replay'])
+
+# AI回复缓存（持久化到磁盘，重启后继续使用）
+llm_cache = SemanticCache(
+    TRADE_CONFIG['llm_cache']['file'],
+    ttl_seconds=TRADE_CONFIG['llm_cache']['ttl_seconds'],
+    max_entries=TRADE_CONFIG['llm_cache']['max_entries']
+)
+
+
+def snapshot_value(name, fetch):
+    """从本周期快照读取数据，快照中没有或已失效时请求交易所并写回快照"""
+    global cycle_snapshot
+    snapshot = cycle_snapshot
+    if snapshot is not None and snapshot.has(name):
+        return getattr(snapshot, name)
+
+    value = fetch()
+    if cycle_snapshot is not None:
+        cycle_snapshot = cycle_snapshot.with_values(**{name: value})
+    return value
+
+
+def invalidate_snapshot(*names):
+    """本程序下单/撤单后失效快照中受影响的字段"""
+    global cycle_snapshot
+    if cycle_snapshot is not None:
+        cycle_snapshot = cycle_snapshot.invalidate(*names)
+
+
+def fetch_usdt_balance():
+    """获取账户余额（优先读取本周期快照）"""
+    return snapshot_value('balance', exchange.fetch_balance)
+
 # 全局变量存储止盈止损订单ID
 active_tp_sl_orders = {
     'take_profit_order_id': None,
@@ -173,7 +312,7 @@ def calculate_intelligent_position(signal_data, price_data, current_position):
 
     try:
         # 获取账户余额
-        balance = exchange.fetch_balance()
+        balance = fetch_usdt_balance()
         usdt_balance = balance['USDT']['free']
 
         # 基础USDT投入
@@ -244,7 +383,7 @@ def calculate_intelligent_position(signal_data, price_data, current_position):
 
 
 def calculate_technical_indicators(df):
-    """计算技术指标 - 来自第一个策略"""
+    """计算技术指标 - 来自第一个策略（pandas全量版本，实盘由indicators.StreamingIndicators增量计算）"""
     try:
         # 移动平均线
         df['sma_5'] = df['close'].rolling(window=5, min_periods=1).mean()
@@ -289,19 +428,26 @@ def calculate_technical_indicators(df):
         return df
 
 
-def get_support_resistance_levels(df, lookback=20):
-    """计算支撑阻力位"""
+def get_support_resistance_levels(df, lookback=20, latest=None):
+    """计算支撑阻力位（latest为增量引擎的最新指标，提供时不再扫描K线）"""
     try:
-        recent_high = df['high'].tail(lookback).max()
-        recent_low = df['low'].tail(lookback).min()
-        current_price = df['close'].iloc[-1]
+        if latest is not None and lookback == 20:
+            recent_high = latest['resistance']
+            recent_low = latest['support']
+            current_price = latest['close']
+        else:
+            recent_high = df['high'].tail(lookback).max()
+            recent_low = df['low'].tail(lookback).min()
+            current_price = df['close'].iloc[-1]
 
         resistance_level = recent_high
         support_level = recent_low
 
         # 动态支撑阻力（基于布林带）
-        bb_upper = df['bb_upper'].iloc[-1]
-        bb_lower = df['bb_lower'].iloc[-1]
+        if latest is None:
+            latest = df.iloc[-1]
+        bb_upper = latest['bb_upper']
+        bb_lower = latest['bb_lower']
 
         return {
             'static_resistance': resistance_level,
@@ -316,6 +462,7 @@ def get_support_resistance_levels(df, lookback=20):
         return {}
 
 
+@traced()
 def get_sentiment_indicators():
     """获取情绪指标 - 简洁版本"""
     try:
@@ -336,7 +483,7 @@ def get_sentiment_indicators():
         }
 
         headers = {"Content-Type": "application/json", "X-API-KEY": API_KEY}
-        response = requests.post(API_URL, json=request_body, headers=headers)
+        response = requests.post(API_URL, json=request_body, headers=headers, timeout=10)
 
         if response.status_code == 200:
             data = response.json()
@@ -391,17 +538,19 @@ def get_sentiment_indicators():
         return None
 
 
-def get_market_trend(df):
-    """判断市场趋势"""
+def get_market_trend(df, latest=None):
+    """判断市场趋势（latest为最新一行指标，默认取df最后一行）"""
     try:
-        current_price = df['close'].iloc[-1]
+        if latest is None:
+            latest = df.iloc[-1]
+        current_price = latest['close']
 
         # 多时间框架趋势分析
-        trend_short = "上涨" if current_price > df['sma_20'].iloc[-1] else "下跌"
-        trend_medium = "上涨" if current_price > df['sma_50'].iloc[-1] else "下跌"
+        trend_short = "上涨" if current_price > latest['sma_20'] else "下跌"
+        trend_medium = "上涨" if current_price > latest['sma_50'] else "下跌"
 
         # MACD趋势
-        macd_trend = "bullish" if df['macd'].iloc[-1] > df['macd_signal'].iloc[-1] else "bearish"
+        macd_trend = "bullish" if latest['macd'] > latest['macd_signal'] else "bearish"
 
         # 综合趋势判断
         if trend_short == "上涨" and trend_medium == "上涨":
@@ -416,32 +565,61 @@ def get_market_trend(df):
             'medium_term': trend_medium,
             'macd': macd_trend,
             'overall': overall_trend,
-            'rsi_level': df['rsi'].iloc[-1]
+            'rsi_level': latest['rsi']
         }
     except Exception as e:
         print(f"趋势分析失败: {e}")
         return {}
 
 
-def get_btc_ohlcv_enhanced():
-    """增强版：获取BTC K线数据并计算技术指标"""
+def build_technical_data(indicators):
+    """从最新一行指标中提取技术指标数据"""
+    return {
+        'sma_5': indicators.get('sma_5', 0),
+        'sma_20': indicators.get('sma_20', 0),
+        'sma_50': indicators.get('sma_50', 0),
+        'rsi': indicators.get('rsi', 0),
+        'macd': indicators.get('macd', 0),
+        'macd_signal': indicators.get('macd_signal', 0),
+        'macd_histogram': indicators.get('macd_histogram', 0),
+        'bb_upper': indicators.get('bb_upper', 0),
+        'bb_lower': indicators.get('bb_lower', 0),
+        'bb_position': indicators.get('bb_position', 0),
+        'volume_ratio': indicators.get('volume_ratio', 0)
+    }
+
+
+@traced()
+def refresh_candles():
+    """刷新K线缓存，返回是否成功"""
     try:
-        # 获取K线数据
-        ohlcv = exchange.fetch_ohlcv(TRADE_CONFIG['symbol'], TRADE_CONFIG['timeframe'],
-                                     limit=TRADE_CONFIG['data_points'])
+        # WebSocket推送正常时K线缓存已是最新，否则增量拉取（只拉取最新K线）
+        if market_feed is None or not market_feed.is_live():
+            fetch_ohlcv_incremental(exchange, TRADE_CONFIG['symbol'], TRADE_CONFIG['timeframe'], candle_store)
+        return True
+    except Exception as e:
+        print(f"刷新K线数据失败: {e}")
+        metrics.ERRORS.inc(stage='fetch')
+        return False
 
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
 
-        # 计算技术指标
-        df = calculate_technical_indicators(df)
+@traced()
+def get_btc_ohlcv_enhanced():
+    """增强版：基于K线缓存计算技术指标（调用前先refresh_candles刷新缓存）"""
+    try:
+        indicators_started = time.perf_counter()
+        with candle_store.lock:
+            df = candle_store.to_dataframe()
+            # 增量计算技术指标（只推入新收盘的K线，未收盘K线临时计算）
+            indicators = indicator_engine.sync(candle_store.to_array())
 
         current_data = df.iloc[-1]
         previous_data = df.iloc[-2]
 
         # 获取技术分析数据
-        trend_analysis = get_market_trend(df)
-        levels_analysis = get_support_resistance_levels(df)
+        trend_analysis = get_market_trend(df, indicators)
+        levels_analysis = get_support_resistance_levels(df, latest=indicators)
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - indicators_started, stage='indicators')
 
         return {
             'price': current_data['close'],
@@ -452,21 +630,10 @@ def get_btc_ohlcv_enhanced():
             'timeframe': TRADE_CONFIG['timeframe'],
             'price_change': ((current_data['close'] - previous_data['close']) / previous_data['close']) * 100,
             'kline_data': df[['timestamp', 'open', 'high', 'low', 'close', 'volume']].tail(10).to_dict('records'),
-            'technical_data': {
-                'sma_5': current_data.get('sma_5', 0),
-                'sma_20': current_data.get('sma_20', 0),
-                'sma_50': current_data.get('sma_50', 0),
-                'rsi': current_data.get('rsi', 0),
-                'macd': current_data.get('macd', 0),
-                'macd_signal': current_data.get('macd_signal', 0),
-                'macd_histogram': current_data.get('macd_histogram', 0),
-                'bb_upper': current_data.get('bb_upper', 0),
-                'bb_lower': current_data.get('bb_lower', 0),
-                'bb_position': current_data.get('bb_position', 0),
-                'volume_ratio': current_data.get('volume_ratio', 0)
-            },
+            'technical_data': build_technical_data(indicators),
             'trend_analysis': trend_analysis,
             'levels_analysis': levels_analysis,
+            'indicators': indicators,
             'full_data': df
         }
     except Exception as e:
@@ -474,6 +641,82 @@ def get_btc_ohlcv_enhanced():
         return None
 
 
+def analyze_symbols_batch(ohlcv_by_symbol):
+    """
+    批量分析多个品种：所有品种的K线放入 (N × T) 数组，一次向量化计算全部指标
+
+    参数:
+        ohlcv_by_symbol: {symbol: fetch_ohlcv返回的K线列表}
+
+    返回:
+        dict: {symbol: {'price', 'price_change', 'technical_data', 'trend_analysis',
+                        'levels_analysis', 'market_state', 'indicators'}}
+    """
+    symbols = [symbol for symbol, rows in ohlcv_by_symbol.items() if rows and len(rows) >= 2]
+    if not symbols:
+        return {}
+
+    # 按品种组装 (N × T) 数组，K线数量不足的品种左侧以NaN填充
+    length = max(len(ohlcv_by_symbol[symbol]) for symbol in symbols)
+    highs, lows, closes, volumes = np.full((4, len(symbols), length), np.nan)
+    for i, symbol in enumerate(symbols):
+        rows = np.asarray(ohlcv_by_symbol[symbol], dtype=np.float64)
+        highs[i, length - len(rows):] = rows[:, 2]
+        lows[i, length - len(rows):] = rows[:, 3]
+        closes[i, length - len(rows):] = rows[:, 4]
+        volumes[i, length - len(rows):] = rows[:, 5]
+
+    indicators = calculate_indicators_batch(highs, lows, closes, volumes)
+    latest = {key: values[:, -1] for key, values in indicators.items()}
+
+    # 支撑阻力位直接使用批量结果（最近20根K线的最高/最低价），相对价格的偏离一并向量化计算
+    with np.errstate(all='ignore'):
+        price_change = (closes[:, -1] - closes[:, -2]) / closes[:, -2] * 100
+        price_vs_resistance = (latest['resistance'] - latest['close']) / latest['close'] * 100
+        price_vs_support = (latest['close'] - latest['support']) / latest['support'] * 100
+
+    results = {}
+    for i, symbol in enumerate(symbols):
+        symbol_latest = {key: values[i] for key, values in latest.items()}
+        price_data = {
+            'price': symbol_latest['close'],
+            'price_change': price_change[i],
+            'technical_data': build_technical_data(symbol_latest),
+            'trend_analysis': get_market_trend(None, symbol_latest),
+            'levels_analysis': {
+                'static_resistance': symbol_latest['resistance'],
+                'static_support': symbol_latest['support'],
+                'dynamic_resistance': symbol_latest['bb_upper'],
+                'dynamic_support': symbol_latest['bb_lower'],
+                'price_vs_resistance': price_vs_resistance[i],
+                'price_vs_support': price_vs_support[i]
+            },
+            'indicators': symbol_latest
+        }
+        price_data['market_state'] = identify_market_state(price_data, price_data['technical_data'])
+        results[symbol] = price_data
+
+    return results
+
+
+def scan_symbols_batch(symbols=None):
+    """批量扫描配置中的品种"""
+    symbols = symbols or TRADE_CONFIG.get('scan_symbols', [])
+    ohlcv_by_symbol = {}
+    for symbol in symbols:
+        try:
+            ohlcv_by_symbol[symbol] = exchange.fetch_ohlcv(symbol, TRADE_CONFIG['timeframe'],
+                                                           limit=TRADE_CONFIG['data_points'])
+        except Exception as e:
+            print(f"获取{symbol} K线失败: {e}")
+
+    try:
+        return analyze_symbols_batch(ohlcv_by_symbol)
+    except Exception as e:
+        print(f"批量指标计算失败: {e}")
+        return {}
+
+
 def generate_technical_analysis_text(price_data):
     """生成技术分析文本"""
     if 'technical_data' not in price_data:
@@ -514,26 +757,32 @@ def generate_technical_analysis_text(price_data):
     return analysis_text
 
 
-def get_current_position():
-    """获取当前持仓情况 - OKX版本"""
-    try:
-        positions = exchange.fetch_positions([TRADE_CONFIG['symbol']])
+@traced()
+def fetch_current_position():
+    """从交易所获取当前持仓 - OKX版本"""
+    positions = exchange.fetch_positions([TRADE_CONFIG['symbol']])
 
-        for pos in positions:
-            if pos['symbol'] == TRADE_CONFIG['symbol']:
-                contracts = float(pos['contracts']) if pos['contracts'] else 0
+    for pos in positions:
+        if pos['symbol'] == TRADE_CONFIG['symbol']:
+            contracts = float(pos['contracts']) if pos['contracts'] else 0
 
-                if contracts > 0:
-                    return {
-                        'side': pos['side'],  # 'long' or 'short'
-                        'size': contracts,
-                        'entry_price': float(pos['entryPrice']) if pos['entryPrice'] else 0,
-                        'unrealized_pnl': float(pos['unrealizedPnl']) if pos['unrealizedPnl'] else 0,
-                        'leverage': float(pos['leverage']) if pos['leverage'] else TRADE_CONFIG['leverage'],
-                        'symbol': pos['symbol']
-                    }
+            if contracts > 0:
+                return {
+                    'side': pos['side'],  # 'long' or 'short'
+                    'size': contracts,
+                    'entry_price': float(pos['entryPrice']) if pos['entryPrice'] else 0,
+                    'unrealized_pnl': float(pos['unrealizedPnl']) if pos['unrealizedPnl'] else 0,
+                    'leverage': float(pos['leverage']) if pos['leverage'] else TRADE_CONFIG['leverage'],
+                    'symbol': pos['symbol']
+                }
+
+    return None
 
-        return None
+
+def get_current_position():
+    """获取当前持仓情况（优先读取本周期快照）"""
+    try:
+        return snapshot_value('position', fetch_current_position)
 
     except Exception as e:
         print(f"获取持仓失败: {e}")
@@ -560,6 +809,23 @@ def safe_json_parse(json_str):
             return None
 
 
+def parse_signal_response(result):
+    """从AI回复中提取交易信号，格式不合法或缺少必需字段返回None"""
+    if not result:
+        return None
+
+    start_idx = result.find('{')
+    end_idx = result.rfind('}') + 1
+    if start_idx == -1 or end_idx == 0:
+        return None
+
+    signal_data = safe_json_parse(result[start_idx:end_idx])
+    required_fields = ['signal', 'reason', 'stop_loss', 'take_profit', 'confidence']
+    if not isinstance(signal_data, dict) or not all(field in signal_data for field in required_fields):
+        return None
+    return signal_data
+
+
 def create_fallback_signal(price_data):
     """创建备用交易信号"""
     return {
@@ -575,12 +841,13 @@ def create_fallback_signal(price_data):
 def identify_market_state(price_data, tech_data):
     """量化识别市场状态"""
     try:
-        df = price_data['full_data']
-
-        # 计算ATR (波动率) - 使用14周期
-        high_low = df['high'] - df['low']
-        atr = high_low.rolling(14).mean()
-        atr_pct = (atr.iloc[-1] / price_data['price']) * 100
+        # 计算ATR (波动率) - 使用14周期，优先使用增量引擎结果
+        atr = price_data.get('indicators', {}).get('atr')
+        if atr is None:
+            df = price_data['full_data']
+            high_low = df['high'] - df['low']
+            atr = high_low.rolling(14).mean().iloc[-1]
+        atr_pct = (atr / price_data['price']) * 100
 
         # 获取均线数据
         sma_5 = tech_data.get('sma_5', 0)
@@ -629,17 +896,18 @@ def calculate_dynamic_tp_sl(signal, current_price, market_state, position=None):
     """基于市场状态动态计算止盈止损"""
 
     atr_pct = market_state.get('atr_pct', 2.0)  # 波动率
+    config = TRADE_CONFIG['tp_sl']
 
     # 基础止损止盈比例 - 根据市场波动率调整
     if market_state['state'].startswith('高波动'):
-        base_sl_pct = 0.025  # 2.5%
-        base_tp_pct = 0.06   # 6%
+        base_sl_pct = config['high_volatility_sl_pct']
+        base_tp_pct = config['high_volatility_tp_pct']
     elif market_state['state'].startswith('低波动'):
-        base_sl_pct = 0.015  # 1.5%
-        base_tp_pct = 0.03   # 3%
+        base_sl_pct = config['low_volatility_sl_pct']
+        base_tp_pct = config['low_volatility_tp_pct']
     else:
-        base_sl_pct = 0.02   # 2%
-        base_tp_pct = 0.05   # 5%
+        base_sl_pct = config['normal_sl_pct']
+        base_tp_pct = config['normal_tp_pct']
 
     # 根据信号方向计算
     if signal == 'BUY':
@@ -684,13 +952,15 @@ def validate_ai_signal(ai_signal, price_data, tech_data):
 
     # 规则1: RSI极端值检查
     rsi = tech.get('rsi', 50)
-    if rsi > 80 and signal == 'BUY':
-        print("⚠️ RSI超买(>80)，降低BUY信号信心")
+    rsi_overbought = TRADE_CONFIG['signal_validation']['rsi_overbought']
+    rsi_oversold = TRADE_CONFIG['signal_validation']['rsi_oversold']
+    if rsi > rsi_overbought and signal == 'BUY':
+        print(f"⚠️ RSI超买(>{rsi_overbought})，降低BUY信号信心")
         ai_signal['confidence'] = 'LOW'
         ai_signal['reason'] += " [RSI超买警告]"
 
-    if rsi < 20 and signal == 'SELL':
-        print("⚠️ RSI超卖(<20)，降低SELL信号信心")
+    if rsi < rsi_oversold and signal == 'SELL':
+        print(f"⚠️ RSI超卖(<{rsi_oversold})，降低SELL信号信心")
         ai_signal['confidence'] = 'LOW'
         ai_signal['reason'] += " [RSI超卖警告]"
 
@@ -754,8 +1024,61 @@ def validate_ai_signal(ai_signal, price_data, tech_data):
     return ai_signal
 
 
-def analyze_with_deepseek(price_data):
-    """使用DeepSeek分析市场并生成交易信号（优化版）"""
+def apply_dynamic_tp_sl(signal_data, price_data, market_state, position=None):
+    """检查AI的止盈止损是否合理，不合理则使用动态计算的（实盘和回测共用）"""
+    dynamic_tp_sl = calculate_dynamic_tp_sl(signal_data['signal'], price_data['price'], market_state, position)
+
+    if signal_data['signal'] != 'HOLD':
+        ai_sl = signal_data.get('stop_loss', 0)
+        ai_tp = signal_data.get('take_profit', 0)
+        current_price = price_data['price']
+
+        # 验证止损止盈的合理性
+        sl_valid = False
+        tp_valid = False
+
+        if signal_data['signal'] == 'BUY':
+            sl_valid = ai_sl < current_price and ai_sl > current_price * 0.95  # 止损在当前价下方且不超过5%
+            tp_valid = ai_tp > current_price and ai_tp < current_price * 1.10  # 止盈在当前价上方且不超过10%
+        elif signal_data['signal'] == 'SELL':
+            sl_valid = ai_sl > current_price and ai_sl < current_price * 1.05  # 止损在当前价上方且不超过5%
+            tp_valid = ai_tp < current_price and ai_tp > current_price * 0.90  # 止盈在当前价下方且不超过10%
+
+        if not sl_valid or not tp_valid:
+            print(f"⚠️ AI止盈止损不合理，使用动态计算: SL={dynamic_tp_sl['stop_loss']}, TP={dynamic_tp_sl['take_profit']}")
+            signal_data['stop_loss'] = dynamic_tp_sl['stop_loss']
+            signal_data['take_profit'] = dynamic_tp_sl['take_profit']
+
+    return signal_data
+
+
+def build_prompt_features(price_data, market_state, current_pos, sentiment_data):
+    """提取Prompt输入的量化特征，作为AI回复缓存的键"""
+    cache_config = TRADE_CONFIG['llm_cache']
+    tech_data = price_data.get('technical_data', {})
+    trend_analysis = price_data.get('trend_analysis', {})
+
+    return {
+        'symbol': TRADE_CONFIG['symbol'],
+        'timeframe': TRADE_CONFIG['timeframe'],
+        'trend': trend_analysis.get('overall'),
+        'trend_short': trend_analysis.get('short_term'),
+        'trend_medium': trend_analysis.get('medium_term'),
+        'macd': trend_analysis.get('macd'),
+        'rsi': quantize(tech_data.get('rsi'), cache_config['rsi_step']),
+        'bb_position': quantize(tech_data.get('bb_position'), cache_config['bb_step']),
+        'market_state': market_state['state'],
+        'price': quantize_price(price_data['price'], cache_config['price_step_pct']),
+        'position': current_pos['side'] if current_pos else None,
+        'last_signal': signal_history[-1].get('signal') if signal_history else None,
+        'sentiment': quantize(sentiment_data['net_sentiment'], cache_config['sentiment_step']) if sentiment_data else None
+    }
+
+
+@traced()
+def analyze_with_deepseek(price_data, timeout=None):
+    """使用DeepSeek分析市场并生成交易信号（优化版，timeout为本次调用截止秒数）"""
+    prompt_started = time.perf_counter()
 
     # 生成技术分析文本
     technical_analysis = generate_technical_analysis_text(price_data)
@@ -774,7 +1097,7 @@ def analyze_with_deepseek(price_data):
         signal_text = f"\n【上次信号】{last_signal.get('signal', 'N/A')} (信心: {last_signal.get('confidence', 'N/A')})"
 
     # 获取情绪数据
-    sentiment_data = get_sentiment_indicators()
+    sentiment_data = snapshot_value('sentiment', get_sentiment_indicators)
     if sentiment_data:
         sign = '+' if sentiment_data['net_sentiment'] >= 0 else ''
         sentiment_text = f"【市场情绪】乐观{sentiment_data['positive_ratio']:.1%} 悲观{sentiment_data['negative_ratio']:.1%} 净值{sign}{sentiment_data['net_sentiment']:.3f}"
@@ -835,39 +1158,48 @@ RSI: {price_data['technical_data'].get('rsi', 0):.1f} | MACD: {price_data['trend
 }}
 """
 
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - prompt_started, stage='prompt')
+
     try:
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system",
-                 "content": f"您是专业交易员，专注{TRADE_CONFIG['timeframe']}周期趋势分析。严格输出JSON格式，不要添加任何解释文字。"},
-                {"role": "user", "content": prompt}
-            ],
-            stream=False,
-            temperature=0.1
-        )
+        # 行情没有实质变化时复用缓存的AI回复
+        cache_key = None
+        result = None
+        if TRADE_CONFIG['llm_cache']['enabled'] and TRADE_CONFIG['llm_replay']['mode'] == 'off':
+            cache_features = build_prompt_features(price_data, market_state, current_pos, sentiment_data)
+            cache_key = build_cache_key(cache_features)
+            result = llm_cache.get(cache_key)
+            cache_stats = llm_cache.stats()
+            hit_text = "命中" if result is not None else "未命中"
+            print(f"🗄️ AI缓存{hit_text} (命中{cache_stats['hits']}/未命中{cache_stats['misses']}, 命中率{cache_stats['hit_rate']}%)")
+
+        from_cache = result is not None
+        if not from_cache:
+            # 截止时间内取最先返回的有效JSON，超时返回None
+            with metrics.STAGE_SECONDS.time(stage='llm'):
+                result = deepseek_client.complete(
+                    [
+                        {"role": "system",
+                         "content": f"您是专业交易员，专注{TRADE_CONFIG['timeframe']}周期趋势分析。严格输出JSON格式，不要添加任何解释文字。"},
+                        {"role": "user", "content": prompt}
+                    ],
+                    validate=parse_signal_response,
+                    timeout=timeout,
+                    temperature=0.1
+                )
+            if result is None:
+                print("DeepSeek未在截止时间内返回有效信号")
+                return create_fallback_signal(price_data)
 
         # 安全解析JSON
-        result = response.choices[0].message.content
+        validation_started = time.perf_counter()
         print(f"🤖 AI原始回复: {result[:200]}...")
-
-        # 提取JSON部分
-        start_idx = result.find('{')
-        end_idx = result.rfind('}') + 1
-
-        if start_idx != -1 and end_idx != 0:
-            json_str = result[start_idx:end_idx]
-            signal_data = safe_json_parse(json_str)
-
-            if signal_data is None:
-                signal_data = create_fallback_signal(price_data)
-        else:
+        signal_data = parse_signal_response(result)
+        if signal_data is None:
             signal_data = create_fallback_signal(price_data)
 
-        # 验证必需字段
-        required_fields = ['signal', 'reason', 'stop_loss', 'take_profit', 'confidence']
-        if not all(field in signal_data for field in required_fields):
-            signal_data = create_fallback_signal(price_data)
+        # 只缓存解析成功的回复
+        if cache_key is not None and not from_cache and not signal_data.get('is_fallback', False):
+            llm_cache.put(cache_key, result, cache_features)
 
         # 🆕 量化验证AI信号
         print(f"📊 AI原始信号: {signal_data['signal']} (信心: {signal_data['confidence']})")
@@ -875,29 +1207,9 @@ RSI: {price_data['technical_data'].get('rsi', 0):.1f} | MACD: {price_data['trend
         print(f"✅ 验证后信号: {signal_data['signal']} (信心: {signal_data['confidence']})")
 
         # 🆕 使用动态止盈止损（如果AI的不合理）
-        dynamic_tp_sl = calculate_dynamic_tp_sl(signal_data['signal'], price_data['price'], market_state, current_pos)
-
-        # 检查AI的止盈止损是否合理，不合理则使用动态计算的
-        if signal_data['signal'] != 'HOLD':
-            ai_sl = signal_data.get('stop_loss', 0)
-            ai_tp = signal_data.get('take_profit', 0)
-            current_price = price_data['price']
-
-            # 验证止损止盈的合理性
-            sl_valid = False
-            tp_valid = False
-
-            if signal_data['signal'] == 'BUY':
-                sl_valid = ai_sl < current_price and ai_sl > current_price * 0.95  # 止损在当前价下方且不超过5%
-                tp_valid = ai_tp > current_price and ai_tp < current_price * 1.10  # 止盈在当前价上方且不超过10%
-            elif signal_data['signal'] == 'SELL':
-                sl_valid = ai_sl > current_price and ai_sl < current_price * 1.05  # 止损在当前价上方且不超过5%
-                tp_valid = ai_tp < current_price and ai_tp > current_price * 0.90  # 止盈在当前价下方且不超过10%
-
-            if not sl_valid or not tp_valid:
-                print(f"⚠️ AI止盈止损不合理，使用动态计算: SL={dynamic_tp_sl['stop_loss']}, TP={dynamic_tp_sl['take_profit']}")
-                signal_data['stop_loss'] = dynamic_tp_sl['stop_loss']
-                signal_data['take_profit'] = dynamic_tp_sl['take_profit']
+        signal_data = apply_dynamic_tp_sl(signal_data, price_data, market_state, current_pos)
+
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - validation_started, stage='validation')
 
         # 保存信号到历史记录
         signal_data['timestamp'] = price_data['timestamp']
@@ -923,6 +1235,29 @@ RSI: {price_data['technical_data'].get('rsi', 0):.1f} | MACD: {price_data['trend
         return create_fallback_signal(price_data)
 
 
+@traced()
+def fetch_pending_algo_orders():
+    """从交易所查询未触发的条件单（止盈止损）"""
+    # 转换交易对格式：BTC/USDT:USDT -> BTC-USDT-SWAP
+    inst_id = TRADE_CONFIG['symbol'].replace('/USDT:USDT', '-USDT-SWAP').replace('/', '-')
+
+    # 使用OKX专用的算法订单API查询
+    response = exchange.private_get_trade_orders_algo_pending({
+        'instType': 'SWAP',
+        'instId': inst_id,
+        'ordType': 'conditional'  # 查询条件单
+    })
+
+    if response.get('code') == '0' and response.get('data'):
+        return response['data']
+    return []
+
+
+def get_pending_algo_orders():
+    """未触发的条件单（优先读取本周期快照）"""
+    return snapshot_value('algo_orders', fetch_pending_algo_orders)
+
+
 def get_active_tp_sl_orders():
     """
     查询当前活跃的止盈止损订单
@@ -931,23 +1266,15 @@ def get_active_tp_sl_orders():
         dict: 包含止盈止损订单信息的字典
     """
     try:
-        # 转换交易对格式：BTC/USDT:USDT -> BTC-USDT-SWAP
-        inst_id = TRADE_CONFIG['symbol'].replace('/USDT:USDT', '-USDT-SWAP').replace('/', '-')
-
-        # 使用OKX专用的算法订单API查询
-        response = exchange.private_get_trade_orders_algo_pending({
-            'instType': 'SWAP',
-            'instId': inst_id,
-            'ordType': 'conditional'  # 查询条件单
-        })
+        orders = get_pending_algo_orders()
 
         active_orders = {
             'stop_loss_orders': [],
             'take_profit_orders': []
         }
 
-        if response.get('code') == '0' and response.get('data'):
-            for order in response['data']:
+        if orders:
+            for order in orders:
                 ord_type = order.get('ordType')
 
                 # 检查是否是止盈止损订单
@@ -988,15 +1315,10 @@ def cancel_existing_tp_sl_orders():
         # 使用OKX专用的算法订单API
         # 获取所有活跃的算法订单（止盈止损订单）
         try:
-            # OKX的算法订单查询
-            response = exchange.private_get_trade_orders_algo_pending({
-                'instType': 'SWAP',
-                'instId': inst_id,
-                'ordType': 'conditional'  # 查询条件单
-            })
-
-            if response.get('code') == '0' and response.get('data'):
-                for order in response['data']:
+            orders = get_pending_algo_orders()
+
+            if orders:
+                for order in orders:
                     # 检查是否是止盈止损订单
                     ord_type = order.get('ordType')
                     if ord_type in ['conditional', 'oco']:
@@ -1015,6 +1337,7 @@ def cancel_existing_tp_sl_orders():
                                 print(f"⚠️ 取消订单失败: {cancel_response.get('msg')}")
                         except Exception as e:
                             print(f"⚠️ 取消订单异常 {order.get('algoId')}: {e}")
+                invalidate_snapshot('algo_orders')
         except Exception as e:
             print(f"⚠️ 查询算法订单失败: {e}")
 
@@ -1033,18 +1356,10 @@ def check_existing_tp_sl_orders(position_side, stop_loss_price, take_profit_pric
     返回: True=已存在相同订单，False=需要创建新订单
     """
     try:
-        inst_id = TRADE_CONFIG['symbol'].replace('/USDT:USDT', '-USDT-SWAP').replace('/', '-')
-
         # 查询当前活跃的算法订单
-        response = exchange.private_get_trade_orders_algo_pending({
-            'instType': 'SWAP',
-            'instId': inst_id,
-            'ordType': 'conditional'
-        })
-
-        if response.get('code') == '0' and response.get('data'):
-            orders = response['data']
+        orders = get_pending_algo_orders()
 
+        if orders:
             # 检查是否有匹配的订单
             has_sl = False
             has_tp = False
@@ -1171,6 +1486,7 @@ def set_stop_loss_take_profit(position_side, stop_loss_price, take_profit_price,
             except Exception as e:
                 print(f"❌ 设置止盈订单失败: {e}")
 
+        invalidate_snapshot('algo_orders')
         return True
 
     except Exception as e:
@@ -1178,6 +1494,7 @@ def set_stop_loss_take_profit(position_side, stop_loss_price, take_profit_price,
         return False
 
 
+@traced()
 def execute_intelligent_trade(signal_data, price_data):
     """执行智能交易 - OKX版本（支持同方向加仓减仓）"""
     global position
@@ -1217,14 +1534,10 @@ def execute_intelligent_trade(signal_data, price_data):
     print(f"当前持仓: {current_position}")
 
     # 风险管理
-    if signal_data['confidence'] == 'LOW' and not TRADE_CONFIG['test_mode']:
+    if signal_data['confidence'] == 'LOW':
         print("⚠️ 低信心信号，跳过执行")
         return
 
-    if TRADE_CONFIG['test_mode']:
-        print("测试模式 - 仅模拟交易")
-        return
-
     try:
         # 执行交易逻辑 - 支持同方向加仓减仓
         if signal_data['signal'] == 'BUY':
@@ -1241,7 +1554,8 @@ def execute_intelligent_trade(signal_data, price_data):
                         current_position['size'],
                         params={'reduceOnly': True, 'tag': 'c314b0aecb5bBCDE'}
                     )
-                    time.sleep(1)
+                    with span('sleep'):
+                        time.sleep(1)
                     # 开多仓
                     exchange.create_market_order(
                         TRADE_CONFIG['symbol'],
@@ -1312,7 +1626,8 @@ def execute_intelligent_trade(signal_data, price_data):
                         current_position['size'],
                         params={'reduceOnly': True, 'tag': 'c314b0aecb5bBCDE'}
                     )
-                    time.sleep(1)
+                    with span('sleep'):
+                        time.sleep(1)
                     # 开空仓
                     exchange.create_market_order(
                         TRADE_CONFIG['symbol'],
@@ -1401,7 +1716,10 @@ def execute_intelligent_trade(signal_data, price_data):
             return
 
         print("智能交易执行成功")
-        time.sleep(2)
+        # 已下单，持仓和余额需要重新获取
+        invalidate_snapshot('position', 'balance', 'algo_orders')
+        with span('sleep'):
+            time.sleep(2)
         position = get_current_position()
         print(f"更新后持仓: {position}")
 
@@ -1471,6 +1789,7 @@ def execute_intelligent_trade(signal_data, price_data):
                         params={'tag': 'c314b0aecb5bBCDE'}
                     )
                 print("直接开仓成功")
+                invalidate_snapshot('position', 'balance', 'algo_orders')
             except Exception as e2:
                 print(f"直接开仓也失败: {e2}")
 
@@ -1478,80 +1797,171 @@ def execute_intelligent_trade(signal_data, price_data):
         traceback.print_exc()
 
 
+def on_ws_candle_closed(timestamp):
+    """WebSocket推送K线收盘：立即把收盘K线推入指标引擎并触发交易周期"""
+    with candle_store.lock:
+        # 收盘推送时缓存最后一行就是刚收盘的K线，按收盘时间截取后整体作为已收盘K线推入
+        candles = candle_store.to_array()
+        indicator_engine.sync(candles[candles[:, 0] <= timestamp], last_closed=True)
+    cycle_scheduler.notify_closed(timestamp)
+
+
+def start_market_feed():
+    """启动WebSocket行情推送"""
+    global market_feed
+
+    ws_config = TRADE_CONFIG.get('websocket', {})
+    if not ws_config.get('enabled'):
+        return None
+
+    try:
+        from ws_feed import OKXMarketFeed
+
+        inst_id = TRADE_CONFIG['symbol'].replace('/USDT:USDT', '-USDT-SWAP').replace('/', '-')
+        market_feed = OKXMarketFeed(
+            exchange,
+            TRADE_CONFIG['symbol'],
+            inst_id,
+            TRADE_CONFIG['timeframe'],
+            candle_store,
+            on_candle_closed=on_ws_candle_closed,
+            public_url=ws_config['public_url'],
+            business_url=ws_config['business_url']
+        )
+        market_feed.start()
+        print(f"📡 WebSocket行情推送已启动: {market_feed.candle_channel} + tickers")
+    except Exception as e:
+        print(f"⚠️ WebSocket行情推送启动失败，使用REST轮询: {e}")
+        market_feed = None
+
+    return market_feed
+
+
+@traced()
 def analyze_with_deepseek_with_retry(price_data, max_retries=2):
-    """带重试的DeepSeek分析"""
+    """带重试的DeepSeek分析（所有重试共用一个截止时间）"""
+    deadline = time.time() + TRADE_CONFIG['llm']['deadline_seconds']
     for attempt in range(max_retries):
+        remaining = deadline - time.time()
+        if remaining <= 1:
+            print("⏰ DeepSeek分析已到截止时间，使用备用信号")
+            break
+        if attempt > 0:
+            metrics.RETRIES.inc(kind='llm')
+
         try:
-            signal_data = analyze_with_deepseek(price_data)
+            signal_data = analyze_with_deepseek(price_data, timeout=remaining)
             if signal_data and not signal_data.get('is_fallback', False):
                 return signal_data
 
             print(f"第{attempt + 1}次尝试失败，进行重试...")
-            time.sleep(1)
 
         except Exception as e:
             print(f"第{attempt + 1}次尝试异常: {e}")
-            if attempt == max_retries - 1:
-                return create_fallback_signal(price_data)
-            time.sleep(1)
 
     return create_fallback_signal(price_data)
 
 
-def wait_for_next_period():
-    """等待到下一个15分钟整点"""
-    now = datetime.now()
-    current_minute = now.minute
-    current_second = now.second
-
-    # 计算下一个整点时间（00, 15, 30, 45分钟）
-    next_period_minute = ((current_minute // 15) + 1) * 15
-    if next_period_minute == 60:
-        next_period_minute = 0
-
-    # 计算需要等待的总秒数
-    if next_period_minute > current_minute:
-        minutes_to_wait = next_period_minute - current_minute
-    else:
-        minutes_to_wait = 60 - current_minute + next_period_minute
+def gather_cycle_snapshot(price_data):
+    """
+    并发获取本周期快照：账户余额、持仓、条件单、市场情绪互不依赖，同时发出请求，
+    周期耗时由各请求耗时之和降为最慢的单个请求
 
-    seconds_to_wait = minutes_to_wait * 60 - current_second
+    参数:
+        price_data: 本周期已获取的K线和指标（确认有新收盘K线后才获取其他数据）
 
-    # 显示友好的等待时间
-    display_minutes = minutes_to_wait - 1 if current_second > 0 else minutes_to_wait
-    display_seconds = 60 - current_second if current_second > 0 else 0
+    返回:
+        MarketSnapshot: 获取失败的字段标记为失效，读取时重新请求
+    """
+    # 线程池中的请求记录为当前span的子span
+    futures = {
+        'balance': cycle_executor.submit(trace_bind(exchange.fetch_balance, 'fetch_balance')),
+        'position': cycle_executor.submit(trace_bind(fetch_current_position)),
+        'algo_orders': cycle_executor.submit(trace_bind(fetch_pending_algo_orders)),
+        'sentiment': cycle_executor.submit(trace_bind(get_sentiment_indicators)),
+    }
 
-    if display_minutes > 0:
-        print(f"🕒 等待 {display_minutes} 分 {display_seconds} 秒到整点...")
-    else:
-        print(f"🕒 等待 {display_seconds} 秒到整点...")
+    values = {'price_data': price_data}
+    stale = set()
+    for key, future in futures.items():
+        try:
+            values[key] = future.result()
+        except Exception as e:
+            print(f"获取{key}失败: {e}")
+            metrics.ERRORS.inc(stage='fetch')
+            values[key] = None
+            stale.add(key)
 
-    return seconds_to_wait
+    return MarketSnapshot(stale=frozenset(stale), **values)
 
 
 def trading_bot():
-    # 等待到整点再执行
-    wait_seconds = wait_for_next_period()
-    if wait_seconds > 0:
-        time.sleep(wait_seconds)
-
     """主交易机器人函数"""
+    global cycle_snapshot
+
+    # 等待K线收盘（WebSocket收盘确认或定时器触发）
+    trigger = cycle_scheduler.wait(websocket_live=market_feed is not None and market_feed.is_live())
+
     print("\n" + "=" * 60)
-    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} (触发: {trigger})")
     print("=" * 60)
 
-    # 1. 获取增强版K线数据
-    price_data = get_btc_ohlcv_enhanced()
+    # 1. 先刷新K线，有新收盘K线时再并发获取账户、持仓、条件单和情绪数据，本周期内各函数从快照读取
+    # 每个周期的各阶段耗时写入时间线（data/cycle_timeline.jsonl），Web界面显示瀑布图
+    cycle_started = time.perf_counter()
+    processed = False
+    with tracer.cycle('trading_bot', trigger=trigger) as cycle_attrs:
+        # fetch阶段只统计K线刷新和快照请求，指标计算单独计入indicators阶段，各阶段耗时互不重叠
+        fetch_started = time.perf_counter()
+        price_data = None
+        with span('candles'):
+            refreshed = refresh_candles()
+        fetch_seconds = time.perf_counter() - fetch_started
+        # 没有新收盘K线则跳过本周期，不计算指标，也不发出账户和情绪请求
+        closed_timestamp = cycle_scheduler.latest_closed_timestamp(candle_store)
+        if refreshed and not cycle_scheduler.is_new_candle(closed_timestamp):
+            print("⏭️ 没有新的收盘K线，跳过本周期")
+        elif refreshed:
+            with span('indicators'):
+                price_data = get_btc_ohlcv_enhanced()
+        if price_data:
+            cycle_scheduler.mark_processed(closed_timestamp)
+            snapshot_started = time.perf_counter()
+            with span('snapshot'):
+                cycle_snapshot = gather_cycle_snapshot(price_data)
+            fetch_seconds += time.perf_counter() - snapshot_started
+        metrics.STAGE_SECONDS.observe(fetch_seconds, stage='fetch')
+        if price_data:
+            try:
+                processed = run_trading_cycle(cycle_snapshot.price_data)
+            finally:
+                cycle_snapshot = None
+        cycle_attrs['processed'] = bool(processed)
+
+    # 只统计实际执行了分析的周期
+    if processed:
+        metrics.CYCLE_SECONDS.observe(time.perf_counter() - cycle_started)
+
+
+def run_trading_cycle(price_data):
+    """基于本周期快照执行分析和交易，返回是否执行了本周期"""
     if not price_data:
-        return
+        return False
 
     print(f"BTC当前价格: ${price_data['price']:,.2f}")
     print(f"数据周期: {TRADE_CONFIG['timeframe']}")
     print(f"价格变化: {price_data['price_change']:+.2f}%")
 
-    # 2. 获取账户信息
+    # 批量扫描其他品种（可选）
+    if TRADE_CONFIG.get('scan_symbols'):
+        for symbol, scan in scan_symbols_batch().items():
+            print(f"🔎 {symbol}: {scan['price']:.4f} ({scan['price_change']:+.2f}%) "
+                  f"{scan['market_state']['state']} RSI:{scan['technical_data']['rsi']:.1f} "
+                  f"趋势:{scan['trend_analysis'].get('overall', 'N/A')}")
+
+    # 2. 账户信息
     try:
-        balance = exchange.fetch_balance()
+        balance = fetch_usdt_balance()
         account_info = {
             'balance': float(balance['USDT'].get('free', 0)),
             'equity': float(balance['USDT'].get('total', 0)),
@@ -1561,7 +1971,7 @@ def trading_bot():
         print(f"获取账户信息失败: {e}")
         account_info = None
 
-    # 3. 获取当前持仓
+    # 3. 当前持仓
     current_position = get_current_position()
     position_info = None
     if current_position:
@@ -1577,37 +1987,52 @@ def trading_bot():
 
     if signal_data.get('is_fallback', False):
         print("⚠️ 使用备用交易信号")
+        metrics.FALLBACKS.inc()
+
+    decision_lag = cycle_scheduler.record_decision()
+    print(f"⏱️ 收盘触发到决策延迟: {decision_lag:.2f}秒")
 
     # 5. 更新系统状态到Web界面
+    persistence_started = time.perf_counter()
     try:
-        update_system_status(
-            status='running',
-            account_info=account_info,
-            btc_info={
-                'price': price_data['price'],
-                'change': price_data['price_change'],
-                'timeframe': TRADE_CONFIG['timeframe'],
-                'mode': '全仓-单向'
-            },
-            position=position_info,
-            ai_signal={
-                'signal': signal_data['signal'],
-                'confidence': signal_data['confidence'],
-                'reason': signal_data['reason'],
-                'stop_loss': signal_data['stop_loss'],
-                'take_profit': signal_data['take_profit']
-            },
-            tp_sl_orders={
-                'stop_loss_order_id': active_tp_sl_orders.get('stop_loss_order_id'),
-                'take_profit_order_id': active_tp_sl_orders.get('take_profit_order_id')
-            }
-        )
+        with span('update_system_status'):
+            update_system_status(
+                status='running',
+                account_info=account_info,
+                btc_info={
+                    'price': price_data['price'],
+                    'change': price_data['price_change'],
+                    'timeframe': TRADE_CONFIG['timeframe'],
+                    'mode': '全仓-单向'
+                },
+                position=position_info,
+                ai_signal={
+                    'signal': signal_data['signal'],
+                    'confidence': signal_data['confidence'],
+                    'reason': signal_data['reason'],
+                    'stop_loss': signal_data['stop_loss'],
+                    'take_profit': signal_data['take_profit']
+                },
+                tp_sl_orders={
+                    'stop_loss_order_id': active_tp_sl_orders.get('stop_loss_order_id'),
+                    'take_profit_order_id': active_tp_sl_orders.get('take_profit_order_id')
+                },
+                metrics={
+                    'decision_lag': cycle_scheduler.lag_stats(),
+                    'llm_cache': llm_cache.stats(),
+                    'llm_latency': deepseek_client.latency_stats()
+                }
+            )
         print("✅ 系统状态已更新到Web界面")
     except Exception as e:
         print(f"更新系统状态失败: {e}")
+        metrics.ERRORS.inc(stage='persistence')
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - persistence_started, stage='persistence')
 
     # 6. 执行智能交易
-    execute_intelligent_trade(signal_data, price_data)
+    with metrics.STAGE_SECONDS.time(stage='execution'):
+        execute_intelligent_trade(signal_data, price_data)
+    return True
 
 
 def main():
@@ -1616,7 +2041,7 @@ def main():
     print("融合技术指标策略 + OKX实盘接口")
 
     if TRADE_CONFIG['test_mode']:
-        print("当前为模拟模式，不会真实下单")
+        print(f"当前为模拟模式，订单在本地模拟交易所撮合，不会真实下单（账户状态: {TRADE_CONFIG['simulator']['state_file']}）")
     else:
         print("实盘交易模式，请谨慎操作！")
 
@@ -1627,6 +2052,9 @@ def main():
     if not setup_exchange():
         print("交易所初始化失败，程序退出")
         return
+
+    # 启动WebSocket行情推送
+    start_market_feed()
     
     # 初始化Web界面数据文件
     print("🌐 初始化Web界面数据...")
@@ -1678,14 +2106,11 @@ def main():
         print(f"⚠️ Web界面数据初始化失败: {e}")
         print("继续运行，将在首次交易时创建数据")
 
-    print("执行频率: 每15分钟整点执行")
+    print(f"执行频率: 每根{TRADE_CONFIG['timeframe']}K线收盘时执行")
 
     # 循环执行（不使用schedule）
     while True:
-        trading_bot()  # 函数内部会自己等待整点
-
-        # 执行完后等待一段时间再检查（避免频繁循环）
-        time.sleep(60)  # 每分钟检查一次
+        trading_bot()  # 函数内部会等待K线收盘
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+"""
+时间序列降采样 - LTTB（Largest-Triangle-Three-Buckets）
+把曲线压缩到固定点数，保留峰值和谷值，图表数据量不随历史长度增长
+"""
+import numpy as np
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    LTTB降采样，返回保留点的下标
+
+    参数:
+        x: 横坐标（单调递增，时间可先转为数值）
+        y: 纵坐标
+        threshold: 目标点数（含首尾两点）
+
+    返回:
+        np.ndarray: 升序下标，点数不超过threshold时返回全部下标
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 首尾之外的点均分为threshold-2个桶
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+
+    # 每个桶的均值（向量化），最后一个桶的"下一桶"为末点
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # 每个桶依赖上一个桶选中的点，桶内三角形面积向量化计算
+    a = 0
+    for i in range(threshold - 2):
+        start, end = starts[i], ends[i]
+        xa, ya = x[a], y[a]
+        area = np.abs((xa - next_x[i]) * (y[start:end] - ya) - (xa - x[start:end]) * (next_y[i] - ya))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def lttb(x, y, threshold: int):
+    """LTTB降采样，返回 (x, y)"""
+    index = lttb_indices(x, y, threshold)
+    return np.asarray(x)[index], np.asarray(y)[index]
@@ -0,0 +1,150 @@
+"""
+权益历史分级汇总
+原始快照只保留48小时，更早的数据汇总为1小时K线（开高低收），再汇总为日K线；
+写入快照时增量更新，长时间范围的查询只读取少量汇总数据，同时保留完整历史
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+RAW_RETENTION = timedelta(hours=48)  # 原始快照保留时长
+
+# 汇总级别（由细到粗）：名称 -> 时间桶长度
+TIERS = {
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+# 查询时间跨度不超过该值时使用对应精度（由细到粗依次判断）
+RESOLUTION_SPANS = (
+    ('raw', RAW_RETENTION),
+    ('1h', timedelta(days=90)),
+    ('1d', None),
+)
+
+
+def bucket_start(timestamp: str, tier: str) -> str:
+    """快照时间所属时间桶的起始时间"""
+    dt = datetime.strptime(timestamp, TIME_FORMAT)
+    if tier == '1h':
+        dt = dt.replace(minute=0, second=0)
+    elif tier == '1d':
+        dt = dt.replace(hour=0, minute=0, second=0)
+    else:
+        raise ValueError(f"未知汇总级别: {tier}")
+    return dt.strftime(TIME_FORMAT)
+
+
+def bucket_end(bucket: str, tier: str) -> str:
+    """时间桶结束时间（不含）"""
+    return (datetime.strptime(bucket, TIME_FORMAT) + TIERS[tier]).strftime(TIME_FORMAT)
+
+
+def new_bar(bucket: str, equity: float) -> Dict:
+    return {'timestamp': bucket, 'open': equity, 'high': equity, 'low': equity,
+            'close': equity, 'equity': equity, 'count': 1}
+
+
+def update_bar(bar: Dict, equity: float) -> Dict:
+    """把一个快照并入K线（原地更新）"""
+    bar['high'] = max(bar['high'], equity)
+    bar['low'] = min(bar['low'], equity)
+    bar['close'] = equity
+    bar['equity'] = equity  # 与原始快照字段一致，图表直接使用
+    bar['count'] += 1
+    return bar
+
+
+def choose_resolution(span: Optional[timedelta]) -> str:
+    """按查询时间跨度选择精度：48小时内用原始快照，90天内用小时K线，更长用日K线"""
+    if span is None:
+        return '1d'
+    for resolution, max_span in RESOLUTION_SPANS:
+        if max_span is None or span <= max_span:
+            return resolution
+    return '1d'
+
+
+def closed_bars(bars: List[Dict], tier: str, latest: Optional[str]) -> List[Dict]:
+    """去掉最新快照所在的未收盘K线（其区间由更细的数据补充）"""
+    if latest is None:
+        return bars
+    return [bar for bar in bars if bucket_end(bar['timestamp'], tier) <= latest]
+
+
+def merge_series(*tier_series: Tuple[str, List[Dict]]) -> List[Dict]:
+    """
+    合并不同精度的序列，例如日K线 + 最近一天内的小时K线 + 最近一小时内的原始快照
+
+    参数:
+        tier_series: (tier, records) 由粗到细传入，原始快照的tier为'raw'；
+            每个更细的序列只补充上一级覆盖范围之后的数据
+    """
+    merged = []
+    covered_until = None
+    for tier, series in tier_series:
+        if covered_until is not None:
+            series = [r for r in series if r['timestamp'] >= covered_until]
+        if not series:
+            continue
+        merged.extend(series)
+        last = series[-1]['timestamp']
+        covered_until = bucket_end(last, tier) if tier in TIERS else last
+    return merged
+
+
+class EquityRollup:
+    """增量汇总：维护各级别当前未收盘的K线，时间桶切换时输出已收盘的K线"""
+
+    def __init__(self):
+        self.open_bars = {tier: None for tier in TIERS}
+
+    def _feed(self, tier: str, timestamp: str, equity: float) -> Optional[Dict]:
+        """把快照并入该级别的当前K线，时间桶切换时返回收盘的K线"""
+        bucket = bucket_start(timestamp, tier)
+        bar = self.open_bars[tier]
+        if bar is not None and bar['timestamp'] == bucket:
+            update_bar(bar, equity)
+            return None
+        if bar is not None and bar['timestamp'] > bucket:
+            # 早于当前K线的快照（时钟回拨）忽略
+            return None
+        self.open_bars[tier] = new_bar(bucket, equity)
+        return bar
+
+    def add(self, timestamp: str, equity: float) -> Dict[str, Dict]:
+        """
+        并入一个快照
+
+        返回:
+            {tier: bar}: 本次收盘的K线
+        """
+        closed = {}
+        for tier in TIERS:
+            bar = self._feed(tier, timestamp, equity)
+            if bar is not None:
+                closed[tier] = bar
+        return closed
+
+    def recover(self, raw_records: List[Dict], last_closed: Dict[str, Optional[str]]) -> Dict[str, List[Dict]]:
+        """
+        重启后从原始快照恢复未收盘的K线
+
+        参数:
+            raw_records: 保留的原始快照（时间正序）
+            last_closed: {tier: 已保存的最后一根K线的时间桶}
+
+        返回:
+            {tier: [bar, ...]}: 已收盘但尚未保存的K线（如停机前最后一根K线）
+        """
+        closed = {tier: [] for tier in TIERS}
+        for tier in TIERS:
+            self.open_bars[tier] = None
+            for record in raw_records:
+                if last_closed.get(tier) is not None and bucket_start(record['timestamp'], tier) <= last_closed[tier]:
+                    continue
+                bar = self._feed(tier, record['timestamp'], record['equity'])
+                if bar is not None:
+                    closed[tier].append(bar)
+        return closed
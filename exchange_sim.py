@@ -0,0 +1,625 @@
+"""
+本地模拟交易所（OKX永续合约，单向持仓 + 全仓）
+实现交易程序用到的ccxt接口：fetch_ohlcv、fetch_ticker、fetch_balance、fetch_positions、
+create_market_order、set_leverage、set_position_mode、load_markets，以及OKX条件单接口
+private_post_trade_order_algo、private_get_trade_orders_algo_pending、private_post_trade_cancel_algos。
+
+撮合引擎：市价单按当前价格（加滑点）立即成交并收取手续费；条件单（止盈止损）按行情K线的
+最高/最低价触发，开盘跳空越过触发价按开盘价成交，同一根K线同时触及止盈和止损时先止损。
+
+行情来源：
+    LiveFeed    真实交易所的公共行情 + 1分钟K线判断触发（模拟盘，test_mode使用，不需要API密钥）
+    ReplayFeed  历史K线回放，step()逐根推进（压力测试、离线运行）
+
+    python exchange_sim.py load-test data/btc_1h.csv --bots 200
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import ccxt
+import numpy as np
+
+from market_data import load_ohlcv_file
+
+INITIAL_BALANCE = 10000.0  # 模拟账户初始资金（USDT）
+TAKER_FEE_RATE = 0.0005  # OKX永续合约吃单手续费率
+FUNDING_RATE = 0.0001  # 每8小时资金费率（费率为正时多头支付空头）
+FUNDING_INTERVAL_MS = 8 * 3600 * 1000  # 资金费结算间隔（UTC 0/8/16点）
+CONTRACT_SIZE = 0.01  # BTC-USDT-SWAP 1张 = 0.01 BTC
+MIN_AMOUNT = 0.01  # 最小下单张数
+
+LIVE_POLL_INTERVAL = 5  # LiveFeed拉取1分钟K线的最短间隔（秒）
+
+# OKX错误信息（交易程序按文本判断）
+NO_POSITION_ERROR = "okx {\"code\":\"1\",\"msg\":\"Order failed because you don't have any positions in this direction for this contract to reduce or close.\"}"
+
+
+def to_inst_id(symbol: str) -> str:
+    """BTC/USDT:USDT -> BTC-USDT-SWAP"""
+    return symbol.replace('/USDT:USDT', '-USDT-SWAP').replace('/', '-')
+
+
+class ReplayFeed:
+    """
+    历史K线回放：cursor为当前（未收盘）K线，之前的K线已收盘
+
+    当前K线只公开开盘价（避免未来数据），step()把当前K线收盘并前进一根，
+    收盘K线的最高/最低价用于判断条件单触发
+    """
+
+    def __init__(self, candles: Dict[str, np.ndarray], timeframe: str = '1h', start: int = 168):
+        """
+        参数:
+            candles: market_data.load_ohlcv_file返回的K线数组（多个模拟账户可共用）
+            start: 起始K线下标（之前的K线作为历史数据）
+        """
+        self.candles = candles
+        self.timeframe = timeframe
+        self.timeframes = {timeframe: timeframe}
+        self.timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.cursor = min(max(start, 1), len(candles['close']) - 1)
+        self._emitted = self.cursor  # 已用于判断触发的K线（不含）
+
+    def parse_timeframe(self, timeframe: str) -> int:
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self) -> int:
+        return int(self.candles['timestamp'][self.cursor])
+
+    def finished(self) -> bool:
+        return self.cursor >= len(self.candles['close']) - 1
+
+    def step(self) -> bool:
+        """当前K线收盘，前进到下一根；已到最后一根返回False"""
+        if self.finished():
+            return False
+        self.cursor += 1
+        return True
+
+    def price(self) -> float:
+        return float(self.candles['open'][self.cursor])
+
+    def bar(self, index: int) -> List[float]:
+        c = self.candles
+        return [int(c['timestamp'][index]), float(c['open'][index]), float(c['high'][index]),
+                float(c['low'][index]), float(c['close'][index]), float(c['volume'][index])]
+
+    def updates(self) -> List[List[float]]:
+        """上次调用之后收盘的K线"""
+        bars = [self.bar(i) for i in range(self._emitted, self.cursor)]
+        self._emitted = self.cursor
+        return bars
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', since: int = None, limit: int = None,
+                    params: Dict = None) -> List[List[float]]:
+        """已收盘K线 + 当前K线（开高低收均为开盘价）"""
+        if timeframe != self.timeframe:
+            raise ccxt.BadRequest(f"回放行情只有{self.timeframe}周期K线")
+        timestamps = self.candles['timestamp']
+        first = 0 if since is None else int(np.searchsorted(timestamps[:self.cursor + 1], since, side='left'))
+        if limit is not None:
+            first = max(first, self.cursor + 1 - limit) if since is None else first
+        rows = [self.bar(i) for i in range(first, self.cursor)]
+        current = self.price()
+        rows.append([int(timestamps[self.cursor]), current, current, current, current, 0.0])
+        return rows[:limit] if limit is not None else rows
+
+    def fetch_ticker(self, symbol: str, params: Dict = None) -> Dict:
+        previous_close = float(self.candles['close'][self.cursor - 1])
+        last = self.price()
+        return {'symbol': symbol, 'timestamp': self.milliseconds(), 'last': last, 'close': last,
+                'percentage': (last / previous_close - 1) * 100 if previous_close else 0}
+
+    def load_markets(self) -> Dict:
+        return {}
+
+
+class LiveFeed:
+    """真实交易所的公共行情（不需要API密钥），条件单按下单后的1分钟K线判断触发"""
+
+    def __init__(self, exchange, symbol: str, poll_interval: float = LIVE_POLL_INTERVAL):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.poll_interval = poll_interval
+        self.timeframes = getattr(exchange, 'timeframes', {})
+        self._since = None  # 下一次拉取1分钟K线的起点（含最新的未收盘K线）
+        self._last_poll = 0
+        self._last_price = None
+
+    def parse_timeframe(self, timeframe: str) -> int:
+        return self.exchange.parse_timeframe(timeframe)
+
+    def milliseconds(self) -> int:
+        return self.exchange.milliseconds()
+
+    def price(self) -> float:
+        if self._last_price is None:
+            self._last_price = float(self.exchange.fetch_ticker(self.symbol)['last'])
+        return self._last_price
+
+    def updates(self) -> List[List[float]]:
+        """上次调用之后的1分钟K线（最新一根未收盘K线下次会再次返回，间隔内重复调用返回空）"""
+        now = time.time()
+        if now - self._last_poll < self.poll_interval:
+            return []
+        self._last_poll = now
+        try:
+            if self._since is None:
+                rows = self.exchange.fetch_ohlcv(self.symbol, '1m', limit=1)
+            else:
+                rows = self.exchange.fetch_ohlcv(self.symbol, '1m', since=self._since)
+        except Exception as e:
+            print(f"模拟交易所获取1分钟K线失败: {e}")
+            return []
+        if rows:
+            self._since = int(rows[-1][0])
+            self._last_price = float(rows[-1][4])
+        return rows
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: int = None, limit: int = None,
+                    params: Dict = None) -> List[List[float]]:
+        return self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit, params=params or {})
+
+    def fetch_ticker(self, symbol: str, params: Dict = None) -> Dict:
+        ticker = self.exchange.fetch_ticker(symbol, params or {})
+        if ticker.get('last'):
+            self._last_price = float(ticker['last'])
+        return ticker
+
+    def load_markets(self) -> Dict:
+        return self.exchange.load_markets()
+
+
+class SimulatedExchange:
+    """
+    模拟OKX交易所（单个合约，线程安全）
+
+    每次调用接口前先用行情来源的新K线判断条件单触发和结算资金费；
+    state_file给出时账户状态在每次变化后保存，重启后继续使用
+    """
+
+    def __init__(self, feed, symbol: str = 'BTC/USDT:USDT', balance: float = INITIAL_BALANCE,
+                 fee_rate: float = TAKER_FEE_RATE, funding_rate: float = FUNDING_RATE, slippage: float = 0.0,
+                 contract_size: float = CONTRACT_SIZE, min_amount: float = MIN_AMOUNT, leverage: float = 10,
+                 state_file: Optional[str] = None, verbose: bool = True):
+        self.feed = feed
+        self.symbol = symbol
+        self.inst_id = to_inst_id(symbol)
+        self.timeframes = feed.timeframes
+        self.fee_rate = fee_rate
+        self.funding_rate = funding_rate
+        self.slippage = slippage
+        self.contract_size = contract_size
+        self.min_amount = min_amount
+        self.state_file = state_file
+        self.verbose = verbose
+
+        self.state = {
+            'balance': balance,  # 已实现余额（含手续费和资金费）
+            'leverage': leverage,
+            'side': None,
+            'contracts': 0.0,
+            'entry_price': 0.0,
+            'algo_orders': {},  # algoId -> OKX条件单字段
+            'next_id': 1,
+            'fees': 0.0,
+            'funding': 0.0,
+            'last_funding': 0,  # 最近一次已结算资金费的K线时间戳（LiveFeed会重复返回未收盘K线）
+            'fills': 0,
+            'triggered': 0
+        }
+        self._lock = threading.RLock()
+        self._load_state()
+
+    # ------------------------------------------------------------------
+    # 状态
+    # ------------------------------------------------------------------
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.state.update(json.load(f))
+            print(f"📂 已恢复模拟账户: 余额{self.state['balance']:.2f} USDT, 持仓{self.state['side'] or '无'}")
+        except Exception as e:
+            print(f"读取模拟账户状态失败: {e}")
+
+    def _save_state(self):
+        if not self.state_file:
+            return
+        try:
+            directory = os.path.dirname(self.state_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.state_file}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False)
+            os.replace(temp_path, self.state_file)
+        except Exception as e:
+            print(f"保存模拟账户状态失败: {e}")
+
+    def _next_id(self) -> str:
+        order_id = str(self.state['next_id'])
+        self.state['next_id'] += 1
+        return order_id
+
+    # ------------------------------------------------------------------
+    # 撮合
+    # ------------------------------------------------------------------
+    def _direction(self) -> int:
+        return 1 if self.state['side'] == 'long' else -1
+
+    def _unrealized_pnl(self, price: float) -> float:
+        state = self.state
+        if state['side'] is None:
+            return 0.0
+        return self._direction() * (price - state['entry_price']) * state['contracts'] * self.contract_size
+
+    def _margin(self) -> float:
+        state = self.state
+        return state['entry_price'] * state['contracts'] * self.contract_size / state['leverage']
+
+    def _fill(self, side: str, amount: float, price: float, reduce_only: bool = False) -> Dict:
+        """按价格成交（单向持仓：反向成交先平仓，超出部分反向开仓）"""
+        state = self.state
+        amount, price = round(float(amount), 8), float(price)
+        closing = state['side'] is not None and (side == 'sell') == (state['side'] == 'long')
+        if reduce_only and not closing:
+            raise ccxt.InvalidOrder(NO_POSITION_ERROR)
+
+        fill_price = price * (1 + self.slippage) if side == 'buy' else price * (1 - self.slippage)
+        fee = fill_price * amount * self.contract_size * self.fee_rate
+        state['balance'] -= fee
+        state['fees'] += fee
+        state['fills'] += 1
+
+        remaining = amount
+        if closing:
+            closed = min(remaining, state['contracts'])
+            state['balance'] += self._direction() * (fill_price - state['entry_price']) * closed * self.contract_size
+            state['contracts'] = round(state['contracts'] - closed, 8)
+            remaining = 0 if reduce_only else round(remaining - closed, 8)
+            if state['contracts'] <= 0:
+                state['side'], state['contracts'], state['entry_price'] = None, 0.0, 0.0
+
+        if remaining > 0:
+            new_side = 'long' if side == 'buy' else 'short'
+            if state['side'] == new_side:
+                total = state['contracts'] + remaining
+                state['entry_price'] = (state['entry_price'] * state['contracts'] + fill_price * remaining) / total
+                state['contracts'] = round(total, 8)
+            else:
+                state['side'], state['contracts'], state['entry_price'] = new_side, remaining, fill_price
+
+        return {
+            'id': self._next_id(),
+            'symbol': self.symbol,
+            'type': 'market',
+            'side': side,
+            'amount': amount,
+            'filled': amount,
+            'remaining': 0.0,
+            'price': fill_price,
+            'average': fill_price,
+            'status': 'closed',
+            'timestamp': self.feed.milliseconds(),
+            'fee': {'cost': fee, 'currency': 'USDT'},
+            'reduceOnly': reduce_only,
+            'info': {}
+        }
+
+    def _trigger(self, bar: List[float]):
+        """用一根K线判断条件单触发（按下单顺序）"""
+        timestamp, open_, high, low = bar[0], bar[1], bar[2], bar[3]
+        for algo_id in list(self.state['algo_orders']):
+            order = self.state['algo_orders'].get(algo_id)
+            if order is None:
+                continue
+            sl = float(order['slTriggerPx']) if order.get('slTriggerPx') else None
+            tp = float(order['tpTriggerPx']) if order.get('tpTriggerPx') else None
+            if order['side'] == 'sell':  # 平多：价格下跌触发止损，上涨触发止盈
+                gap_sl, sl_hit = sl is not None and open_ <= sl, sl is not None and low <= sl
+                gap_tp, tp_hit = tp is not None and open_ >= tp, tp is not None and high >= tp
+            else:  # 平空
+                gap_sl, sl_hit = sl is not None and open_ >= sl, sl is not None and high >= sl
+                gap_tp, tp_hit = tp is not None and open_ <= tp, tp is not None and low <= tp
+
+            if gap_sl or gap_tp:
+                price = open_
+            elif sl_hit:
+                price = sl
+            elif tp_hit:
+                price = tp
+            else:
+                continue
+
+            del self.state['algo_orders'][algo_id]
+            self.state['triggered'] += 1
+            try:
+                self._fill(order['side'], float(order['sz']), price, reduce_only=order.get('reduceOnly') == 'true')
+                if self.verbose:
+                    kind = '止损' if (gap_sl or (sl_hit and not gap_tp)) else '止盈'
+                    print(f"🎯 模拟{kind}单{algo_id}触发: {order['side']} {order['sz']}张 @ {price:.2f}")
+            except ccxt.InvalidOrder:
+                # 只减仓条件单触发时已没有对应持仓（OKX同样下单失败）
+                pass
+
+    def _sync(self):
+        """
+        处理行情来源的新K线：资金费结算和条件单触发
+        未收盘K线会被重复返回：资金费按时间戳只结算一次；条件单按更新后的最高/最低价重新判断
+        （已触发的条件单已删除，不会重复成交）
+        """
+        bars = self.feed.updates()
+        for bar in bars:
+            timestamp = int(bar[0])
+            if timestamp % FUNDING_INTERVAL_MS == 0 and timestamp > self.state['last_funding']:
+                self.state['last_funding'] = timestamp
+                if self.state['side'] is not None:
+                    payment = self._direction() * bar[1] * self.state['contracts'] * self.contract_size * self.funding_rate
+                    self.state['balance'] -= payment
+                    self.state['funding'] += payment
+            self._trigger(bar)
+        if bars:
+            self._save_state()
+
+    # ------------------------------------------------------------------
+    # 行情接口（转发给行情来源）
+    # ------------------------------------------------------------------
+    def parse_timeframe(self, timeframe: str) -> int:
+        return self.feed.parse_timeframe(timeframe)
+
+    def milliseconds(self) -> int:
+        return self.feed.milliseconds()
+
+    def load_markets(self, reload: bool = False) -> Dict:
+        markets = dict(self.feed.load_markets() or {})
+        market = copy.deepcopy(markets.get(self.symbol, {}))
+        market.update(symbol=self.symbol, id=self.inst_id, contract=True, swap=True)
+        market.setdefault('contractSize', self.contract_size)
+        market.setdefault('limits', {}).setdefault('amount', {}).setdefault('min', self.min_amount)
+        self.contract_size = float(market['contractSize'])
+        self.min_amount = float(market['limits']['amount']['min'] or self.min_amount)
+        markets[self.symbol] = market
+        return markets
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since: int = None, limit: int = None,
+                    params: Dict = None) -> List[List[float]]:
+        with self._lock:
+            self._sync()
+        return self.feed.fetch_ohlcv(symbol, timeframe, since=since, limit=limit, params=params)
+
+    def fetch_ticker(self, symbol: str, params: Dict = None) -> Dict:
+        with self._lock:
+            self._sync()
+        return self.feed.fetch_ticker(symbol, params)
+
+    # ------------------------------------------------------------------
+    # 账户接口
+    # ------------------------------------------------------------------
+    def fetch_balance(self, params: Dict = None) -> Dict:
+        with self._lock:
+            self._sync()
+            total = self.state['balance'] + self._unrealized_pnl(self.feed.price())
+            used = self._margin()
+            usdt = {'free': total - used, 'used': used, 'total': total}
+            return {'USDT': usdt, 'free': {'USDT': usdt['free']}, 'used': {'USDT': used},
+                    'total': {'USDT': total}, 'info': {}}
+
+    def fetch_positions(self, symbols: List[str] = None, params: Dict = None) -> List[Dict]:
+        with self._lock:
+            self._sync()
+            state = self.state
+            if state['side'] is None or (symbols and self.symbol not in symbols):
+                return []
+            price = self.feed.price()
+            return [{
+                'symbol': self.symbol,
+                'side': state['side'],
+                'contracts': state['contracts'],
+                'contractSize': self.contract_size,
+                'entryPrice': state['entry_price'],
+                'markPrice': price,
+                'notional': state['contracts'] * self.contract_size * price,
+                'unrealizedPnl': self._unrealized_pnl(price),
+                'leverage': state['leverage'],
+                'marginMode': 'cross',
+                'mgnMode': 'cross',
+                'info': {'instId': self.inst_id, 'mgnMode': 'cross'}
+            }]
+
+    def set_leverage(self, leverage: float, symbol: str = None, params: Dict = None) -> Dict:
+        with self._lock:
+            self.state['leverage'] = float(leverage)
+            self._save_state()
+        return {'code': '0', 'msg': '', 'data': [{'lever': str(leverage), 'mgnMode': 'cross', 'instId': self.inst_id}]}
+
+    def set_position_mode(self, hedged: bool, symbol: str = None, params: Dict = None) -> Dict:
+        if hedged:
+            raise ccxt.NotSupported("模拟交易所只支持单向持仓")
+        return {'code': '0', 'msg': '', 'data': [{'posMode': 'net_mode'}]}
+
+    def create_market_order(self, symbol: str, side: str, amount: float, price: float = None,
+                            params: Dict = None) -> Dict:
+        params = params or {}
+        if symbol != self.symbol:
+            raise ccxt.BadSymbol(f"模拟交易所只支持{self.symbol}")
+        if side not in ('buy', 'sell'):
+            raise ccxt.InvalidOrder(f"无效的下单方向: {side}")
+        if amount < self.min_amount:
+            raise ccxt.InvalidOrder(f"下单数量{amount}小于最小值{self.min_amount}")
+
+        with self._lock:
+            self._sync()
+            price = self.feed.price()
+            reduce_only = bool(params.get('reduceOnly'))
+            opening = not reduce_only and not (
+                self.state['side'] is not None and (side == 'sell') == (self.state['side'] == 'long')
+                and amount <= self.state['contracts'])
+            if opening:
+                # 保证金检查：成交后的持仓保证金不超过权益
+                equity = self.state['balance'] + self._unrealized_pnl(price)
+                contracts_after = abs((self.state['contracts'] * self._direction() if self.state['side'] else 0)
+                                      + (amount if side == 'buy' else -amount))
+                if contracts_after * self.contract_size * price / self.state['leverage'] > equity:
+                    raise ccxt.InsufficientFunds("okx {\"code\":\"1\",\"msg\":\"Insufficient margin\"}")
+            order = self._fill(side, amount, price, reduce_only=reduce_only)
+            self._save_state()
+            return order
+
+    # ------------------------------------------------------------------
+    # OKX条件单接口（返回OKX原始格式）
+    # ------------------------------------------------------------------
+    def private_post_trade_order_algo(self, params: Dict) -> Dict:
+        if params.get('ordType') != 'conditional':
+            return {'code': '1', 'msg': f"模拟交易所不支持的条件单类型: {params.get('ordType')}", 'data': []}
+        if params.get('instId') != self.inst_id:
+            return {'code': '1', 'msg': f"模拟交易所只支持{self.inst_id}", 'data': []}
+        if not params.get('slTriggerPx') and not params.get('tpTriggerPx'):
+            return {'code': '1', 'msg': "缺少slTriggerPx或tpTriggerPx", 'data': []}
+
+        with self._lock:
+            self._sync()
+            algo_id = self._next_id()
+            order = {key: str(value) for key, value in params.items()}
+            order.update(algoId=algo_id, state='live', cTime=str(self.feed.milliseconds()),
+                         instType='SWAP', reduceOnly=str(params.get('reduceOnly', 'false')).lower())
+            self.state['algo_orders'][algo_id] = order
+            self._save_state()
+        return {'code': '0', 'msg': '', 'data': [{'algoId': algo_id, 'sCode': '0', 'sMsg': ''}]}
+
+    def private_get_trade_orders_algo_pending(self, params: Dict = None) -> Dict:
+        params = params or {}
+        with self._lock:
+            self._sync()
+            orders = [dict(order) for order in self.state['algo_orders'].values()
+                      if order['ordType'] == params.get('ordType', order['ordType'])
+                      and order['instId'] == params.get('instId', order['instId'])]
+        return {'code': '0', 'msg': '', 'data': orders}
+
+    def private_post_trade_cancel_algos(self, params) -> Dict:
+        """params为 [{'algoId', 'instId'}, ...]，或交易程序使用的 {'params': [...]}"""
+        requests = params.get('params', []) if isinstance(params, dict) else params
+        results = []
+        with self._lock:
+            for request in requests:
+                order = self.state['algo_orders'].pop(str(request.get('algoId')), None)
+                if order is None:
+                    results.append({'algoId': request.get('algoId'), 'sCode': '51400', 'sMsg': '条件单不存在或已触发'})
+                else:
+                    results.append({'algoId': order['algoId'], 'sCode': '0', 'sMsg': ''})
+            self._save_state()
+        code = '0' if all(result['sCode'] == '0' for result in results) else '1'
+        return {'code': code, 'msg': '', 'data': results}
+
+    def stats(self) -> Dict:
+        """模拟账户统计"""
+        with self._lock:
+            price = self.feed.price()
+            return {
+                'equity': self.state['balance'] + self._unrealized_pnl(price),
+                'balance': self.state['balance'],
+                'side': self.state['side'],
+                'contracts': self.state['contracts'],
+                'fees': self.state['fees'],
+                'funding': self.state['funding'],
+                'fills': self.state['fills'],
+                'triggered': self.state['triggered'],
+                'pending_algo_orders': len(self.state['algo_orders'])
+            }
+
+
+# ----------------------------------------------------------------------
+# 压力测试：多个模拟账户共用一份回放K线，每根K线执行与交易周期相同的接口调用
+# ----------------------------------------------------------------------
+def _simulated_cycle(sim: SimulatedExchange, bot_index: int, bar_index: int):
+    """一个交易周期的接口调用：行情/余额/持仓/条件单查询，按固定节奏开仓反手并设置止盈止损"""
+    symbol = sim.symbol
+    rows = sim.fetch_ohlcv(symbol, sim.feed.timeframe, limit=168)
+    sim.fetch_balance()
+    positions = sim.fetch_positions([symbol])
+    sim.private_get_trade_orders_algo_pending({'instType': 'SWAP', 'instId': sim.inst_id, 'ordType': 'conditional'})
+
+    if (bar_index + bot_index) % 12:
+        return
+    price = rows[-1][4]
+    side = 'buy' if (bar_index // 12 + bot_index) % 2 == 0 else 'sell'
+    if positions:
+        pending = sim.private_get_trade_orders_algo_pending({'ordType': 'conditional'})['data']
+        sim.private_post_trade_cancel_algos({'params': [{'algoId': o['algoId'], 'instId': sim.inst_id} for o in pending]})
+        sim.create_market_order(symbol, 'sell' if positions[0]['side'] == 'long' else 'buy',
+                                positions[0]['contracts'], params={'reduceOnly': True})
+    sim.create_market_order(symbol, side, 0.1)
+    close_side = 'sell' if side == 'buy' else 'buy'
+    sign = 1 if side == 'buy' else -1
+    for key, pct in (('slTriggerPx', -0.02), ('tpTriggerPx', 0.05)):
+        sim.private_post_trade_order_algo({'instId': sim.inst_id, 'tdMode': 'cross', 'side': close_side,
+                                           'ordType': 'conditional', 'sz': '0.1', key: str(price * (1 + sign * pct)),
+                                           'reduceOnly': 'true'})
+
+
+def load_test(candles_path: str, bots: int = 100, bars: Optional[int] = None, timeframe: str = '1h') -> Dict:
+    """
+    多个模拟账户逐根K线执行交易周期的接口调用，统计吞吐
+
+    返回:
+        dict: 账户数、K线数、接口调用次数、耗时等
+    """
+    candles = load_ohlcv_file(candles_path)
+    sims = [SimulatedExchange(ReplayFeed(candles, timeframe), verbose=False) for _ in range(bots)]
+    calls = itertools.count()
+    for sim in sims:
+        # 统计接口调用次数
+        for name in ('fetch_ohlcv', 'fetch_balance', 'fetch_positions', 'create_market_order',
+                     'private_post_trade_order_algo', 'private_get_trade_orders_algo_pending',
+                     'private_post_trade_cancel_algos'):
+            method = getattr(sim, name)
+            setattr(sim, name, lambda *args, _method=method, **kwargs: (next(calls), _method(*args, **kwargs))[1])
+
+    total_bars = len(candles['close']) - 1 - sims[0].feed.cursor
+    steps = total_bars if bars is None else min(bars, total_bars)
+    started = time.perf_counter()
+    for bar_index in range(steps):
+        for bot_index, sim in enumerate(sims):
+            _simulated_cycle(sim, bot_index, bar_index)
+            sim.feed.step()
+    elapsed = time.perf_counter() - started
+
+    total_calls = next(calls)
+    equities = [sim.stats()['equity'] for sim in sims]
+    return {
+        'bots': bots,
+        'bars': steps,
+        'api_calls': total_calls,
+        'elapsed_seconds': round(elapsed, 3),
+        'calls_per_second': round(total_calls / elapsed) if elapsed else None,
+        'cycles_per_second': round(bots * steps / elapsed) if elapsed else None,
+        'triggered_orders': sum(sim.state['triggered'] for sim in sims),
+        'mean_equity': float(np.mean(equities))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟交易所')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load_parser = subparsers.add_parser('load-test', help='多个模拟账户回放K线的压力测试')
+    load_parser.add_argument('candles', help='K线文件（CSV/JSON/JSONL）')
+    load_parser.add_argument('--bots', type=int, default=100, help='模拟账户数')
+    load_parser.add_argument('--bars', type=int, help='回放K线数，默认全部')
+    load_parser.add_argument('--timeframe', default='1h', help='K线周期')
+    args = parser.parse_args()
+
+    result = load_test(args.candles, bots=args.bots, bars=args.bars, timeframe=args.timeframe)
+    print("📊 压力测试结果")
+    for key, value in result.items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+"""
+技术指标模块
+- StreamingIndicators: 增量计算，保存滚动和、EMA状态、涨跌滚动均值和单调队列，每根新K线以O(1)更新
+- calculate_indicators_batch: 多品种批量计算，N个品种的K线放在 (N × T) 数组中一次向量化完成
+计算结果与calculate_technical_indicators（pandas版本）一致
+"""
+import math
+import warnings
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+NAN = float('nan')
+
+
+class RollingWindow:
+    """滚动窗口：维护窗口内的和与平方和"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._pushes = 0
+
+    def push(self, x: float):
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        if len(self.values) > self.size:
+            out = self.values.popleft()
+            self.total -= out
+            self.total_sq -= out * out
+
+        # 定期按窗口重算，消除加减累计的浮点误差
+        self._pushes += 1
+        if self._pushes % self.size == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    def preview(self, x: float):
+        """假设追加x后的 (数量, 和, 平方和)，不修改状态"""
+        count = len(self.values) + 1
+        total = self.total + x
+        total_sq = self.total_sq + x * x
+        if count > self.size:
+            out = self.values[0]
+            total -= out
+            total_sq -= out * out
+            count = self.size
+        return count, total, total_sq
+
+    def mean(self, x: float, min_periods: int = None) -> float:
+        count, total, _ = self.preview(x)
+        if count < (self.size if min_periods is None else min_periods):
+            return NAN
+        return total / count
+
+    def std(self, x: float) -> float:
+        """样本标准差（ddof=1），窗口未满时为NaN"""
+        count, total, total_sq = self.preview(x)
+        if count < self.size or count < 2:
+            return NAN
+        var = (total_sq - total * total / count) / (count - 1)
+        return math.sqrt(var) if var > 0 else 0.0
+
+
+class RollingExtreme:
+    """滚动最大/最小值：单调队列"""
+
+    def __init__(self, size: int, is_max: bool):
+        self.size = size
+        self.is_max = is_max
+        self.queue = deque()  # (序号, 值)，值单调
+        self.count = 0
+
+    def _better(self, a: float, b: float) -> bool:
+        return a >= b if self.is_max else a <= b
+
+    def push(self, x: float):
+        while self.queue and self._better(x, self.queue[-1][1]):
+            self.queue.pop()
+        self.queue.append((self.count, x))
+        self.count += 1
+        while self.queue[0][0] <= self.count - 1 - self.size:
+            self.queue.popleft()
+
+    def preview(self, x: float) -> float:
+        """假设追加x后的窗口极值，窗口未满时为NaN"""
+        if self.count + 1 < self.size:
+            return NAN
+        # 追加后窗口为 [count+1-size, count]，队首最多有一个元素过期
+        for idx, value in self.queue:
+            if idx > self.count - self.size:
+                return value if self._better(value, x) else x
+        return x
+
+
+class EWMState:
+    """
+    指数移动平均（对应pandas ewm(span, adjust=True)）
+
+    window给出时只保留最近window个值（移出窗口的值减去其衰减后的权重），
+    与在window根K线的DataFrame上调用pandas ewm结果一致
+    """
+
+    def __init__(self, span: int, window: int = None):
+        self.decay = 1 - 2.0 / (span + 1)
+        self.window = window
+        self.values = deque()
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self._tail = self.decay ** window if window else 0.0  # 移出窗口的值的权重
+
+    def _next(self, x: float):
+        numerator = x + self.decay * self.numerator
+        denominator = 1 + self.decay * self.denominator
+        if self.window and len(self.values) >= self.window:
+            numerator -= self._tail * self.values[0]
+            denominator -= self._tail
+        return numerator, denominator
+
+    def preview(self, x: float) -> float:
+        numerator, denominator = self._next(x)
+        return numerator / denominator
+
+    def push(self, x: float):
+        self.numerator, self.denominator = self._next(x)
+        if self.window:
+            self.values.append(x)
+            if len(self.values) > self.window:
+                self.values.popleft()
+
+
+class StreamingIndicators:
+    """
+    增量技术指标引擎，只接收已收盘K线，未收盘K线通过snapshot临时计算
+
+    window为pandas版本计算所用的K线数（含未收盘K线）：EMA只使用窗口内的K线，
+    与calculate_technical_indicators一致（MACD信号线在窗口起点附近的MACD值使用的历史更长，
+    相对pandas版本的偏差约为价格的1e-6）；不给出时EMA使用全部历史
+    """
+
+    def __init__(self, window: int = None):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.last_timestamp = None
+        self.last_close = None
+        self.latest = None  # 最后一根已收盘K线的指标
+        self.sma_5 = RollingWindow(5)
+        self.close_20 = RollingWindow(20)
+        self.sma_50 = RollingWindow(50)
+        self.ema_12 = EWMState(12, self.window)
+        self.ema_26 = EWMState(26, self.window)
+        self.macd_signal = EWMState(9, self.window)
+        self.gain = RollingWindow(14)
+        self.loss = RollingWindow(14)
+        self.volume = RollingWindow(20)
+        self.high_low = RollingWindow(14)
+        self.resistance = RollingExtreme(20, is_max=True)
+        self.support = RollingExtreme(20, is_max=False)
+        self.last_valid = {}
+
+    def _gain_loss(self, close: float):
+        # 与pandas一致：首根K线的diff为NaN，计为0
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def _compute(self, bar) -> dict:
+        """计算追加bar后的最新指标，不修改状态"""
+        _, _, high, low, close, volume = bar[:6]
+        gain, loss = self._gain_loss(close)
+
+        ema_12 = self.ema_12.preview(close)
+        ema_26 = self.ema_26.preview(close)
+        macd = ema_12 - ema_26
+        macd_signal = self.macd_signal.preview(macd)
+
+        avg_gain = self.gain.mean(gain)
+        avg_loss = self.loss.mean(loss)
+        if math.isnan(avg_gain) or (avg_gain == 0 and avg_loss == 0):
+            rsi = NAN
+        elif avg_loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        bb_middle = self.close_20.mean(close)
+        bb_std = self.close_20.std(close)
+        bb_upper = bb_middle + bb_std * 2
+        bb_lower = bb_middle - bb_std * 2
+        bb_width = bb_upper - bb_lower
+        bb_position = (close - bb_lower) / bb_width if bb_width else NAN
+
+        volume_ma = self.volume.mean(volume)
+        volume_ratio = volume / volume_ma if volume_ma else NAN
+
+        return {
+            'close': close,
+            'sma_5': self.sma_5.mean(close, min_periods=1),
+            'sma_20': self.close_20.mean(close, min_periods=1),
+            'sma_50': self.sma_50.mean(close, min_periods=1),
+            'ema_12': ema_12,
+            'ema_26': ema_26,
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'macd_histogram': macd - macd_signal,
+            'rsi': rsi,
+            'bb_middle': bb_middle,
+            'bb_upper': bb_upper,
+            'bb_lower': bb_lower,
+            'bb_position': bb_position,
+            'volume_ma': volume_ma,
+            'volume_ratio': volume_ratio,
+            'resistance': self.resistance.preview(high),
+            'support': self.support.preview(low),
+            'atr': self.high_low.mean(high - low),
+        }
+
+    def _fill(self, values: dict) -> dict:
+        """NaN沿用最近一次有效值（对应pandas的ffill）"""
+        filled = {}
+        for key, value in values.items():
+            if value is None or math.isnan(value):
+                value = self.last_valid.get(key, NAN)
+            filled[key] = value
+        return filled
+
+    def push(self, bar) -> dict:
+        """
+        推入一根已收盘K线
+
+        参数:
+            bar: [timestamp, open, high, low, close, volume]
+        """
+        values = self._fill(self._compute(bar))
+        for key, value in values.items():
+            if not math.isnan(value):
+                self.last_valid[key] = value
+
+        _, _, high, low, close, volume = bar[:6]
+        gain, loss = self._gain_loss(close)
+        self.sma_5.push(close)
+        self.close_20.push(close)
+        self.sma_50.push(close)
+        self.ema_12.push(close)
+        self.ema_26.push(close)
+        self.macd_signal.push(values['macd'])
+        self.gain.push(gain)
+        self.loss.push(loss)
+        self.volume.push(volume)
+        self.high_low.push(high - low)
+        self.resistance.push(high)
+        self.support.push(low)
+
+        self.last_timestamp = int(bar[0])
+        self.last_close = close
+        self.latest = values
+        return values
+
+    def snapshot(self, bar) -> dict:
+        """以未收盘K线bar计算最新指标，不修改状态"""
+        return self._fill(self._compute(bar))
+
+    def sync(self, candles, last_closed: bool = False) -> dict:
+        """
+        与K线缓存同步：推入尚未处理的已收盘K线，并返回包含未收盘K线的最新指标
+
+        参数:
+            candles: 按时间排序的K线数组，最后一根为未收盘K线
+            last_closed: 最后一根K线已收盘（如WebSocket收盘推送时下一根K线尚未出现），一并推入状态
+
+        返回:
+            dict: 最新指标；last_closed时为最后一根收盘K线的指标
+        """
+        closed = candles if last_closed else candles[:-1]
+        if self.last_timestamp is not None and len(closed) and closed[0][0] > self.last_timestamp:
+            # 引擎落后于缓存窗口（如长时间断线），从窗口起点重新预热
+            self.reset()
+
+        for bar in closed:
+            if self.last_timestamp is None or bar[0] > self.last_timestamp:
+                self.push(bar)
+
+        if last_closed or (self.last_timestamp is not None and candles[-1][0] <= self.last_timestamp):
+            # 最后一根K线已推入状态（收盘后下一根K线尚未出现），不能再作为未收盘K线计算
+            return self.latest
+        return self.snapshot(candles[-1])
+
+
+def _rolling(values: np.ndarray, window: int, func, min_periods: int = None) -> np.ndarray:
+    """沿时间轴的滚动计算，窗口不足min_periods时为NaN（对应pandas rolling）"""
+    n, t = values.shape
+    padded = np.concatenate((np.full((n, window - 1), np.nan), values), axis=1)
+    windows = sliding_window_view(padded, window, axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        result = func(windows, axis=2)
+    counts = np.count_nonzero(~np.isnan(windows), axis=2)
+    result[counts < (window if min_periods is None else min_periods)] = np.nan
+    return result
+
+
+def _ewm(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数移动平均（对应pandas ewm(span, adjust=True)，支持左侧NaN填充）
+
+    递推 s_t = x_t + decay * s_{t-1} 分块展开为累加和，块长度保证decay的负幂不溢出，
+    长历史（回测）只需少量向量化运算
+    """
+    decay = 1 - 2.0 / (span + 1)
+    n, t = values.shape
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    w = valid.astype(np.float64)
+
+    result = np.full(values.shape, np.nan)
+    numerator = np.zeros((n, 1))
+    denominator = np.zeros((n, 1))
+    block = max(1, int(50 / -np.log(decay)))  # decay^-block 不超过 e^50
+    for start in range(0, t, block):
+        end = min(start + block, t)
+        powers = decay ** np.arange(end - start)  # 块内第k个元素的衰减 decay^k
+        numerator_block = powers * (numerator * decay + np.cumsum(x[:, start:end] / powers, axis=1))
+        denominator_block = powers * (denominator * decay + np.cumsum(w[:, start:end] / powers, axis=1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[:, start:end] = np.where(denominator_block > 0, numerator_block / denominator_block, np.nan)
+        numerator = numerator_block[:, -1:]
+        denominator = denominator_block[:, -1:]
+    return result
+
+
+def _fill(values: np.ndarray) -> np.ndarray:
+    """沿时间轴先向后填充再向前填充（对应pandas bfill().ffill()）"""
+    n, t = values.shape
+    rows = np.arange(n)[:, None]
+
+    # bfill：取每个位置之后第一个有效值
+    idx = np.where(~np.isnan(values), np.arange(t), t)
+    idx = np.minimum.accumulate(idx[:, ::-1], axis=1)[:, ::-1]
+    extended = np.concatenate((values, np.full((n, 1), np.nan)), axis=1)
+    values = extended[rows, idx]
+
+    # ffill：取每个位置之前最后一个有效值
+    idx = np.where(~np.isnan(values), np.arange(t), 0)
+    idx = np.maximum.accumulate(idx, axis=1)
+    return values[rows, idx]
+
+
+def calculate_indicators_batch(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                               volumes: np.ndarray) -> dict:
+    """
+    多品种批量计算技术指标
+
+    参数:
+        highs/lows/closes/volumes: (N × T) float64数组，每行一个品种，
+            K线数量不足T的品种在左侧以NaN填充
+
+    返回:
+        dict: 指标名 -> (N × T) 数组，列与calculate_technical_indicators一致，另含atr
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    padding = np.isnan(closes)
+
+    ind = {
+        'close': closes,
+        'sma_5': _rolling(closes, 5, np.nanmean, min_periods=1),
+        'sma_20': _rolling(closes, 20, np.nanmean, min_periods=1),
+        'sma_50': _rolling(closes, 50, np.nanmean, min_periods=1),
+        'ema_12': _ewm(closes, 12),
+        'ema_26': _ewm(closes, 26),
+    }
+    ind['macd'] = ind['ema_12'] - ind['ema_26']
+    ind['macd_signal'] = _ewm(ind['macd'], 9)
+    ind['macd_histogram'] = ind['macd'] - ind['macd_signal']
+
+    # RSI：与pandas一致，首根K线的diff计为0，填充位置为NaN
+    delta = np.diff(closes, axis=1, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[padding] = np.nan
+    loss[padding] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rs = _rolling(gain, 14, np.mean) / _rolling(loss, 14, np.mean)
+        ind['rsi'] = 100 - (100 / (1 + rs))
+
+        # 布林带
+        ind['bb_middle'] = _rolling(closes, 20, np.mean)
+        bb_std = _rolling(closes, 20, lambda w, axis: np.std(w, axis=axis, ddof=1))
+        ind['bb_upper'] = ind['bb_middle'] + bb_std * 2
+        ind['bb_lower'] = ind['bb_middle'] - bb_std * 2
+        ind['bb_position'] = (closes - ind['bb_lower']) / (ind['bb_upper'] - ind['bb_lower'])
+
+        # 成交量均线
+        ind['volume_ma'] = _rolling(volumes, 20, np.mean)
+        ind['volume_ratio'] = volumes / ind['volume_ma']
+
+    # 支撑阻力位
+    ind['resistance'] = _rolling(highs, 20, np.max)
+    ind['support'] = _rolling(lows, 20, np.min)
+
+    # ATR（identify_market_state使用，不参与填充）
+    atr = _rolling(highs - lows, 14, np.mean)
+
+    for key, value in ind.items():
+        ind[key] = _fill(value)
+    ind['atr'] = atr
+    return ind
@@ -0,0 +1,214 @@
+"""
+追加写日志模块 - JSONL格式
+每条记录一行，写入只追加不重写整个文件；fsync按批次/时间间隔合并执行，
+定期压缩（只保留最近N条）时写入临时文件后原子替换。
+读取端可从字节偏移量继续读取新增记录（tail），半行（写入中断）会被跳过。
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def _parse_lines(data: bytes) -> Tuple[List[Dict], int]:
+    """
+    解析完整的行
+
+    返回:
+        (records, consumed): 记录列表和已消费的字节数（不含末尾不完整的行）
+    """
+    end = data.rfind(b'\n') + 1
+    records = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # 损坏的行直接跳过，压缩时会被清理
+            continue
+    return records, end
+
+
+def tail(path: str, offset: int = 0) -> Tuple[List[Dict], int]:
+    """
+    从字节偏移量读取新增记录
+
+    返回:
+        (records, new_offset): 新记录和下次读取的偏移量；文件被压缩（变小）时从头读取
+    """
+    if not os.path.exists(path):
+        return [], 0
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset > size:
+            offset = 0
+        f.seek(offset)
+        records, consumed = _parse_lines(f.read())
+    return records, offset + consumed
+
+
+class Journal:
+    """追加写JSONL日志（单进程写入，多进程读取）"""
+
+    def __init__(self, path: str, fsync_batch: int = 20, fsync_interval: float = 5.0,
+                 max_records: Optional[int] = None):
+        """
+        参数:
+            path: 日志文件路径
+            fsync_batch: 累计多少条未落盘记录时fsync
+            fsync_interval: 距上次fsync超过该秒数时fsync
+            max_records: 保留的最大记录数，超过2倍时压缩；None表示保留全部
+        """
+        self.path = path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.max_records = max_records
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self.count = 0
+
+        self._open()
+        atexit.register(self.close)
+
+    def _open(self):
+        """打开日志，截掉写入中断留下的半行"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.count = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            records, consumed = _parse_lines(data)
+            self.count = len(records)
+            if consumed < len(data):
+                with open(self.path, 'r+b') as f:
+                    f.truncate(consumed)
+                print(f"⚠️ {self.path} 末尾存在不完整记录，已截断")
+
+        self._file = open(self.path, 'ab')
+
+    def append(self, record: Dict):
+        """追加一条记录（O(1)）"""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            self._file.write(line)
+            # flush后其他进程即可读到，fsync批量执行
+            self._file.flush()
+            self.count += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_batch or time.time() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+        if self.max_records is not None and self.count > self.max_records * 2:
+            self.compact()
+
+    def _sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.time()
+
+    def sync(self):
+        """立即落盘"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._sync()
+
+    def read_all(self) -> List[Dict]:
+        records, _ = tail(self.path, 0)
+        return records
+
+    def compact(self, keep_last: Optional[int] = None, keep: Optional[Callable[[Dict], bool]] = None):
+        """
+        压缩日志：去掉损坏的行，原子替换
+
+        参数:
+            keep_last: 只保留最近N条（默认max_records）
+            keep: 只保留满足条件的记录（如按时间保留）
+        """
+        keep_last = self.max_records if keep_last is None else keep_last
+        with self._lock:
+            self._file.flush()
+            records = self.read_all()
+            if keep is not None:
+                records = [record for record in records if keep(record)]
+            if keep_last is not None:
+                records = records[-keep_last:] if keep_last > 0 else []
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'ab')
+            self.count = len(records)
+            self._unsynced = 0
+            self._last_sync = time.time()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.flush()
+                self._sync()
+                self._file.close()
+
+
+class JournalReader:
+    """增量读取日志（缓存已读记录，每次只解析新增部分）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.records = []
+        self._inode = None
+
+    def read(self) -> List[Dict]:
+        """返回全部记录；文件被压缩替换后自动重新读取"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.offset, self.records, self._inode = 0, [], None
+            return self.records
+
+        if stat.st_ino != self._inode or stat.st_size < self.offset:
+            self.offset, self.records = 0, []
+            self._inode = stat.st_ino
+
+        if stat.st_size > self.offset:
+            new_records, self.offset = tail(self.path, self.offset)
+            self.records.extend(new_records)
+        return self.records
+
+
+def migrate_json_array(json_path: str, journal: Journal) -> int:
+    """将旧版JSON数组文件导入空日志（只在日志为空时执行），返回导入条数"""
+    if journal.count > 0 or not os.path.exists(json_path):
+        return 0
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except Exception as e:
+        print(f"读取旧数据文件失败 {json_path}: {e}")
+        return 0
+
+    if not isinstance(records, list):
+        return 0
+    for record in records:
+        journal.append(record)
+    journal.sync()
+    if records:
+        print(f"📦 已将 {json_path} 的 {len(records)} 条记录迁移到 {journal.path}")
+    return len(records)
@@ -0,0 +1,119 @@
+"""
+AI回复缓存模块
+以量化后的行情特征（趋势、RSI区间、MACD方向、持仓状态等）为键缓存DeepSeek原始回复，
+行情没有实质变化的周期直接复用，TTL过期 + LRU淘汰，并持久化到磁盘
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def quantize(value, step: float):
+    """按步长量化数值，无效值返回None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value) or math.isinf(value):
+        return None
+    return int(math.floor(value / step))
+
+
+def quantize_price(price, pct: float):
+    """按百分比步长（对数刻度）量化价格，同一区间内价格相差不超过pct%"""
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return None
+    if not price > 0:
+        return None
+    return int(math.floor(math.log(price) / math.log(1 + pct / 100)))
+
+
+def build_cache_key(features: Dict) -> str:
+    """特征字典 -> 缓存键"""
+    raw = json.dumps(features, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class SemanticCache:
+    """AI回复缓存（TTL + LRU，持久化到JSON文件）"""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> {'response', 'features', 'created_at'}
+        self.hits = 0  # 本次运行的命中/未命中次数
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """从磁盘加载未过期的缓存"""
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                now = time.time()
+                for key, entry in data.get('entries', []):
+                    if now - entry['created_at'] <= self.ttl_seconds:
+                        self.entries[key] = entry
+        except Exception as e:
+            print(f"加载AI缓存失败: {e}")
+            self.entries.clear()
+
+    def save(self):
+        """写入临时文件后原子替换"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': list(self.entries.items())}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"保存AI缓存失败: {e}")
+
+    def get(self, key: str) -> Optional[str]:
+        """命中返回缓存的原始回复，未命中或已过期返回None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry['created_at'] > self.ttl_seconds:
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry['response']
+
+    def put(self, key: str, response: str, features: Dict = None):
+        with self._lock:
+            self.entries[key] = {
+                'response': response,
+                'features': features,
+                'created_at': time.time()
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.save()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0,
+            'entries': len(self.entries)
+        }
@@ -0,0 +1,207 @@
+"""
+异步LLM客户端 - 截止时间 + 对冲请求
+首个请求超过历史延迟的分位数仍未返回时补发对冲请求，取最先返回的有效结果；
+超过截止时间仍无有效结果时返回None，由调用方使用备用信号
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from openai import AsyncOpenAI, RateLimitError
+
+import metrics
+
+MIN_LATENCY_SAMPLES = 5  # 延迟样本少于该数量时使用默认对冲等待时间
+
+
+class HedgedLLMClient:
+    """OpenAI兼容接口的异步客户端（后台事件循环运行，对外提供同步接口）"""
+
+    def __init__(self, api_key: str, base_url: str, model: str,
+                 deadline: float = 20, hedge_percentile: float = 90,
+                 hedge_default_delay: float = 8, max_attempts: int = 3):
+        """
+        参数:
+            deadline: 单次调用截止时间（秒），包含对冲和重发
+            hedge_percentile: 首个请求超过该历史延迟分位数仍未返回时发出对冲请求
+            hedge_default_delay: 延迟样本不足时的对冲等待时间（秒）
+            max_attempts: 截止时间内最多发出的请求数（含对冲请求和失败后的重发）
+        """
+        self.model = model
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+        self.max_attempts = max_attempts
+
+        # 首次请求时创建（没有API密钥时也可导入，如回测）
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client = None
+
+        self.latencies = deque(maxlen=100)  # 成功请求的延迟（秒）
+        self.stats = {'calls': 0, 'requests': 0, 'hedges': 0, 'hedge_wins': 0,
+                      'invalid': 0, 'errors': 0, 'timeouts': 0}
+
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+    def complete(self, messages: List[Dict], validate: Callable = None,
+                 timeout: float = None, **kwargs) -> Optional[str]:
+        """
+        同步调用（在后台事件循环中执行）
+
+        参数:
+            messages: 对话消息
+            validate: 校验回复内容，返回假值表示无效（无效回复不会被采用）
+            timeout: 本次截止时间（秒），默认使用deadline
+
+        返回:
+            str: 最先返回的有效回复，截止时间内没有有效回复返回None
+        """
+        timeout = self.deadline if timeout is None else min(timeout, self.deadline)
+        future = asyncio.run_coroutine_threadsafe(
+            self.complete_async(messages, validate, timeout, **kwargs), self._ensure_loop())
+        try:
+            # 协程内部已处理截止时间，这里多留余量给取消请求
+            return future.result(timeout + 5)
+        except Exception as e:
+            future.cancel()
+            print(f"LLM调用异常: {e}")
+            return None
+
+    def hedge_delay(self) -> float:
+        """发出对冲请求前的等待时间：历史延迟的分位数"""
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return self.hedge_default_delay
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return ordered[index]
+
+    def latency_stats(self) -> Dict:
+        """延迟和请求统计"""
+        stats = dict(self.stats)
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            stats['p50'] = round(ordered[len(ordered) // 2], 3)
+            stats['hedge_delay'] = round(self.hedge_delay(), 3)
+        return stats
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # ------------------------------------------------------------------
+    # 异步实现
+    # ------------------------------------------------------------------
+    async def complete_async(self, messages: List[Dict], validate: Callable = None,
+                             timeout: float = None, **kwargs) -> Optional[str]:
+        """截止时间内发出主请求，必要时补发对冲请求，返回最先到达的有效回复"""
+        timeout = self.deadline if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self.stats['calls'] += 1
+
+        pending = set()
+        hedge_tasks = set()
+        attempts = 0
+
+        def launch(hedge=False):
+            nonlocal attempts
+            attempts += 1
+            self.stats['requests'] += 1
+            task = asyncio.ensure_future(self._request(messages, **kwargs))
+            pending.add(task)
+            if hedge:
+                self.stats['hedges'] += 1
+                metrics.LLM_HEDGES.inc()
+                hedge_tasks.add(task)
+
+        launch()
+        hedge_at = time.monotonic() + self.hedge_delay()
+
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+
+                # 全部失败且还有次数时立即重发；否则等到对冲时间点
+                if not pending:
+                    if attempts >= self.max_attempts:
+                        return None
+                    metrics.RETRIES.inc(kind='llm_resend')
+                    launch()
+                    hedge_at = time.monotonic() + self.hedge_delay()
+                    continue
+
+                can_hedge = attempts < self.max_attempts
+                wait_until = min(deadline, hedge_at) if can_hedge else deadline
+                done, _ = await asyncio.wait(pending, timeout=max(0, wait_until - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if can_hedge and time.monotonic() >= hedge_at:
+                        print(f"⏳ LLM请求{self.hedge_delay():.1f}秒未返回，发出对冲请求")
+                        launch(hedge=True)
+                        hedge_at = time.monotonic() + self.hedge_delay()
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is not None:
+                        self.stats['errors'] += 1
+                        if isinstance(task.exception(), RateLimitError):
+                            metrics.RATE_LIMIT_ERRORS.inc(source='llm')
+                        print(f"LLM请求失败: {task.exception()}")
+                        continue
+
+                    content = task.result()
+                    if validate is not None and not validate(content):
+                        self.stats['invalid'] += 1
+                        print("LLM回复格式无效，等待其他请求")
+                        continue
+
+                    if task in hedge_tasks:
+                        self.stats['hedge_wins'] += 1
+                    return content
+
+            self.stats['timeouts'] += 1
+            print(f"⏰ LLM请求超过截止时间{timeout:.1f}秒")
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+                # 取消时可能恰好以异常结束，取出异常避免告警
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _request(self, messages: List[Dict], **kwargs) -> str:
+        if self._client is None:
+            # 重试和超时由本客户端控制
+            self._client = AsyncOpenAI(api_key=self._api_key, base_url=self._base_url,
+                                       max_retries=0, timeout=self.deadline)
+        started = time.monotonic()
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=False,
+            **kwargs
+        )
+        self.latencies.append(time.monotonic() - started)
+        metrics.LLM_REQUEST_SECONDS.observe(self.latencies[-1])
+        return response.choices[0].message.content
+
+    def _ensure_loop(self):
+        """启动后台事件循环线程（复用连接池）"""
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                # 连接池绑定在创建它的事件循环上，事件循环重建时客户端一并重建
+                self._client = None
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="LLMClient", daemon=True)
+                self._thread.start()
+            return self._loop
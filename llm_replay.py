@@ -0,0 +1,281 @@
+"""
+LLM回复录制/回放
+record模式记录每次请求的提示词哈希、模型、提示词和原始回复（含延迟），
+replay模式按提示词哈希从文件返回记录的回复，不请求网络：
+回测、性能分析和CI可离线执行完整交易周期，并精确复现实盘的每次决策。
+
+文件格式（只追加）：每条记录为 定长头部(魔数, 提示词哈希, 数据长度, CRC32) + zlib压缩的JSON，
+打开时只读取头部建立 哈希 -> 偏移量 索引，按需解压单条记录。
+
+    python llm_replay.py stats data/llm_replay.dat
+    python llm_replay.py export data/llm_replay.dat records.jsonl   # 供 backtest.py --source recorded 使用
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+REPLAY_FILE = os.path.join("data", "llm_replay.dat")  # data目录在Docker中已挂载
+
+MAGIC = b'LLMR'
+HEADER = struct.Struct('<4s16sII')  # 魔数, 提示词哈希(16字节), 压缩数据长度, CRC32
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def prompt_hash(model: str, messages: List[Dict], params: Optional[Dict] = None) -> bytes:
+    """模型 + 消息 + 请求参数（如temperature）的哈希，相同提示词得到相同的键"""
+    raw = json.dumps({'model': model, 'messages': messages, 'params': params or {}},
+                     sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).digest()[:16]
+
+
+class ReplayStore:
+    """录制文件（单进程写入，线程安全）"""
+
+    def __init__(self, path: str = REPLAY_FILE):
+        self.path = path
+        self.index = defaultdict(list)  # 哈希 -> [偏移量, ...]（录制顺序）
+        self.offsets = []  # 全部记录的偏移量（录制顺序）
+        self._lock = threading.Lock()
+        self._file = None  # 追加写入
+        self._reader = None  # 随机读取
+        self._load_index()
+
+    def _load_index(self):
+        """扫描记录头部建立索引，末尾不完整的记录（写入中断）被截掉"""
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            while valid_end + HEADER.size <= size:
+                f.seek(valid_end)
+                magic, key, length, _ = HEADER.unpack(f.read(HEADER.size))
+                end = valid_end + HEADER.size + length
+                if magic != MAGIC or end > size:
+                    break
+                self.index[key].append(valid_end)
+                self.offsets.append(valid_end)
+                valid_end = end
+
+        if valid_end < size:
+            print(f"⚠️ 录制文件{self.path}末尾有{size - valid_end}字节不完整数据，已截断")
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def record(self, model: str, messages: List[Dict], completion: str,
+               latency: float, params: Optional[Dict] = None) -> str:
+        """追加一条记录，返回提示词哈希（十六进制）"""
+        key = prompt_hash(model, messages, params)
+        payload = zlib.compress(json.dumps({
+            'model': model,
+            'messages': messages,
+            'params': params or {},
+            'completion': completion,
+            'latency': latency,
+            'recorded_at': datetime.now().strftime(TIME_FORMAT),
+            'recorded_ms': int(time.time() * 1000)
+        }, ensure_ascii=False).encode('utf-8'))
+
+        with self._lock:
+            f = self._open()
+            offset = f.tell()
+            f.write(HEADER.pack(MAGIC, key, len(payload), zlib.crc32(payload)) + payload)
+            f.flush()
+            self.index[key].append(offset)
+            self.offsets.append(offset)
+        return key.hex()
+
+    def read(self, offset: int) -> Dict:
+        """读取并解压一条记录"""
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+            self._reader.seek(offset)
+            magic, key, length, crc = HEADER.unpack(self._reader.read(HEADER.size))
+            payload = self._reader.read(length)
+        if magic != MAGIC or zlib.crc32(payload) != crc:
+            raise ValueError(f"录制文件{self.path}偏移量{offset}的记录已损坏")
+        record = json.loads(zlib.decompress(payload))
+        record['hash'] = key.hex()
+        return record
+
+    def lookup(self, key: bytes) -> List[int]:
+        """提示词哈希对应的记录偏移量（同一提示词可能录制多次）"""
+        return self.index.get(key, [])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for offset in list(self.offsets):
+            yield self.read(offset)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def close(self):
+        with self._lock:
+            for handle in (self._file, self._reader):
+                if handle is not None:
+                    handle.close()
+            self._file = self._reader = None
+
+
+class RecordingLLMClient:
+    """录制模式：调用实际客户端，把有效回复写入录制文件"""
+
+    def __init__(self, client, store: ReplayStore):
+        self.client = client
+        self.store = store
+        self.model = client.model
+        self.recorded = 0
+
+    def complete(self, messages: List[Dict], validate: Callable = None,
+                 timeout: float = None, **kwargs) -> Optional[str]:
+        started = time.monotonic()
+        result = self.client.complete(messages, validate=validate, timeout=timeout, **kwargs)
+        if result is not None:
+            try:
+                self.store.record(self.model, messages, result, time.monotonic() - started, kwargs)
+                self.recorded += 1
+            except Exception as e:
+                print(f"录制LLM回复失败: {e}")
+        return result
+
+    def latency_stats(self) -> Dict:
+        stats = self.client.latency_stats()
+        stats.update(mode='record', recorded=self.recorded)
+        return stats
+
+    def close(self):
+        self.client.close()
+        self.store.close()
+
+
+class ReplayLLMClient:
+    """
+    回放模式：按提示词哈希返回录制的回复，与HedgedLLMClient接口相同
+
+    同一提示词录制多次时按录制顺序依次返回，用完后重复最后一条；
+    没有录制的提示词返回None（与超时相同，调用方使用备用信号）
+    """
+
+    def __init__(self, store: ReplayStore, model: str, latency: str = 'zero', deadline: float = 20):
+        """
+        参数:
+            latency: zero立即返回；recorded按录制时的延迟等待（超过截止时间返回None）
+        """
+        if latency not in ('zero', 'recorded'):
+            raise ValueError(f"未知的回放延迟模式: {latency}")
+        self.store = store
+        self.model = model
+        self.latency = latency
+        self.deadline = deadline
+        self.served = defaultdict(int)  # 哈希 -> 已返回次数
+        self.stats = {'calls': 0, 'hits': 0, 'misses': 0, 'invalid': 0, 'timeouts': 0}
+
+    def complete(self, messages: List[Dict], validate: Callable = None,
+                 timeout: float = None, **kwargs) -> Optional[str]:
+        self.stats['calls'] += 1
+        key = prompt_hash(self.model, messages, kwargs)
+        offsets = self.store.lookup(key)
+        if not offsets:
+            self.stats['misses'] += 1
+            print(f"⚠️ 没有录制的LLM回复: {key.hex()}")
+            return None
+
+        occurrence = self.served[key]
+        self.served[key] += 1
+        record = self.store.read(offsets[min(occurrence, len(offsets) - 1)])
+        self.stats['hits'] += 1
+
+        if self.latency == 'recorded':
+            timeout = self.deadline if timeout is None else min(timeout, self.deadline)
+            if record['latency'] > timeout:
+                time.sleep(timeout)
+                self.stats['timeouts'] += 1
+                return None
+            time.sleep(record['latency'])
+
+        completion = record['completion']
+        if validate is not None and not validate(completion):
+            self.stats['invalid'] += 1
+            return None
+        return completion
+
+    def latency_stats(self) -> Dict:
+        stats = dict(self.stats)
+        stats.update(mode='replay', records=len(self.store))
+        return stats
+
+    def close(self):
+        self.store.close()
+
+
+def wrap_client(client, mode: str = 'off', file: str = REPLAY_FILE, latency: str = 'zero'):
+    """
+    按模式包装LLM客户端
+
+    参数:
+        mode: off原样返回 / record录制 / replay回放（不请求网络）
+    """
+    if mode == 'record':
+        print(f"📼 LLM回复录制模式: {file}")
+        return RecordingLLMClient(client, ReplayStore(file))
+    if mode == 'replay':
+        store = ReplayStore(file)
+        print(f"📼 LLM回复回放模式: {file} ({len(store)}条记录, 延迟: {latency})")
+        return ReplayLLMClient(store, client.model, latency=latency, deadline=client.deadline)
+    if mode != 'off':
+        raise ValueError(f"未知的LLM录制/回放模式: {mode}")
+    return client
+
+
+def _print_stats(store: ReplayStore):
+    records = list(store)
+    latencies = sorted(r['latency'] for r in records)
+    print(f"记录数: {len(records)}, 不同提示词: {len(store.index)}, 文件大小: {os.path.getsize(store.path)}字节")
+    if records:
+        print(f"时间范围: {records[0]['recorded_at']} ~ {records[-1]['recorded_at']}")
+        print(f"延迟: P50 {latencies[len(latencies) // 2]:.2f}秒, 最大 {latencies[-1]:.2f}秒")
+
+
+def _export(store: ReplayStore, output: str):
+    """导出为backtest.RecordedSignalSource的记录格式（毫秒时间戳 + 原始回复）"""
+    with open(output, 'w', encoding='utf-8') as f:
+        for record in store:
+            f.write(json.dumps({'timestamp': record['recorded_ms'], 'response': record['completion'],
+                                'model': record['model'], 'hash': record['hash'],
+                                'latency': record['latency']}, ensure_ascii=False) + '\n')
+    print(f"✅ 已导出{len(store)}条记录到 {output}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('stats', 'export'):
+        print("用法: python llm_replay.py stats [录制文件]\n      python llm_replay.py export 录制文件 输出.jsonl")
+        sys.exit(1)
+    path = sys.argv[2] if len(sys.argv) > 2 else REPLAY_FILE
+    if not os.path.exists(path):
+        print(f"录制文件不存在: {path}")
+        sys.exit(1)
+    if sys.argv[1] == 'stats':
+        _print_stats(ReplayStore(path))
+    elif len(sys.argv) > 3:
+        _export(ReplayStore(path), sys.argv[3])
+    else:
+        print("export需要输出文件")
+        sys.exit(1)
@@ -0,0 +1,184 @@
+"""
+行情数据模块 - K线增量缓存
+只拉取最新一根已收盘K线之后的数据，并在预分配的环形缓冲区中维护固定窗口
+"""
+import json
+import threading
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# OKX单次K线请求上限
+MAX_FETCH_LIMIT = 300
+
+
+class CandleStore:
+    """K线环形缓存（最后一根为未收盘K线，每次更新时被替换），可被行情推送线程并发更新"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.lock = threading.RLock()
+        self._buffer = np.zeros((capacity, len(OHLCV_COLUMNS)), dtype=np.float64)
+        self._start = 0  # 最旧一根K线的位置
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _index(self, offset: int) -> int:
+        """第offset根K线（0为最旧）在缓冲区中的位置"""
+        return (self._start + offset) % self.capacity
+
+    @property
+    def last_timestamp(self):
+        """最新一根K线（可能未收盘）的开盘时间戳（毫秒）"""
+        if self._size == 0:
+            return None
+        return int(self._buffer[self._index(self._size - 1), 0])
+
+    @property
+    def last_closed_timestamp(self):
+        """最新一根已收盘K线的开盘时间戳（毫秒）"""
+        if self._size < 2:
+            return None
+        return int(self._buffer[self._index(self._size - 2), 0])
+
+    def clear(self):
+        with self.lock:
+            self._start = 0
+            self._size = 0
+
+    def replace(self, rows) -> int:
+        """用新的K线窗口整体替换缓存（加锁完成，其他线程不会看到清空后的中间状态）"""
+        with self.lock:
+            self.clear()
+            return self.update(rows)
+
+    def update(self, rows) -> int:
+        """
+        合并交易所返回的K线
+
+        参数:
+            rows: [[timestamp, open, high, low, close, volume], ...]
+
+        返回:
+            int: 新增的K线根数（替换未收盘K线不计入）
+        """
+        added = 0
+        with self.lock:
+            for row in sorted(rows, key=lambda r: r[0]):
+                timestamp = row[0]
+                last_ts = self.last_timestamp
+
+                if last_ts is not None and timestamp < last_ts:
+                    # 已在缓存中的历史K线，忽略
+                    continue
+
+                if last_ts is not None and timestamp == last_ts:
+                    # 替换仍在形成中的K线
+                    self._buffer[self._index(self._size - 1)] = row[:len(OHLCV_COLUMNS)]
+                    continue
+
+                if self._size < self.capacity:
+                    self._buffer[self._index(self._size)] = row[:len(OHLCV_COLUMNS)]
+                    self._size += 1
+                else:
+                    # 缓冲区已满，覆盖最旧的K线
+                    self._buffer[self._start] = row[:len(OHLCV_COLUMNS)]
+                    self._start = (self._start + 1) % self.capacity
+                added += 1
+
+        return added
+
+    def to_array(self) -> np.ndarray:
+        """按时间顺序返回K线数组 (size × 6)"""
+        with self.lock:
+            end = self._start + self._size
+            if end <= self.capacity:
+                return self._buffer[self._start:end].copy()
+            return np.concatenate((self._buffer[self._start:], self._buffer[:end - self.capacity]))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """转换为与fetch_ohlcv结果一致的DataFrame"""
+        df = pd.DataFrame(self.to_array(), columns=OHLCV_COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'].astype('int64'), unit='ms')
+        return df
+
+
+def fetch_ohlcv_incremental(exchange, symbol: str, timeframe: str, store: CandleStore) -> int:
+    """
+    增量更新K线缓存
+
+    首次调用拉取完整窗口；之后从最新一根K线（含未收盘K线）开始用since拉取，
+    缺口超过缓存窗口时重新拉取完整窗口。
+
+    返回:
+        int: 新增的K线根数
+    """
+    timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+    last_ts = store.last_timestamp
+
+    if last_ts is None or exchange.milliseconds() - last_ts > timeframe_ms * store.capacity:
+        # 先拉取完整窗口再整体替换，拉取期间行情推送线程仍可读写旧窗口
+        rows = exchange.fetch_ohlcv(symbol, timeframe, limit=store.capacity)
+        return store.replace(rows)
+
+    added = 0
+    since = last_ts
+    while True:
+        rows = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=MAX_FETCH_LIMIT)
+        if not rows:
+            break
+        added += store.update(rows)
+        newest = max(r[0] for r in rows)
+        # 不足一页说明已追到最新K线
+        if len(rows) < MAX_FETCH_LIMIT or newest <= since:
+            break
+        since = newest
+
+    return added
+
+
+def load_ohlcv_file(path: str) -> Dict[str, np.ndarray]:
+    """
+    读取本地K线文件
+
+    参数:
+        path: CSV（含timestamp,open,high,low,close,volume列，可选funding_rate列）、
+            JSON或JSONL（fetch_ohlcv格式的数组列表，或含上述字段的对象列表）；
+            timestamp为毫秒时间戳或UTC时间字符串
+
+    返回:
+        dict: 列名 -> np.ndarray，按时间升序、去重
+    """
+    if path.endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = json.load(f)
+        if rows and isinstance(rows[0], (list, tuple)):
+            df = pd.DataFrame([row[:6] for row in rows], columns=OHLCV_COLUMNS)
+        else:
+            df = pd.DataFrame(rows)
+
+    missing = [column for column in OHLCV_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"K线文件缺少列: {missing}")
+
+    if not pd.api.types.is_numeric_dtype(df['timestamp']):
+        # 不带时区的时间按UTC处理，带Z或偏移量的时间换算到UTC
+        timestamps = pd.to_datetime(df['timestamp'], utc=True)
+        df['timestamp'] = (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta('1ms')
+    df = df.sort_values('timestamp').drop_duplicates('timestamp', keep='last')
+
+    candles = {column: df[column].to_numpy(dtype=np.float64) for column in OHLCV_COLUMNS[1:]}
+    candles['timestamp'] = df['timestamp'].to_numpy(dtype=np.int64)
+    if 'funding_rate' in df.columns:
+        candles['funding_rate'] = df['funding_rate'].fillna(0).to_numpy(dtype=np.float64)
+    return candles
@@ -0,0 +1,32 @@
+"""
+周期快照模块 - 单个交易周期内的只读行情/账户数据
+同一周期内各函数从快照读取持仓、余额、条件单等数据，不再重复请求交易所；
+本程序自己下单/撤单后显式失效对应字段，下一次读取时重新请求
+"""
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, FrozenSet, List, Optional
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """交易周期快照（不可变，更新时生成新对象）"""
+    price_data: Optional[Dict] = None
+    balance: Optional[Dict] = None
+    position: Optional[Dict] = None  # None表示无持仓
+    algo_orders: Optional[List[Dict]] = None  # 未触发的条件单（OKX原始数据）
+    sentiment: Optional[Dict] = None
+    created_at: float = field(default_factory=time.time)
+    stale: FrozenSet[str] = frozenset()  # 获取失败或已失效、需要重新请求的字段
+
+    def has(self, name: str) -> bool:
+        """字段是否可直接使用"""
+        return name not in self.stale
+
+    def invalidate(self, *names: str) -> 'MarketSnapshot':
+        """返回将指定字段标记为失效的新快照"""
+        return replace(self, stale=self.stale | frozenset(names))
+
+    def with_values(self, **values) -> 'MarketSnapshot':
+        """返回写入新数据（并清除失效标记）的新快照"""
+        return replace(self, stale=self.stale - frozenset(values), **values)
@@ -0,0 +1,245 @@
+"""
+交易程序指标（Prometheus文本格式）
+各阶段耗时直方图、降级/重试/限频计数器，通过本地 /metrics 接口供Prometheus抓取，
+可对交易周期耗时的回归设置告警。只依赖标准库。
+"""
+import abc
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Tuple
+
+# 默认直方图分桶（秒），覆盖毫秒级的指标计算到数十秒的LLM调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    """带标签的指标基类（线程安全）"""
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标{self.name}的标签应为{self.labelnames}，实际为{tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return '\n'.join(lines)
+
+    @abc.abstractmethod
+    def _render_samples(self, items):
+        """按标签值逐行生成样本文本"""
+
+
+class Counter(_Metric):
+    """只增计数器"""
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """耗时直方图（累积分桶 + 总和 + 次数）"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块耗时（异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """函数装饰器：记录每次调用耗时"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self, **labels) -> Dict:
+        """{'count', 'sum'}，没有样本时均为0"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return {'count': state['count'], 'sum': state['sum']} if state else {'count': 0, 'sum': 0.0}
+
+    def _render_samples(self, items):
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state['sum'])}"
+            yield f"{self.name}_count{labels} {state['count']}"
+
+
+class Registry:
+    """指标注册表（同名指标只注册一次）"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标{name}已注册为{metric.type_name}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+# 交易周期各阶段：fetch(并发获取快照) indicators(指标计算) prompt(构建提示词) llm(AI调用)
+# validation(解析和校验信号) execution(下单) persistence(状态/权益写入)
+STAGE_SECONDS = REGISTRY.histogram('trading_stage_seconds', '交易周期各阶段耗时（秒）', ['stage'])
+CYCLE_SECONDS = REGISTRY.histogram('trading_cycle_seconds', 'K线收盘后完整交易周期耗时（秒，不含等待收盘）')
+EXCHANGE_REQUEST_SECONDS = REGISTRY.histogram('exchange_request_seconds', '交易所接口调用耗时（秒）', ['method'])
+LLM_REQUEST_SECONDS = REGISTRY.histogram('llm_request_seconds', '单次LLM请求耗时（秒，含对冲请求）')
+
+FALLBACKS = REGISTRY.counter('trading_fallback_signals_total', '使用备用交易信号的次数')
+RETRIES = REGISTRY.counter('trading_retries_total', '重试次数（llm: 分析重试，llm_resend: 请求失败/无效后重发）', ['kind'])
+LLM_HEDGES = REGISTRY.counter('llm_hedged_requests_total', 'LLM对冲请求次数')
+RATE_LIMIT_ERRORS = REGISTRY.counter('rate_limit_errors_total', '限频错误次数', ['source'])
+ERRORS = REGISTRY.counter('trading_errors_total', '各阶段异常次数', ['stage'])
+
+
+def instrument(obj, methods: Iterable[str], rate_limit_errors: Tuple[type, ...] = ()):
+    """
+    给对象的方法加上耗时统计（替换实例属性，如ccxt交易所实例）
+
+    参数:
+        obj: 被统计的对象
+        methods: 方法名列表，不存在的方法跳过
+        rate_limit_errors: 属于限频错误的异常类型，计入rate_limit_errors_total{source="exchange"}
+    """
+    for name in methods:
+        method = getattr(obj, name, None)
+        if method is None or getattr(method, '_instrumented', False):
+            continue
+
+        def make_wrapper(method, name):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                try:
+                    with EXCHANGE_REQUEST_SECONDS.time(method=name):
+                        return method(*args, **kwargs)
+                except rate_limit_errors:
+                    RATE_LIMIT_ERRORS.inc(source='exchange')
+                    raise
+            wrapper._instrumented = True
+            return wrapper
+
+        setattr(obj, name, make_wrapper(method, name))
+    return obj
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不输出每次抓取的访问日志
+
+
+_server = None
+
+
+def start_http_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """在后台线程提供 /metrics 接口（重复调用返回已启动的服务）"""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+    return _server
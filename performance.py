@@ -0,0 +1,86 @@
+"""
+交易绩效增量统计
+每保存一条交易记录O(1)更新累计值，持久化到磁盘；可随时从完整交易历史重建
+"""
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable
+
+
+@dataclass
+class PerformanceAggregate:
+    """累计绩效（盈亏曲线从0开始累计，回撤为盈亏曲线相对历史高点的回落，单位USDT）"""
+    total_pnl: float = 0.0
+    total_trades: int = 0
+    winning_trades: int = 0
+    losing_trades: int = 0
+    gross_profit: float = 0.0
+    gross_loss: float = 0.0  # 亏损总额（正数）
+    peak_pnl: float = 0.0
+    max_drawdown: float = 0.0
+
+    def add(self, trade: Dict):
+        """累加一条交易记录"""
+        pnl = float(trade.get('pnl', 0) or 0)
+        self.total_trades += 1
+        self.total_pnl += pnl
+
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.losing_trades += 1
+            self.gross_loss -= pnl
+
+        self.peak_pnl = max(self.peak_pnl, self.total_pnl)
+        self.max_drawdown = max(self.max_drawdown, self.peak_pnl - self.total_pnl)
+
+    def summary(self) -> Dict:
+        """绩效统计（包含calculate_performance的全部字段）"""
+        win_rate = (self.winning_trades / self.total_trades * 100) if self.total_trades > 0 else 0
+        if self.gross_loss > 0:
+            profit_factor = self.gross_profit / self.gross_loss
+        else:
+            profit_factor = None  # 没有亏损交易时无意义
+
+        return {
+            'total_pnl': self.total_pnl,
+            'win_rate': win_rate,
+            'total_trades': self.total_trades,
+            'winning_trades': self.winning_trades,
+            'losing_trades': self.losing_trades,
+            'max_drawdown': self.max_drawdown,
+            'profit_factor': profit_factor,
+            'avg_win': self.gross_profit / self.winning_trades if self.winning_trades else 0,
+            'avg_loss': -self.gross_loss / self.losing_trades if self.losing_trades else 0
+        }
+
+    @classmethod
+    def rebuild(cls, trades: Iterable[Dict]) -> 'PerformanceAggregate':
+        """从完整交易历史重建"""
+        aggregate = cls()
+        for trade in trades:
+            aggregate.add(trade)
+        return aggregate
+
+    @classmethod
+    def load(cls, path: str):
+        """从磁盘加载，文件不存在或损坏返回None"""
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    return cls(**json.load(f))
+        except Exception as e:
+            print(f"加载绩效统计失败: {e}")
+        return None
+
+    def save(self, path: str):
+        """写入临时文件后原子替换"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
@@ -7,6 +7,8 @@ BTC自动交易机器人 - 统一启动程序
 同时启动：
 1. 交易程序（deepseekok2.py）
 2. Web监控界面（streamlit）
+3. 只读状态接口（status_api.py，STATUS_API_ENABLED=false可关闭）
+4. 交易程序指标接口 /metrics（交易程序进程内，METRICS_ENABLED=false可关闭）
 """
 
 import os
@@ -26,6 +28,14 @@ os.environ['STREAMLIT_BROWSER_GATHER_USAGE_STATS'] = 'false'
 # 全局进程列表
 processes = []
 
+# 只读HTTP/JSON状态接口
+STATUS_API_ENABLED = os.getenv('STATUS_API_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+# Prometheus指标接口（在交易程序进程内提供，指标在该进程中采集）
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '8503'))
+
 def log(message):
     """统一日志输出"""
     timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
@@ -35,6 +45,13 @@ def run_trading_bot():
     """运行交易程序"""
     try:
         log("🤖 启动交易程序...")
+        if METRICS_ENABLED:
+            try:
+                import metrics
+                metrics.start_http_server(METRICS_PORT, METRICS_HOST)
+                log(f"📈 指标接口: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            except Exception as e:
+                log(f"⚠️ 指标接口启动失败: {e}")
         # 导入交易程序主函数
         import deepseekok2
         deepseekok2.main()
@@ -96,6 +113,25 @@ def run_web_interface():
         log("🔄 重启Web界面...")
         run_web_interface()
 
+def run_status_api():
+    """运行只读状态接口"""
+    try:
+        import status_api
+        log(f"📡 启动状态接口 http://{status_api.STATUS_API_HOST}:{status_api.STATUS_API_PORT}/api/status")
+        status_api.run()
+    except Exception as e:
+        log(f"❌ 状态接口异常: {e}")
+        import traceback
+        traceback.print_exc()
+        time.sleep(10)
+
+# 进程名 -> 启动函数（进程退出后按名称重启）
+PROCESS_TARGETS = {
+    "TradingBot": run_trading_bot,
+    "WebInterface": run_web_interface,
+    "StatusAPI": run_status_api,
+}
+
 def signal_handler(signum, frame):
     """处理终止信号"""
     log("⚠️ 收到终止信号，正在停止所有服务...")
@@ -154,7 +190,7 @@ def check_environment():
         log(f"⚠️ 警告: 创建目录失败 - {e}")
     
     # 检查必要文件
-    required_files = ['deepseekok2.py', 'streamlit_app.py', 'data_manager.py']
+    required_files = ['deepseekok2.py', 'streamlit_app.py', 'data_manager.py', 'status_api.py']
     for file in required_files:
         if not Path(file).exists():
             log(f"❌ 错误: 缺少必要文件 {file}")
@@ -174,6 +210,7 @@ def check_environment():
         import pandas
         import streamlit
         import plotly
+        import aiohttp
         log("✅ 所有依赖包已安装")
     except ImportError as e:
         log(f"❌ 错误: 缺少依赖包 - {e}")
@@ -214,10 +251,21 @@ def main():
     )
     processes.append(web_process)
     
+    # 创建状态接口进程
+    api_process = None
+    if STATUS_API_ENABLED:
+        api_process = Process(
+            target=run_status_api,
+            name="StatusAPI"
+        )
+        processes.append(api_process)
+    
     # 启动所有进程
     trading_process.start()
     time.sleep(2)  # 等待交易程序初始化
     web_process.start()
+    if api_process is not None:
+        api_process.start()
     
     log("✅ 所有服务已启动")
     print()
@@ -227,6 +275,10 @@ def main():
     print("🤖 交易程序: 运行中")
     print("🌐 Web监控界面: http://0.0.0.0:8501")
     print("   （宝塔面板会自动映射到您的域名）")
+    if STATUS_API_ENABLED:
+        print(f"📡 状态接口: http://0.0.0.0:{os.getenv('STATUS_API_PORT', '8502')}/api/status")
+    if METRICS_ENABLED:
+        print(f"📈 指标接口: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
     print("=" * 60)
     print()
     log("💡 按 Ctrl+C 停止所有服务")
@@ -244,16 +296,10 @@ def main():
                         log(f"⚠️ 警告: 进程 {p.name} 已停止，正在重启...")
                         
                         # 创建新进程
-                        if p.name == "TradingBot":
-                            new_process = Process(
-                                target=run_trading_bot,
-                                name="TradingBot"
-                            )
-                        else:
-                            new_process = Process(
-                                target=run_web_interface,
-                                name="WebInterface"
-                            )
+                        new_process = Process(
+                            target=PROCESS_TARGETS[p.name],
+                            name=p.name
+                        )
                         
                         # 替换进程
                         processes.remove(p)
@@ -0,0 +1,105 @@
+"""
+调度模块 - K线收盘触发
+按配置的K线周期在收盘时刻触发交易周期；WebSocket推送收盘确认时立即触发，
+没有新收盘K线时跳过，并记录从触发到产生决策的延迟
+"""
+import threading
+import time
+from collections import deque
+
+
+class CandleCloseScheduler:
+    """K线收盘调度器"""
+
+    def __init__(self, period_seconds: int, close_delay: float = 1.0, websocket_grace: float = 5.0):
+        """
+        参数:
+            period_seconds: K线周期秒数（由timeframe换算）
+            close_delay: 无WebSocket时，收盘后等待交易所生成K线的秒数
+            websocket_grace: 有WebSocket时，收盘后等待推送确认的最长秒数，超时按定时器触发
+        """
+        self.period = period_seconds
+        self.close_delay = close_delay
+        self.websocket_grace = websocket_grace
+
+        self._closed_event = threading.Event()
+        self.last_processed_timestamp = None  # 最近一次处理的已收盘K线开盘时间（毫秒）
+        self.trigger_time = None
+        self.trigger_source = None
+        self.last_lag = None
+        self.lag_history = deque(maxlen=100)
+
+    def next_close(self, now: float = None) -> float:
+        """下一根K线收盘时刻（秒）"""
+        now = time.time() if now is None else now
+        return (int(now // self.period) + 1) * self.period
+
+    def notify_closed(self, timestamp: int):
+        """WebSocket推送K线收盘确认（推送线程调用）"""
+        if timestamp != self.last_processed_timestamp:
+            self._closed_event.set()
+
+    def wait(self, websocket_live: bool = False) -> str:
+        """
+        阻塞到下一根K线收盘
+
+        返回:
+            str: 触发来源 'websocket' 或 'timer'
+        """
+        close_time = self.next_close()
+        deadline = close_time + (self.websocket_grace if websocket_live else self.close_delay)
+        self._closed_event.clear()
+
+        wait_seconds = max(0, deadline - time.time())
+        minutes, seconds = divmod(int(close_time - time.time()), 60)
+        print(f"🕒 等待 {minutes} 分 {seconds} 秒到K线收盘...")
+
+        source = 'timer'
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            # 收盘前的推送确认属于上一根K线，只接受收盘之后的确认
+            if self._closed_event.wait(timeout=remaining) and time.time() >= close_time:
+                source = 'websocket'
+                break
+            self._closed_event.clear()
+
+        self.trigger_time = time.time()
+        self.trigger_source = source
+        return source
+
+    def latest_closed_timestamp(self, store) -> int:
+        """K线缓存中最新一根已收盘K线的开盘时间（毫秒）"""
+        last = store.last_timestamp
+        if last is None:
+            return None
+        if last + self.period * 1000 <= time.time() * 1000:
+            return last
+        return store.last_closed_timestamp
+
+    def is_new_candle(self, closed_timestamp) -> bool:
+        """是否有尚未处理的新收盘K线"""
+        return closed_timestamp is not None and closed_timestamp != self.last_processed_timestamp
+
+    def mark_processed(self, closed_timestamp):
+        self.last_processed_timestamp = closed_timestamp
+
+    def record_decision(self) -> float:
+        """记录从触发到产生决策的延迟（秒）"""
+        if self.trigger_time is None:
+            return None
+        self.last_lag = time.time() - self.trigger_time
+        self.lag_history.append(self.last_lag)
+        return self.last_lag
+
+    def lag_stats(self) -> dict:
+        """决策延迟统计"""
+        if not self.lag_history:
+            return {'last': None, 'avg': None, 'max': None, 'trigger': self.trigger_source}
+        return {
+            'last': round(self.last_lag, 3),
+            'avg': round(sum(self.lag_history) / len(self.lag_history), 3),
+            'max': round(max(self.lag_history), 3),
+            'trigger': self.trigger_source
+        }
@@ -0,0 +1,262 @@
+"""
+SQLite存储后端（WAL模式）
+交易程序写入的同时Web界面可并发读取；交易记录按时间/信号建索引，
+权益快照按时间建索引，支持按时间范围查询而不必加载全部数据；
+原始权益快照保留48小时，小时/日K线在写入快照时同一事务内增量更新
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from equity_rollup import RAW_RETENTION, TIERS, TIME_FORMAT, EquityRollup, bucket_start
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trading_data (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    signal TEXT,
+    pnl REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp);
+CREATE INDEX IF NOT EXISTS idx_trades_signal ON trades (signal, timestamp);
+CREATE TABLE IF NOT EXISTS equity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    equity REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_equity_timestamp ON equity (timestamp);
+""" + "".join(f"""
+CREATE TABLE IF NOT EXISTS equity_{tier} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL UNIQUE,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+""" for tier in TIERS)
+
+BAR_COLUMNS = "timestamp, open, high, low, close, count"
+
+
+class SQLiteStore:
+    """SQLite存储（每个线程独立连接）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            # WAL模式：写入不阻塞读取，读取端不会读到写了一半的数据
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # 系统状态
+    # ------------------------------------------------------------------
+    def save_trading_data(self, data: Dict):
+        """保存系统状态，每次写入版本号+1"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM trading_data WHERE id = 1").fetchone()
+            data['version'] = (json.loads(row['data']).get('version', 0) if row else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO trading_data (id, data, updated_at) VALUES (1, ?, ?)",
+                (json.dumps(data, ensure_ascii=False), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+
+    def load_trading_data(self) -> Optional[Dict]:
+        row = self._connect().execute("SELECT data FROM trading_data WHERE id = 1").fetchone()
+        return json.loads(row['data']) if row else None
+
+    # ------------------------------------------------------------------
+    # 交易记录
+    # ------------------------------------------------------------------
+    def save_trade(self, trade: Dict):
+        with self._connect() as conn:
+            self._insert_trade(conn, trade)
+
+    @staticmethod
+    def _insert_trade(conn, trade: Dict):
+        conn.execute(
+            "INSERT INTO trades (timestamp, signal, pnl, data) VALUES (?, ?, ?, ?)",
+            (trade.get('timestamp', ''), trade.get('signal'), trade.get('pnl'),
+             json.dumps(trade, ensure_ascii=False))
+        )
+
+    def last_id(self, table: str) -> int:
+        """表中最大记录ID（只追加写入，ID变化即有新数据）"""
+        return self._connect().execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+
+    def count_trades(self, since: str = None, until: str = None, signal: str = None) -> int:
+        """按时间范围/信号统计交易记录条数"""
+        where, params = self._trade_filter(since, until, signal)
+        sql = "SELECT COUNT(*) FROM trades"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._connect().execute(sql, params).fetchone()[0]
+
+    def load_trades(self, since: str = None, until: str = None, signal: str = None,
+                    limit: int = None, offset: int = None) -> List[Dict]:
+        """按时间范围/信号查询交易记录（时间正序，limit取最近的N条，offset跳过最近的N条）"""
+        where, params = self._trade_filter(since, until, signal)
+        rows = self._select("trades", "data", where, params, limit, offset)
+        return [json.loads(row['data']) for row in rows]
+
+    # ------------------------------------------------------------------
+    # 权益快照
+    # ------------------------------------------------------------------
+    def save_equity(self, timestamp: str, equity: float):
+        """写入原始快照，同一事务内更新各级K线并删除超过保留时长的原始快照"""
+        with self._connect() as conn:
+            conn.execute("INSERT INTO equity (timestamp, equity) VALUES (?, ?)", (timestamp, equity))
+            for tier in TIERS:
+                conn.execute(
+                    f"INSERT INTO equity_{tier} ({BAR_COLUMNS}) VALUES (?, ?, ?, ?, ?, 1) "
+                    "ON CONFLICT (timestamp) DO UPDATE SET high = MAX(high, excluded.high), "
+                    "low = MIN(low, excluded.low), close = excluded.close, count = count + 1",
+                    (bucket_start(timestamp, tier), equity, equity, equity, equity)
+                )
+            # 按时间索引删除，通常每次只删除0-1行
+            cutoff = datetime.strptime(timestamp, TIME_FORMAT) - RAW_RETENTION
+            conn.execute("DELETE FROM equity WHERE timestamp < ?", (cutoff.strftime(TIME_FORMAT),))
+
+    def load_equity(self, since: str = None, until: str = None, limit: int = None) -> List[Dict]:
+        """按时间范围查询权益快照（时间正序，limit取最近的N条）"""
+        where, params = self._time_range(since, until)
+        rows = self._select("equity", "timestamp, equity", where, params, limit)
+        return [{'timestamp': row['timestamp'], 'equity': row['equity']} for row in rows]
+
+    def load_equity_bars(self, tier: str, since: str = None, until: str = None) -> List[Dict]:
+        """按时间范围查询权益K线（时间正序，含未收盘的K线）"""
+        if tier not in TIERS:
+            raise ValueError(f"未知汇总级别: {tier}")
+        where, params = self._time_range(since, until)
+        rows = self._select(f"equity_{tier}", BAR_COLUMNS, where, params)
+        return [{'timestamp': row['timestamp'], 'open': row['open'], 'high': row['high'], 'low': row['low'],
+                 'close': row['close'], 'equity': row['close'], 'count': row['count']} for row in rows]
+
+    def first_equity_timestamp(self) -> Optional[str]:
+        """最早的权益记录时间（最粗一级K线的第一根）"""
+        tier = list(TIERS)[-1]
+        return self._connect().execute(f"SELECT MIN(timestamp) FROM equity_{tier}").fetchone()[0]
+
+    @staticmethod
+    def _insert_bars(conn, tier: str, bars: List[Dict]):
+        conn.executemany(
+            f"INSERT OR REPLACE INTO equity_{tier} ({BAR_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+            [(b['timestamp'], b['open'], b['high'], b['low'], b['close'], b['count']) for b in bars]
+        )
+
+    @staticmethod
+    def _sync_equity_bars(conn):
+        """
+        把K线尚未包含的原始快照汇总进K线（导入旧数据或从旧版数据库升级），
+        并删除超过保留时长的原始快照；已汇总的时间桶会被跳过，重复执行不会重复计数
+        """
+        raw = [dict(row) for row in conn.execute("SELECT timestamp, equity FROM equity ORDER BY id")]
+        if not raw:
+            return
+
+        last_closed = {
+            tier: conn.execute(f"SELECT MAX(timestamp) FROM equity_{tier}").fetchone()[0]
+            for tier in TIERS
+        }
+        rollup = EquityRollup()
+        bars = rollup.recover(raw, last_closed)
+        for tier, open_bar in rollup.open_bars.items():
+            tier_bars = bars[tier] + ([open_bar] if open_bar is not None else [])
+            if tier_bars:
+                SQLiteStore._insert_bars(conn, tier, tier_bars)
+                print(f"📦 已从权益快照生成 {len(tier_bars)} 根{tier}K线")
+
+        cutoff = datetime.strptime(raw[-1]['timestamp'], TIME_FORMAT) - RAW_RETENTION
+        conn.execute("DELETE FROM equity WHERE timestamp < ?", (cutoff.strftime(TIME_FORMAT),))
+
+    # ------------------------------------------------------------------
+    # 迁移
+    # ------------------------------------------------------------------
+    def import_if_empty(self, trades: List[Dict], equity_history: List[Dict],
+                        trading_data: Optional[Dict] = None,
+                        equity_bars: Optional[Dict[str, List[Dict]]] = None):
+        """表为空时导入已有数据（写事务内检查，多进程同时启动也只导入一次）"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if trades and not conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone():
+                for trade in trades:
+                    self._insert_trade(conn, trade)
+                print(f"📦 已导入 {len(trades)} 条交易记录到SQLite")
+
+            if equity_history and not conn.execute("SELECT 1 FROM equity LIMIT 1").fetchone():
+                conn.executemany(
+                    "INSERT INTO equity (timestamp, equity) VALUES (?, ?)",
+                    [(e['timestamp'], e['equity']) for e in equity_history]
+                )
+                print(f"📦 已导入 {len(equity_history)} 条权益快照到SQLite")
+
+            for tier, bars in (equity_bars or {}).items():
+                if bars and not conn.execute(f"SELECT 1 FROM equity_{tier} LIMIT 1").fetchone():
+                    self._insert_bars(conn, tier, bars)
+                    print(f"📦 已导入 {len(bars)} 根{tier}权益K线到SQLite")
+            self._sync_equity_bars(conn)
+
+            if trading_data and not conn.execute("SELECT 1 FROM trading_data").fetchone():
+                conn.execute(
+                    "INSERT INTO trading_data (id, data, updated_at) VALUES (1, ?, ?)",
+                    (json.dumps(trading_data, ensure_ascii=False), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    # ------------------------------------------------------------------
+    # 查询辅助
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _time_range(since: str, until: str):
+        where, params = [], []
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("timestamp <= ?")
+            params.append(until)
+        return where, params
+
+    def _trade_filter(self, since: str, until: str, signal: str):
+        where, params = self._time_range(since, until)
+        if signal is not None:
+            where.append("signal = ?")
+            params.append(signal)
+        return where, params
+
+    def _select(self, table: str, columns: str, where: List[str], params: List, limit: int = None,
+                offset: int = None):
+        sql = f"SELECT id, {columns} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if limit is not None or offset:
+            # 跳过最近的offset条、取其后最近的N条，再按时间正序返回（LIMIT -1表示不限条数）
+            sql = f"SELECT * FROM ({sql} ORDER BY id DESC LIMIT ? OFFSET ?) ORDER BY id"
+            params = params + [-1 if limit is None else limit, offset or 0]
+        else:
+            sql += " ORDER BY id"
+        return self._connect().execute(sql, params).fetchall()
@@ -0,0 +1,206 @@
+"""
+只读HTTP/JSON状态接口（aiohttp）
+供外部监控、告警和机器人轮询：系统状态、持仓、最新AI信号、分页交易记录、权益曲线。
+响应带ETag（由数据变化标识生成，未变化时不加载数据直接返回304），支持gzip压缩。
+
+    GET /api/status                     完整系统状态
+    GET /api/position                   当前持仓
+    GET /api/signal                     最新AI信号
+    GET /api/trades?page=1&page_size=50&signal=BUY&since=...&until=...   交易记录（最新在前）
+    GET /api/equity?since=...&until=... 权益曲线（按时间跨度自动选择原始快照/小时K线/日K线）
+    GET /api/health                     存活检查
+
+设置STATUS_API_TOKEN后，除/api/health外的接口需要 Authorization: Bearer <token> 请求头。
+"""
+import hashlib
+import hmac
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from aiohttp import web
+
+import data_manager
+
+STATUS_API_HOST = os.getenv('STATUS_API_HOST', '0.0.0.0')
+STATUS_API_PORT = int(os.getenv('STATUS_API_PORT', '8502'))
+STATUS_API_TOKEN = os.getenv('STATUS_API_TOKEN', '')  # 为空时不校验（docker-compose只把端口绑定到本机）
+
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+GZIP_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+RESPONSE_CACHE_SIZE = 128  # 缓存的响应数（多个客户端轮询相同数据时只序列化一次）
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_response_cache = OrderedDict()
+
+
+def _parse_time(value):
+    """查询参数中的时间：'YYYY-MM-DD HH:MM:SS' 或 'YYYY-MM-DD'"""
+    if value is None:
+        return None
+    for fmt in (TIME_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).strftime(TIME_FORMAT)
+        except ValueError:
+            continue
+    raise web.HTTPBadRequest(
+        text=json.dumps({'error': f"时间格式错误: {value}，应为 YYYY-MM-DD HH:MM:SS"}, ensure_ascii=False),
+        content_type='application/json'
+    )
+
+
+def _parse_int(request, name: str, default: int, minimum: int = 1, maximum: int = None) -> int:
+    try:
+        value = int(request.query.get(name, default))
+    except ValueError:
+        value = None
+    if value is None or value < minimum or (maximum is not None and value > maximum):
+        limit = f"{minimum}-{maximum}" if maximum is not None else f">={minimum}"
+        raise web.HTTPBadRequest(
+            text=json.dumps({'error': f"参数{name}应为整数({limit})"}, ensure_ascii=False),
+            content_type='application/json'
+        )
+    return value
+
+
+def _load_status():
+    """最新系统状态（优先共享内存通道）"""
+    return data_manager.load_live_status() or data_manager.load_trading_data() or {}
+
+
+def _status_payload(request):
+    return _load_status()
+
+
+def _position_payload(request):
+    status = _load_status()
+    return {'position': status.get('position'), 'last_update': status.get('last_update')}
+
+
+def _signal_payload(request):
+    return _load_status().get('ai_signal')
+
+
+def _trades_payload(request):
+    page = _parse_int(request, 'page', 1)
+    page_size = _parse_int(request, 'page_size', DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE)
+    filters = {
+        'since': _parse_time(request.query.get('since')),
+        'until': _parse_time(request.query.get('until')),
+        'signal': request.query.get('signal')
+    }
+    total = data_manager.count_trades_history(**filters)
+    # 最新在前分页，只查询当前页（SQLite后端由LIMIT/OFFSET完成）
+    trades = data_manager.load_trades_history(limit=page_size, offset=(page - 1) * page_size, **filters)
+    return {
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'pages': (total + page_size - 1) // page_size,
+        'trades': trades[::-1]
+    }
+
+
+def _equity_payload(request):
+    series = data_manager.load_equity_series(
+        since=_parse_time(request.query.get('since')),
+        until=_parse_time(request.query.get('until'))
+    )
+    return {'count': len(series), 'equity': series}
+
+
+def _json_endpoint(kind: str, build):
+    """
+    生成带ETag和gzip的只读接口
+
+    参数:
+        kind: data_manager.data_signature的数据类型，数据未变化时ETag不变
+        build: build(request) -> 可JSON序列化的数据
+    """
+    async def handler(request):
+        # 数据加载很快（有缓存），在事件循环中同步执行，避免data_manager的读取缓存被多线程并发访问
+        signature = data_manager.data_signature(kind)
+        key = f"{request.path}?{request.query_string}|{signature}"
+        etag = 'W/"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return web.Response(status=304, headers=headers)
+
+        body = _response_cache.get(key)
+        if body is None:
+            body = json.dumps(build(request), ensure_ascii=False, default=str).encode('utf-8')
+            _response_cache[key] = body
+            if len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+        else:
+            _response_cache.move_to_end(key)
+
+        response = web.Response(body=body, content_type='application/json', charset='utf-8', headers=headers)
+        if len(body) >= GZIP_MIN_SIZE:
+            response.enable_compression()
+        return response
+
+    return handler
+
+
+async def health(request):
+    return web.json_response({'status': 'ok'})
+
+
+@web.middleware
+async def error_middleware(request, handler):
+    """未捕获的异常返回JSON错误，不暴露堆栈"""
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except Exception as e:
+        print(f"状态接口处理失败 {request.path}: {e}")
+        return web.json_response({'error': '内部错误'}, status=500)
+
+
+def auth_middleware(token: str):
+    """Bearer令牌校验（/api/health除外）"""
+    expected = f"Bearer {token}".encode('utf-8')
+
+    @web.middleware
+    async def middleware(request, handler):
+        if request.path != '/api/health':
+            provided = request.headers.get('Authorization', '').encode('utf-8')
+            if not hmac.compare_digest(provided, expected):
+                return web.json_response({'error': '未授权'}, status=401,
+                                         headers={'WWW-Authenticate': 'Bearer'})
+        return await handler(request)
+    return middleware
+
+
+def create_app(token: str = STATUS_API_TOKEN) -> web.Application:
+    middlewares = [error_middleware]
+    if token:
+        middlewares.insert(0, auth_middleware(token))
+    app = web.Application(middlewares=middlewares)
+    app.router.add_get('/api/status', _json_endpoint('status', _status_payload))
+    app.router.add_get('/api/position', _json_endpoint('status', _position_payload))
+    app.router.add_get('/api/signal', _json_endpoint('status', _signal_payload))
+    app.router.add_get('/api/trades', _json_endpoint('trades', _trades_payload))
+    app.router.add_get('/api/equity', _json_endpoint('equity', _equity_payload))
+    app.router.add_get('/api/health', health)
+    return app
+
+
+def run(host: str = STATUS_API_HOST, port: int = STATUS_API_PORT, token: str = STATUS_API_TOKEN):
+    """阻塞运行状态接口服务"""
+    if not token and host not in LOOPBACK_HOSTS:
+        print(f"⚠️ 状态接口监听{host}且未设置STATUS_API_TOKEN，账户数据无鉴权，请确保端口只对本机开放")
+    web.run_app(create_app(token), host=host, port=port, print=None, access_log=None)
+
+
+if __name__ == '__main__':
+    run()
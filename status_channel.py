@@ -0,0 +1,138 @@
+"""
+共享内存状态通道 - 交易程序与Web界面之间传递最新系统状态
+mmap映射同一个文件（优先/dev/shm内存文件系统），固定布局：
+
+    [0:4]   magic  b'AAST'
+    [4:8]   布局版本
+    [8:16]  序列号（seqlock：写入中为奇数，写完为偶数）
+    [16:20] 数据长度
+    [32:]   状态数据（UTF-8 JSON）
+
+读取端先读取8字节序列号判断状态是否变化，未变化时返回上次解析结果的副本。
+读取不是零拷贝的：seqlock要求先把数据从mmap复制出来，再确认序列号未变，
+否则解析到的可能是写入一半的数据；因此每次状态变化都会复制并解析一次数据。
+"""
+import copy
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+MAGIC = b'AAST'
+LAYOUT_VERSION = 1
+HEADER_SIZE = 32
+DEFAULT_CAPACITY = 256 * 1024
+
+_HEADER = struct.Struct('<4sI')
+_SEQ = struct.Struct('<Q')
+_LENGTH = struct.Struct('<I')
+SEQ_OFFSET = 8
+LENGTH_OFFSET = 16
+
+READ_RETRIES = 100
+
+
+def default_channel_path() -> str:
+    """默认通道文件：Linux使用/dev/shm（内存），其他系统使用临时目录"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'alpha_arena_status')
+
+
+class StatusChannel:
+    """共享内存状态通道（单写多读）"""
+
+    def __init__(self, path: str = None, capacity: int = DEFAULT_CAPACITY, create: bool = False):
+        """
+        参数:
+            path: 通道文件路径，默认default_channel_path()
+            capacity: 状态数据最大字节数（写入端使用）
+            create: True为写入端（不存在则创建），False为读取端（不存在时抛出FileNotFoundError）
+        """
+        self.path = path or default_channel_path()
+        self.writable = create
+        self._cached_seq = None
+        self._cached_data = None
+
+        if create:
+            size = HEADER_SIZE + capacity
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._mm = mmap.mmap(fd, 0)
+            finally:
+                os.close(fd)
+
+            magic, version = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != LAYOUT_VERSION:
+                # 新建或布局不兼容：清空头部，序列号从0开始
+                self._mm[:HEADER_SIZE] = b'\x00' * HEADER_SIZE
+                _HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION)
+            elif self.sequence % 2:
+                # 上次写入中途退出，恢复为偶数
+                _SEQ.pack_into(self._mm, SEQ_OFFSET, self.sequence + 1)
+        else:
+            with open(self.path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != LAYOUT_VERSION:
+                self._mm.close()
+                raise ValueError(f"状态通道格式不兼容: {self.path}")
+
+        self.capacity = len(self._mm) - HEADER_SIZE
+
+    @property
+    def sequence(self) -> int:
+        """当前序列号（0表示尚未写入）"""
+        return _SEQ.unpack_from(self._mm, SEQ_OFFSET)[0]
+
+    def changed(self) -> bool:
+        """自上次read以来状态是否有更新"""
+        return self.sequence != self._cached_seq
+
+    def publish(self, data: Dict) -> int:
+        """写入最新状态，返回新的序列号"""
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        if len(payload) > self.capacity:
+            raise ValueError(f"状态数据{len(payload)}字节超过通道容量{self.capacity}字节")
+
+        seq = self.sequence
+        _SEQ.pack_into(self._mm, SEQ_OFFSET, seq + 1)  # 奇数：写入中
+        _LENGTH.pack_into(self._mm, LENGTH_OFFSET, len(payload))
+        self._mm[HEADER_SIZE:HEADER_SIZE + len(payload)] = payload
+        _SEQ.pack_into(self._mm, SEQ_OFFSET, seq + 2)  # 偶数：写入完成
+        return seq + 2
+
+    def read(self) -> Tuple[int, Optional[Dict]]:
+        """
+        读取最新状态（序列号未变化时直接返回缓存）
+
+        返回:
+            (sequence, data): 尚未写入或多次重试仍在写入中时data为None
+        """
+        for _ in range(READ_RETRIES):
+            seq = self.sequence
+            if seq == self._cached_seq:
+                return seq, copy.deepcopy(self._cached_data)
+            if seq == 0:
+                return 0, None
+            if seq % 2:
+                time.sleep(0.0001)
+                continue
+
+            length = _LENGTH.unpack_from(self._mm, LENGTH_OFFSET)[0]
+            payload = self._mm[HEADER_SIZE:HEADER_SIZE + length]
+            if self.sequence != seq:
+                continue  # 复制期间被改写，重试
+
+            self._cached_data = json.loads(payload)
+            self._cached_seq = seq
+            return seq, copy.deepcopy(self._cached_data)
+
+        return self.sequence, None
+
+    def close(self):
+        self._mm.close()
@@ -1,5 +1,4 @@
 import streamlit as st
-import json
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
@@ -235,26 +234,43 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # 数据文件路径
-DATA_FILE = "trading_data.json"
-TRADES_FILE = "trades_history.json"
+DATA_FILE = os.path.join("data", "trading_data.json")
+
+# 自动刷新：按会话检查数据是否变化，无变化时检查间隔逐步翻倍
+AUTO_REFRESH_MIN_INTERVAL = 2  # 秒
+AUTO_REFRESH_MAX_INTERVAL = 30
+STALE_MINUTES = 30  # 状态超过该分钟数未更新显示为warning
+
+# 权益曲线：时间范围选项，以及降采样后的最大点数（约等于图表像素宽度）
+EQUITY_RANGES = {
+    '24小时': timedelta(hours=24),
+    '7天': timedelta(days=7),
+    '30天': timedelta(days=30),
+    '全部': None
+}
+EQUITY_CHART_POINTS = 800
+EQUITY_MARKER_POINTS = 100  # 点数不超过该值时显示数据点标记
 
 def load_trading_data():
     """加载交易数据"""
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # 确保数据完整性
-                if 'last_update' in data:
-                    # 检查数据是否过期（超过30分钟）
-                    try:
-                        last_update = datetime.strptime(data['last_update'], '%Y-%m-%d %H:%M:%S')
-                        time_diff = (datetime.now() - last_update).total_seconds() / 60
-                        if time_diff > 30:
-                            data['status'] = 'warning'
-                    except:
-                        pass
-                return data
+        # 优先读取共享内存状态通道，交易程序未运行时读取JSON文件或SQLite后端
+        from data_manager import load_trading_data as load_status_data, load_live_status
+        data = load_live_status()
+        if data is None:
+            data = load_status_data()
+        if data is not None:
+            # 确保数据完整性
+            if 'last_update' in data:
+                # 检查数据是否过期（超过30分钟）
+                try:
+                    last_update = datetime.strptime(data['last_update'], '%Y-%m-%d %H:%M:%S')
+                    time_diff = (datetime.now() - last_update).total_seconds() / 60
+                    if time_diff > STALE_MINUTES:
+                        data['status'] = 'warning'
+                except:
+                    pass
+            return data
         else:
             return {
                 "status": "stopped",
@@ -291,24 +307,26 @@ def load_trading_data():
         return None
 
 def load_trades_history():
-    """加载交易历史"""
+    """加载交易历史（增量读取交易日志）"""
     try:
-        if os.path.exists(TRADES_FILE):
-            with open(TRADES_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            return []
+        from data_manager import load_trades_history as load_trades_journal
+        return load_trades_journal()
     except Exception as e:
         st.error(f"加载交易历史失败: {e}")
         return []
 
-def create_equity_chart():
-    """创建账户总权益曲线图 - 高端深色主题"""
+def create_equity_chart(range_key='全部'):
+    """创建账户总权益曲线图 - 高端深色主题（按时间范围选择原始快照/小时K线/日K线，超过点数预算时LTTB降采样）"""
     try:
         # 导入数据管理函数
-        from data_manager import load_equity_history
+        from data_manager import load_equity_series
+        from downsample import lttb_indices
 
-        equity_history = load_equity_history()
+        window = EQUITY_RANGES.get(range_key)
+        if window is None:
+            equity_history = load_equity_series()
+        else:
+            equity_history = load_equity_series(since=datetime.now() - window)
 
         if not equity_history or len(equity_history) == 0:
             fig = go.Figure()
@@ -329,6 +347,13 @@ def create_equity_chart():
 
         df = pd.DataFrame(equity_history)
         df['timestamp'] = pd.to_datetime(df['timestamp'])
+        total_points = len(df)
+
+        # 降采样到点数预算，保留峰值和谷值
+        if total_points > EQUITY_CHART_POINTS:
+            index = lttb_indices(df['timestamp'].astype('int64').to_numpy(), df['equity'].to_numpy(), EQUITY_CHART_POINTS)
+            df = df.iloc[index]
+        show_markers = len(df) <= EQUITY_MARKER_POINTS
 
         # 计算初始权益和当前权益
         initial_equity = df['equity'].iloc[0]
@@ -346,9 +371,10 @@ def create_equity_chart():
         fig.add_trace(go.Scatter(
             x=df['timestamp'],
             y=df['equity'],
-            mode='lines+markers',
+            mode='lines+markers' if show_markers else 'lines',
             name='账户总权益',
-            line=dict(color=line_color, width=3, shape='spline'),
+            # 降采样后的曲线用折线，平滑插值会削弱保留下来的峰谷
+            line=dict(color=line_color, width=3 if show_markers else 2, shape='spline' if show_markers else 'linear'),
             fill='tozeroy',
             fillcolor=fill_color,
             marker=dict(
@@ -371,7 +397,8 @@ def create_equity_chart():
 
         fig.update_layout(
             title=dict(
-                text=f"💰 账户总权益曲线 ({equity_change:+.2f} USDT / {equity_change_pct:+.2f}%)",
+                text=f"💰 账户总权益曲线 ({equity_change:+.2f} USDT / {equity_change_pct:+.2f}%)"
+                     + (f"<br><sup>{total_points}个点降采样为{len(df)}个</sup>" if len(df) < total_points else ""),
                 font=dict(size=24, color='#e0e0e0', family="Arial Black"),
                 x=0.5,
                 xanchor='center'
@@ -474,12 +501,168 @@ def create_signal_distribution_chart(trades_history):
     
     return fig
 
+def create_cycle_waterfall(timeline):
+    """创建交易周期耗时瀑布图（每行一个span，按嵌套层级缩进）"""
+    spans = timeline.get('spans', [])
+    fig = go.Figure()
+    if not spans:
+        fig.add_annotation(
+            text="暂无周期数据",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False,
+            font=dict(size=16, color="#667eea")
+        )
+        fig.update_layout(height=300, plot_bgcolor='rgba(30, 30, 46, 0.6)', paper_bgcolor='rgba(0,0,0,0)')
+        return fig
+
+    # 同名span加序号区分，保证每个span一行
+    labels = [f"{'　' * s['depth']}{s['name']} #{i + 1}" for i, s in enumerate(spans)]
+    colors = [
+        '#f5576c' if s.get('error') else '#ffd93d' if s['name'] == 'sleep' else '#667eea' if s['depth'] == 0 else '#38ef7d'
+        for s in spans
+    ]
+
+    fig.add_trace(go.Bar(
+        y=labels,
+        x=[s['duration'] for s in spans],
+        base=[s['start'] for s in spans],
+        orientation='h',
+        marker=dict(color=colors, line=dict(color='rgba(255, 255, 255, 0.2)', width=1)),
+        text=[f"{s['duration']:.2f}s" for s in spans],
+        textposition='outside',
+        textfont=dict(color='#e0e0e0', size=11),
+        customdata=[[s['start'], s.get('thread', ''), s.get('error', '')] for s in spans],
+        hovertemplate='<b>%{y}</b><br>开始: %{customdata[0]:.3f}s<br>耗时: %{x:.3f}s<br>线程: %{customdata[1]}<br>%{customdata[2]}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title=dict(
+            text=f"⏱️ {timeline.get('started_at', '')} 周期耗时 {timeline.get('duration', 0):.2f}秒",
+            font=dict(size=18, color='#e0e0e0'),
+            x=0.5,
+            xanchor='center'
+        ),
+        height=max(300, 28 * len(spans) + 100),
+        showlegend=False,
+        xaxis=dict(title='秒', gridcolor='rgba(102, 126, 234, 0.1)', color='#e0e0e0'),
+        yaxis=dict(autorange='reversed', color='#e0e0e0', tickfont=dict(size=12)),
+        plot_bgcolor='rgba(30, 30, 46, 0.6)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=20, r=60, t=50, b=40)
+    )
+    return fig
+
+def create_trades_table(trades_history):
+    """交易记录表格（最近20条，最新的在上面）"""
+    # 交易日志保留全部历史，只格式化最近20条
+    df_trades = pd.DataFrame(trades_history[-20:])
+    
+    # 格式化数据
+    df_trades['timestamp'] = pd.to_datetime(df_trades['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
+    df_trades['price'] = df_trades['price'].apply(lambda x: f"${x:,.2f}")
+    df_trades['amount'] = df_trades['amount'].apply(lambda x: f"{x:.2f}")
+    df_trades['pnl'] = df_trades['pnl'].apply(lambda x: f"{x:+.2f}" if x != 0 else "-")
+    
+    # 只显示需要的列
+    display_df = df_trades[['timestamp', 'signal', 'price', 'amount', 'confidence', 'reason']].tail(20)
+    display_df.columns = ['时间', '信号', '价格', '数量', '信心', '理由']
+    
+    # 反转顺序（最新的在上面）
+    return display_df.iloc[::-1].reset_index(drop=True)
+
+# ==================== 缓存层 ====================
+# 以数据变化标识（文件inode/修改时间/大小或SQLite记录ID）为键，数据未变化时所有会话直接复用
+# 已解析的数据和已生成的图表（cache_resource不复制对象，调用方不要修改返回值）
+
+def data_signature(kind):
+    """数据变化标识（一次stat开销）"""
+    from data_manager import data_signature as get_data_signature
+    return get_data_signature(kind)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_trades_history(signature):
+    return load_trades_history()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_trades_table(signature):
+    return create_trades_table(get_trades_history(signature))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_signal_distribution_chart(signature):
+    return create_signal_distribution_chart(get_trades_history(signature))
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def get_equity_chart(signature, range_key):
+    return create_equity_chart(range_key)
+
+def timeline_signature():
+    """周期时间线文件标识"""
+    from tracing import TIMELINE_FILE
+    try:
+        stat = os.stat(TIMELINE_FILE)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_cycle_timelines(signature):
+    """最近的交易周期时间线（最新在前）"""
+    from tracing import read_recent
+    return read_recent()[::-1]
+
+def panel_signature(panel):
+    """
+    面板数据标识（一次stat或共享内存读取）
+
+    参数:
+        panel: status/trades/equity/timeline；状态面板还包含按已显示的更新时间判断的过期标记
+    """
+    if panel == 'timeline':
+        return timeline_signature()
+    if panel != 'status':
+        return data_signature(panel)
+
+    stale = False
+    last_update = st.session_state.get('rendered_last_update')
+    if last_update and last_update != 'N/A':
+        try:
+            age = (datetime.now() - datetime.strptime(last_update, '%Y-%m-%d %H:%M:%S')).total_seconds() / 60
+            stale = age > STALE_MINUTES
+        except ValueError:
+            pass
+    return data_signature('status'), stale
+
+def next_refresh_interval():
+    """本会话的检查间隔：从最近一次数据变化起每空闲一个间隔翻倍，直至上限"""
+    idle = time.time() - st.session_state.last_data_change
+    interval = AUTO_REFRESH_MIN_INTERVAL
+    while interval < AUTO_REFRESH_MAX_INTERVAL and idle >= interval * 2:
+        interval *= 2
+    return min(interval, AUTO_REFRESH_MAX_INTERVAL)
+
+def auto_refresh_watcher():
+    """
+    自动刷新检查（fragment定时运行，不输出元素，只做几次stat/共享内存读取）
+    面板数据和检查间隔都未变化时直接返回；有变化时重新运行一次页面：
+    未变化面板的数据和图表直接取缓存，新的检查间隔随页面运行重新注册
+    """
+    rendered = st.session_state.rendered_signatures
+    if any(panel_signature(panel) != signature for panel, signature in rendered.items()):
+        st.session_state.last_data_change = time.time()
+        st.rerun()
+
+    # run_every只在注册时读取，退避到下一档时重新运行页面注册新间隔（每档一次）
+    if next_refresh_interval() != st.session_state.refresh_interval:
+        st.rerun()
+
 def main():
     # 初始化session state
     if 'auto_refresh' not in st.session_state:
         st.session_state.auto_refresh = False
     if 'last_refresh' not in st.session_state:
         st.session_state.last_refresh = time.time()
+    if 'last_data_change' not in st.session_state:
+        st.session_state.last_data_change = time.time()
     
     # 标题
     st.title("🤖 BTC自动交易机器人")
@@ -495,7 +678,7 @@ def main():
             st.rerun()
     with col_refresh2:
         auto_refresh = st.checkbox(
-            "自动刷新 (10秒)", 
+            "自动刷新 (数据更新时)", 
             value=st.session_state.auto_refresh,
             key='auto_refresh_checkbox'
         )
@@ -503,10 +686,29 @@ def main():
         if auto_refresh != st.session_state.auto_refresh:
             st.session_state.auto_refresh = auto_refresh
             st.session_state.last_refresh = time.time()
+            st.session_state.last_data_change = time.time()
+    
+    # 各面板输出时记录数据标识，自动刷新检查据此判断是否需要重新运行页面
+    st.session_state.rendered_signatures = {}
+    live_dashboard()
     
-    # 加载数据
+    # 自动刷新：定时检查只做stat，数据或检查间隔变化时才重新运行页面，不再每秒sleep+rerun
+    if st.session_state.auto_refresh:
+        st.session_state.refresh_interval = next_refresh_interval()
+        st.caption(f"🔔 自动刷新已开启：每 {st.session_state.refresh_interval} 秒检查数据更新（无变化时逐步延长至 {AUTO_REFRESH_MAX_INTERVAL} 秒）")
+        st.fragment(auto_refresh_watcher, run_every=st.session_state.refresh_interval)()
+
+def live_dashboard():
+    """实时面板：图表和表格按数据变化标识缓存，数据未变化的面板不重新读取和生成"""
+    # 先记录数据标识再加载，加载期间的更新会在下次检查时发现
+    rendered = st.session_state.rendered_signatures
+    rendered['status'] = panel_signature('status')
+    rendered['trades'] = panel_signature('trades')
+    
+    # 加载数据（状态按序列号/文件标识缓存，交易记录按数据变化标识缓存）
     data = load_trading_data()
-    trades_history = load_trades_history()
+    trades_signature = data_signature('trades')
+    trades_history = get_trades_history(trades_signature)
     
     if data is None:
         st.error("无法加载数据，请检查交易程序是否运行")
@@ -527,14 +729,24 @@ def main():
         - Linux/Mac: 运行 `./启动交易程序.sh`
         - 命令行: `python deepseekok2.py`
         """)
-        st.info("💡 数据文件路径：`trading_data.json`")
+        st.info(f"💡 数据文件路径：`{DATA_FILE}`")
+    
+    # 过期判断依据本次显示的更新时间，标识与之保持一致
+    if data.get('last_update') != st.session_state.get('rendered_last_update'):
+        st.session_state.rendered_last_update = data.get('last_update')
+        rendered['status'] = panel_signature('status')
     
     # 状态指示器
     status_color = "🟢" if data['status'] == 'running' else "🔴"
+    decision_lag = data.get('metrics', {}).get('decision_lag', {})
+    lag_text = f" | 收盘到决策延迟: {decision_lag['last']:.2f}秒" if decision_lag.get('last') is not None else ""
+    cache_stats = data.get('metrics', {}).get('llm_cache', {})
+    if cache_stats.get('hits', 0) + cache_stats.get('misses', 0) > 0:
+        lag_text += f" | AI缓存命中率: {cache_stats['hit_rate']}%"
     st.markdown(f"""
     <div class="{'status-card' if data['status'] == 'running' else 'warning-card'}">
         <h2>{status_color} 运行状态: {data['status'].upper()}</h2>
-        <p>最后更新: {data['last_update']}</p>
+        <p>最后更新: {data['last_update']}{lag_text}</p>
     </div>
     """, unsafe_allow_html=True)
     
@@ -602,22 +814,24 @@ def main():
         perf = data['performance']
         pnl_class = "profit" if perf['total_pnl'] >= 0 else "loss"
         win_rate_color = "#38ef7d" if perf['win_rate'] >= 50 else "#f5576c"
+        extra_perf_html = ""
+        if 'max_drawdown' in perf:
+            profit_factor = f"{perf['profit_factor']:.2f}" if perf.get('profit_factor') is not None else "-"
+            extra_perf_html = f"""
+            <p style="font-size: 16px; color: #e0e0e0;"><b>📉 最大回撤:</b> <span class="loss">{perf['max_drawdown']:.2f} USDT</span></p>
+            <p style="font-size: 16px; color: #e0e0e0;"><b>⚖️ 盈亏比:</b> {profit_factor} | <b>平均盈/亏:</b> <span class="profit">{perf['avg_win']:+.2f}</span> / <span class="loss">{perf['avg_loss']:+.2f}</span></p>
+            """
         st.markdown(f"""
         <div class="info-card">
             <p style="font-size: 18px; color: #e0e0e0;"><b>💵 总盈亏:</b> <span class="{pnl_class}" style="font-size: 24px;">{perf['total_pnl']:+.2f} USDT</span></p>
             <p style="font-size: 18px; color: #e0e0e0;"><b>🎯 胜率:</b> <span style="color: {win_rate_color}; font-weight: 700; font-size: 20px;">{perf['win_rate']:.1f}%</span></p>
             <p style="font-size: 18px; color: #e0e0e0;"><b>📊 总交易次数:</b> <span style="color: #667eea; font-weight: 700; font-size: 20px;">{perf['total_trades']}</span></p>
+            {extra_perf_html}
         </div>
         """, unsafe_allow_html=True)
     
     # 第三行：账户总权益曲线
-    st.markdown("### 📈 账户总权益曲线")
-    equity_chart = create_equity_chart()
-    st.plotly_chart(
-        equity_chart,
-        use_container_width=True,
-        config={'displayModeBar': True, 'displaylogo': False}
-    )
+    equity_panel()
     
     # 第四行：AI决策和信号分布
     col7, col8 = st.columns([2, 1])
@@ -680,7 +894,7 @@ def main():
     
     with col8:
         st.markdown("### 📊 信号分布")
-        signal_chart = create_signal_distribution_chart(trades_history)
+        signal_chart = get_signal_distribution_chart(trades_signature)
         st.plotly_chart(
             signal_chart,
             use_container_width=True,
@@ -690,20 +904,7 @@ def main():
     # 第五行：交易记录
     st.markdown("### 📝 交易记录")
     if trades_history:
-        df_trades = pd.DataFrame(trades_history)
-        
-        # 格式化数据
-        df_trades['timestamp'] = pd.to_datetime(df_trades['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
-        df_trades['price'] = df_trades['price'].apply(lambda x: f"${x:,.2f}")
-        df_trades['amount'] = df_trades['amount'].apply(lambda x: f"{x:.2f}")
-        df_trades['pnl'] = df_trades['pnl'].apply(lambda x: f"{x:+.2f}" if x != 0 else "-")
-        
-        # 只显示需要的列
-        display_df = df_trades[['timestamp', 'signal', 'price', 'amount', 'confidence', 'reason']].tail(20)
-        display_df.columns = ['时间', '信号', '价格', '数量', '信心', '理由']
-        
-        # 反转顺序（最新的在上面）
-        display_df = display_df.iloc[::-1].reset_index(drop=True)
+        display_df = get_trades_table(trades_signature)
         
         st.dataframe(
             display_df,
@@ -713,22 +914,52 @@ def main():
     else:
         st.info("暂无交易记录")
     
-    # 自动刷新逻辑
-    if st.session_state.auto_refresh:
-        current_time = time.time()
-        elapsed = current_time - st.session_state.last_refresh
-        
-        # 如果距离上次刷新超过10秒，触发刷新
-        if elapsed >= 10:
-            st.session_state.last_refresh = current_time
-            time.sleep(0.1)  # 短暂延迟避免过于频繁
-            st.rerun()
+    # 第六行：交易周期耗时
+    cycle_timeline_panel()
+
+@st.fragment
+def equity_panel():
+    """账户总权益曲线（fragment：切换时间范围只重新运行本面板）"""
+    signature = panel_signature('equity')
+    st.session_state.rendered_signatures['equity'] = signature
+    st.markdown("### 📈 账户总权益曲线")
+    range_key = st.radio(
+        "时间范围",
+        list(EQUITY_RANGES.keys()),
+        index=len(EQUITY_RANGES) - 1,
+        horizontal=True,
+        key='equity_range',
+        label_visibility='collapsed'
+    )
+    equity_chart = get_equity_chart(signature, range_key)
+    st.plotly_chart(
+        equity_chart,
+        use_container_width=True,
+        config={'displayModeBar': True, 'displaylogo': False}
+    )
+
+@st.fragment
+def cycle_timeline_panel():
+    """交易周期耗时瀑布图（fragment：切换周期只重新运行本面板）"""
+    signature = panel_signature('timeline')
+    st.session_state.rendered_signatures['timeline'] = signature
+    timelines = get_cycle_timelines(signature)
+    with st.expander(f"⏱️ 交易周期耗时瀑布图（最近{len(timelines)}个周期）", expanded=False):
+        if timelines:
+            index = st.selectbox(
+                "周期",
+                range(len(timelines)),
+                format_func=lambda i: f"{timelines[i]['started_at']} · {timelines[i]['duration']:.2f}秒"
+                                      f"{'' if timelines[i].get('attrs', {}).get('processed', True) else ' · 跳过'}",
+                key='timeline_index'
+            )
+            st.plotly_chart(
+                create_cycle_waterfall(timelines[index]),
+                use_container_width=True,
+                config={'displayModeBar': False}
+            )
         else:
-            # 显示倒计时
-            remaining = int(10 - elapsed)
-            st.info(f"⏳ 下次自动刷新还有 {remaining} 秒...")
-            time.sleep(1)  # 等待1秒后重新检查
-            st.rerun()
+            st.info("暂无周期数据，交易程序完成首个周期后显示")
 
 if __name__ == "__main__":
     main()
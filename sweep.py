@@ -0,0 +1,248 @@
+"""
+参数扫描 - 多进程并行回测TRADE_CONFIG参数组合
+K线数据放入共享内存，各工作进程只读映射（不逐个任务序列化K线），
+每个工作进程只计算一次指标，之后逐个配置执行Backtester.run；
+结果边完成边写入CSV，并定期输出当前排名。
+
+    python sweep.py data/btc_1h.csv --grid grid.json --top 20
+
+网格文件为 {"分组.参数": [取值, ...]}，如：
+    {"position_management.max_position_ratio": [10, 30, 50],
+     "tp_sl.normal_sl_pct": [0.015, 0.02, 0.03],
+     "signal_validation.rsi_overbought": [70, 80]}
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import json
+import os
+import time
+from multiprocessing import Pool, shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import backtest
+
+# 默认网格（4 × 3 × 3 × 3 × 3 × 2 × 2 = 1296组）
+DEFAULT_GRID = {
+    'position_management.high_confidence_multiplier': [1.0, 1.5, 2.0, 2.5],
+    'position_management.trend_strength_multiplier': [1.0, 1.2, 1.5],
+    'position_management.max_position_ratio': [10, 30, 50],
+    'tp_sl.normal_sl_pct': [0.015, 0.02, 0.03],
+    'tp_sl.normal_tp_pct': [0.03, 0.05, 0.08],
+    'signal_validation.rsi_overbought': [70, 80],
+    'signal_validation.rsi_oversold': [20, 30],
+}
+
+# 结果表中的回测统计列
+RESULT_METRICS = ['total_return_pct', 'max_drawdown_pct', 'win_rate', 'profit_factor',
+                  'total_trades', 'fees', 'funding', 'final_equity']
+
+PROGRESS_INTERVAL = 10  # 输出排名的间隔（秒）
+
+# 工作进程内的回测器（进程初始化时创建）
+_worker = {}
+
+
+def expand_grid(grid: Dict[str, List]) -> Iterator[Dict]:
+    """网格展开为参数组合：{'分组.参数': 取值}"""
+    names = list(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def to_overrides(params: Dict) -> Dict:
+    """{'分组.参数': 取值} 转为backtest.trade_config的嵌套覆盖参数"""
+    overrides = {}
+    for name, value in params.items():
+        section, _, key = name.rpartition('.')
+        if section:
+            overrides.setdefault(section, {})[key] = value
+        else:
+            overrides[key] = value
+    return overrides
+
+
+def share_candles(candles: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, Dict]:
+    """
+    把K线数组复制到一块共享内存（每列一行的float64矩阵）
+
+    返回:
+        (shm, layout): layout供工作进程重新映射，调用方负责close/unlink
+    """
+    columns = list(candles)
+    length = len(candles['close'])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(columns) * length * 8))
+    matrix = np.ndarray((len(columns), length), dtype=np.float64, buffer=shm.buf)
+    for row, column in enumerate(columns):
+        matrix[row] = candles[column]  # 毫秒时间戳小于2^53，float64可精确表示
+    return shm, {'name': shm.name, 'columns': columns, 'length': length}
+
+
+def attach_candles(layout: Dict) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+    """在工作进程中映射共享内存中的K线（只读视图，不复制）"""
+    shm = shared_memory.SharedMemory(name=layout['name'])
+    matrix = np.ndarray((len(layout['columns']), layout['length']), dtype=np.float64, buffer=shm.buf)
+    matrix.flags.writeable = False
+    candles = {column: matrix[row] for row, column in enumerate(layout['columns'])}
+    candles['timestamp'] = candles['timestamp'].astype(np.int64)
+    return shm, candles
+
+
+def _init_worker(layout: Dict, source: str, records: Optional[str], run_kwargs: Dict):
+    shm, candles = attach_candles(layout)
+    backtester = backtest.Backtester(candles)
+    if source == 'recorded':
+        signal_source = backtest.RecordedSignalSource.from_file(records, backtester.timeframe_ms)
+    else:
+        signal_source = backtest.RuleSignalSource()
+    _worker.update(shm=shm, backtester=backtester, source=signal_source, run_kwargs=run_kwargs)
+
+
+def _run_config(task: Tuple[int, Dict]) -> Dict:
+    index, params = task
+    try:
+        result = _worker['backtester'].run(_worker['source'], config=to_overrides(params), **_worker['run_kwargs'])
+        row = {metric: result.summary.get(metric) for metric in RESULT_METRICS}
+    except Exception as e:
+        row = {'error': str(e)}
+    row.update(index=index, **params)
+    return row
+
+
+class Leaderboard:
+    """按指标保留前N名（流式加入结果）"""
+
+    def __init__(self, metric: str, size: int, ascending: bool = False):
+        self.metric = metric
+        self.size = size
+        self.ascending = ascending
+        self._heap = []
+
+    def add(self, row: Dict):
+        value = row.get(self.metric)
+        if value is None:
+            return
+        score = -value if self.ascending else value
+        item = (score, -row['index'], row)
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def rows(self) -> List[Dict]:
+        return [item[2] for item in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+
+    def format(self, params: List[str]) -> str:
+        headers = ['#'] + [metric for metric in RESULT_METRICS[:5]] + params
+        lines = ['  '.join(headers)]
+        for rank, row in enumerate(self.rows(), 1):
+            cells = [str(rank)]
+            for name in headers[1:]:
+                value = row.get(name)
+                cells.append(f"{value:.4g}" if isinstance(value, float) else str(value))
+            lines.append('  '.join(cells))
+        return '\n'.join(lines)
+
+
+def run_sweep(candles_path: str, grid: Dict[str, List], output: str = 'sweep_results.csv',
+              processes: Optional[int] = None, sort_by: str = 'total_return_pct', ascending: bool = False,
+              top: int = 10, source: str = 'rule', records: Optional[str] = None,
+              chunksize: int = 4, **run_kwargs) -> List[Dict]:
+    """
+    并行回测网格中的全部参数组合
+
+    参数:
+        grid: {'分组.参数': [取值, ...]}，分组为TRADE_CONFIG中的嵌套字典
+        output: 结果CSV（按完成顺序写入，全部完成后按sort_by重写为排名顺序）
+        processes: 进程数，默认CPU核数
+        source: 信号来源 rule/recorded（recorded需要records文件）
+        run_kwargs: 传给Backtester.run的参数（initial_balance、fee_rate等）
+
+    返回:
+        按sort_by排序的前top名
+    """
+    candles = backtest.load_candles(candles_path)
+    configs = list(expand_grid(grid))
+    params = list(grid)
+    leaderboard = Leaderboard(sort_by, top, ascending)
+    rows = []
+
+    shm, layout = share_candles(candles)
+    started = time.perf_counter()
+    last_report = started
+    print(f"🔬 参数扫描: {len(configs)}组配置, {len(candles['close'])}根K线, {processes or os.cpu_count()}个进程")
+    try:
+        with open(output, 'w', newline='', encoding='utf-8') as f, \
+                Pool(processes, initializer=_init_worker, initargs=(layout, source, records, run_kwargs)) as pool:
+            writer = csv.DictWriter(f, fieldnames=['index'] + params + RESULT_METRICS + ['error'])
+            writer.writeheader()
+            for row in pool.imap_unordered(_run_config, enumerate(configs), chunksize=chunksize):
+                rows.append(row)
+                writer.writerow(row)
+                leaderboard.add(row)
+
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    f.flush()
+                    last_report = now
+                    rate = len(rows) / (now - started)
+                    eta = (len(configs) - len(rows)) / rate if rate else 0
+                    print(f"\n⏳ {len(rows)}/{len(configs)} ({rate:.1f}组/秒, 预计剩余{eta:.0f}秒)")
+                    print(leaderboard.format(params))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # 全部完成后按排名重写结果表
+    def sort_key(row):
+        value = row.get(sort_by)
+        if value is None:
+            return (1, 0)
+        return (0, value if ascending else -value)
+    rows.sort(key=sort_key)
+    with open(output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank', 'index'] + params + RESULT_METRICS + ['error'])
+        writer.writeheader()
+        for rank, row in enumerate(rows, 1):
+            writer.writerow({'rank': rank, **row})
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ 扫描完成: {len(rows)}组, 耗时{elapsed:.1f}秒, 结果已写入 {output}")
+    print(leaderboard.format(params))
+    return leaderboard.rows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程回测TRADE_CONFIG参数组合')
+    parser.add_argument('candles', help='K线文件（CSV/JSON/JSONL）')
+    parser.add_argument('--grid', help='参数网格JSON文件，默认使用DEFAULT_GRID')
+    parser.add_argument('--output', default='sweep_results.csv', help='结果CSV文件')
+    parser.add_argument('--processes', type=int, help='进程数，默认CPU核数')
+    parser.add_argument('--sort-by', default='total_return_pct', choices=RESULT_METRICS, help='排名指标')
+    parser.add_argument('--ascending', action='store_true', help='排名指标越小越好（如max_drawdown_pct）')
+    parser.add_argument('--top', type=int, default=10, help='排名显示的配置数')
+    parser.add_argument('--source', choices=['rule', 'recorded'], default='rule', help='信号来源')
+    parser.add_argument('--records', help='recorded信号来源的AI回复记录文件')
+    parser.add_argument('--balance', type=float, default=backtest.INITIAL_BALANCE, help='初始资金（USDT）')
+    parser.add_argument('--fee', type=float, default=backtest.TAKER_FEE_RATE, help='手续费率')
+    parser.add_argument('--funding', type=float, default=backtest.FUNDING_RATE, help='每8小时资金费率')
+    args = parser.parse_args()
+
+    if args.source == 'recorded' and not args.records:
+        parser.error('--source recorded 需要 --records')
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            grid = json.load(f)
+
+    run_sweep(args.candles, grid, output=args.output, processes=args.processes, sort_by=args.sort_by,
+              ascending=args.ascending, top=args.top, source=args.source, records=args.records,
+              initial_balance=args.balance, fee_rate=args.fee, funding_rate=args.funding)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+import ccxt
+import pytest
+
+from exchange_sim import FUNDING_INTERVAL_MS, SimulatedExchange
+
+SYMBOL = 'BTC/USDT:USDT'
+MINUTE_MS = 60 * 1000
+
+
+class FakeFeed:
+    """测试行情：price()为当前价格，updates()返回测试放入的K线（repeat时每次调用都重复返回，模拟LiveFeed的未收盘K线）"""
+
+    def __init__(self, price: float = 30000.0):
+        self.timeframes = {'1m': '1m'}
+        self.last = price
+        self.now = 0
+        self.bars = []
+        self.repeat = False
+
+    def push(self, open_, high, low, close, timestamp=None):
+        self.now = self.now + MINUTE_MS if timestamp is None else timestamp
+        self.bars.append([self.now, open_, high, low, close, 1.0])
+        self.last = close
+
+    def updates(self):
+        bars = list(self.bars)
+        if not self.repeat:
+            self.bars = []
+        return bars
+
+    def price(self):
+        return self.last
+
+    def milliseconds(self):
+        return self.now
+
+    def load_markets(self):
+        return {}
+
+
+def make_exchange(feed, **kwargs):
+    options = {'balance': 10000.0, 'fee_rate': 0.0, 'funding_rate': 0.0, 'slippage': 0.0,
+               'leverage': 10, 'verbose': False}
+    options.update(kwargs)
+    return SimulatedExchange(feed, SYMBOL, **options)
+
+
+def place_algo(exchange, side, size, sl=None, tp=None):
+    params = {'instId': exchange.inst_id, 'tdMode': 'cross', 'side': side, 'ordType': 'conditional',
+              'sz': str(size), 'reduceOnly': 'true'}
+    if sl is not None:
+        params.update(slTriggerPx=str(sl), slOrdPx='-1')
+    if tp is not None:
+        params.update(tpTriggerPx=str(tp), tpOrdPx='-1')
+    response = exchange.private_post_trade_order_algo(params)
+    assert response['code'] == '0'
+    return response['data'][0]['algoId']
+
+
+def open_long(exchange, size=1):
+    exchange.create_market_order(SYMBOL, 'buy', size)
+    return exchange.fetch_positions([SYMBOL])[0]
+
+
+def test_market_order_fills_at_price_with_fee():
+    feed = FakeFeed(30000.0)
+    exchange = make_exchange(feed, fee_rate=0.0005, slippage=0.001)
+
+    order = exchange.create_market_order(SYMBOL, 'buy', 2)
+    fill_price = 30000.0 * 1.001
+    fee = fill_price * 2 * 0.01 * 0.0005
+
+    assert order['status'] == 'closed'
+    assert order['average'] == pytest.approx(fill_price)
+    assert order['fee']['cost'] == pytest.approx(fee)
+    position = exchange.fetch_positions([SYMBOL])[0]
+    assert position['side'] == 'long'
+    assert position['contracts'] == 2
+    assert position['entryPrice'] == pytest.approx(fill_price)
+    assert exchange.state['balance'] == pytest.approx(10000.0 - fee)
+
+    # 反向成交先平仓，超出部分反向开仓
+    feed.last = 31000.0
+    exchange.create_market_order(SYMBOL, 'sell', 3)
+    position = exchange.fetch_positions([SYMBOL])[0]
+    assert position['side'] == 'short'
+    assert position['contracts'] == 1
+
+
+def test_reduce_only_without_position_is_rejected():
+    exchange = make_exchange(FakeFeed())
+    with pytest.raises(ccxt.InvalidOrder, match="don't have any positions"):
+        exchange.create_market_order(SYMBOL, 'sell', 1, params={'reduceOnly': True})
+
+    # 同方向的只减仓单同样拒绝
+    open_long(exchange)
+    with pytest.raises(ccxt.InvalidOrder):
+        exchange.create_market_order(SYMBOL, 'buy', 1, params={'reduceOnly': True})
+
+
+def test_insufficient_margin_is_rejected():
+    exchange = make_exchange(FakeFeed(30000.0), balance=100.0)
+    with pytest.raises(ccxt.InsufficientFunds):
+        exchange.create_market_order(SYMBOL, 'buy', 10)
+
+
+def test_stop_loss_triggers_intrabar_at_trigger_price():
+    feed = FakeFeed(30000.0)
+    exchange = make_exchange(feed)
+    open_long(exchange)
+    place_algo(exchange, 'sell', 1, sl=29500)
+
+    feed.push(30000, 30100, 29400, 29800)
+    assert exchange.fetch_positions([SYMBOL]) == []
+    assert exchange.state['balance'] == pytest.approx(10000.0 - 500 * 0.01)
+    assert exchange.private_get_trade_orders_algo_pending({'ordType': 'conditional'})['data'] == []
+
+
+def test_take_profit_triggers_intrabar_at_trigger_price():
+    feed = FakeFeed(30000.0)
+    exchange = make_exchange(feed)
+    exchange.create_market_order(SYMBOL, 'sell', 1)
+    place_algo(exchange, 'buy', 1, tp=29000)
+
+    # 未触及止盈价时条件单保留
+    feed.push(30000, 30200, 29500, 29600)
+    assert exchange.fetch_positions([SYMBOL])[0]['side'] == 'short'
+
+    feed.push(29600, 29700, 28900, 29100)
+    assert exchange.fetch_positions([SYMBOL]) == []
+    assert exchange.state['balance'] == pytest.approx(10000.0 + 1000 * 0.01)
+
+
+def test_gap_through_stop_fills_at_open():
+    feed = FakeFeed(30000.0)
+    exchange = make_exchange(feed)
+    open_long(exchange)
+    place_algo(exchange, 'sell', 1, sl=29500, tp=31000)
+
+    feed.push(29000, 29200, 28800, 29100)
+    assert exchange.fetch_positions([SYMBOL]) == []
+    assert exchange.state['balance'] == pytest.approx(10000.0 - 1000 * 0.01)
+
+
+def test_stop_loss_wins_when_both_are_hit_in_one_bar():
+    feed = FakeFeed(30000.0)
+    exchange = make_exchange(feed)
+    open_long(exchange)
+    place_algo(exchange, 'sell', 1, sl=29500, tp=30500)
+
+    feed.push(30000, 30600, 29400, 30000)
+    assert exchange.fetch_positions([SYMBOL]) == []
+    assert exchange.state['balance'] == pytest.approx(10000.0 - 500 * 0.01)
+    assert exchange.state['triggered'] == 1
+
+
+def test_funding_is_settled_once_per_interval():
+    feed = FakeFeed(30000.0)
+    exchange = make_exchange(feed, funding_rate=0.0001)
+    open_long(exchange, size=10)
+
+    # 结算时刻所在的1分钟K线未收盘，每次调用都会被重复返回
+    feed.repeat = True
+    feed.push(30000, 30000, 30000, 30000, timestamp=FUNDING_INTERVAL_MS)
+    for _ in range(5):
+        exchange.fetch_balance()
+    payment = 30000 * 10 * 0.01 * 0.0001
+    assert exchange.state['funding'] == pytest.approx(payment)
+    assert exchange.state['balance'] == pytest.approx(10000.0 - payment)
+
+    # 非结算时刻不收取，下一个结算时刻再收取一次
+    feed.bars = []
+    feed.push(30000, 30000, 30000, 30000, timestamp=FUNDING_INTERVAL_MS + MINUTE_MS)
+    exchange.fetch_balance()
+    feed.bars = []
+    feed.push(30000, 30000, 30000, 30000, timestamp=2 * FUNDING_INTERVAL_MS)
+    exchange.fetch_balance()
+    exchange.fetch_balance()
+    assert exchange.state['funding'] == pytest.approx(2 * payment)
+
+
+def test_short_receives_funding_and_state_is_restored(tmp_path):
+    feed = FakeFeed(30000.0)
+    state_file = tmp_path / 'exchange_sim.json'
+    exchange = make_exchange(feed, funding_rate=0.0001, state_file=str(state_file))
+    exchange.create_market_order(SYMBOL, 'sell', 10)
+    feed.push(30000, 30000, 30000, 30000, timestamp=FUNDING_INTERVAL_MS)
+    exchange.fetch_balance()
+    assert exchange.state['funding'] == pytest.approx(-0.3)
+
+    # 重启后恢复已结算时间戳，同一时刻不再收取
+    restored = make_exchange(feed, funding_rate=0.0001, state_file=str(state_file))
+    feed.push(30000, 30000, 30000, 30000, timestamp=FUNDING_INTERVAL_MS)
+    restored.fetch_balance()
+    assert restored.state['funding'] == pytest.approx(-0.3)
+    assert restored.fetch_positions([SYMBOL])[0]['side'] == 'short'
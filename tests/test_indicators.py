@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import StreamingIndicators, calculate_indicators_batch
+
+WINDOW = 168  # 与TRADE_CONFIG['data_points']一致
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+INDICATORS = ['sma_5', 'sma_20', 'sma_50', 'ema_12', 'ema_26', 'macd', 'macd_signal', 'macd_histogram',
+              'rsi', 'bb_middle', 'bb_upper', 'bb_lower', 'bb_position', 'volume_ma', 'volume_ratio',
+              'resistance', 'support']
+
+# 允许偏差（相对价格）：MACD信号线窗口起点附近的MACD值使用更长历史，其余为浮点误差
+TOLERANCE = {'macd_signal': 1e-6, 'macd_histogram': 1e-6}
+DEFAULT_TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope='module')
+def bot(tmp_path_factory):
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.chdir(tmp_path_factory.mktemp('bot'))
+    import deepseekok2
+    yield deepseekok2
+    monkeypatch.undo()
+
+
+def random_candles(n: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n))
+    volume = rng.uniform(10, 100, n)
+    timestamp = np.arange(n) * 3600 * 1000
+    return np.column_stack([timestamp, open_, high, low, close, volume])
+
+
+def test_streaming_matches_pandas(bot):
+    """K线窗口逐根滑动（最后一根为未收盘K线），增量引擎与pandas全量计算的最新值一致"""
+    candles = random_candles(WINDOW + 300)
+    engine = StreamingIndicators(WINDOW)
+
+    for end in range(WINDOW, len(candles) + 1):
+        window = candles[end - WINDOW:end]
+        latest = engine.sync(window)
+        expected = bot.calculate_technical_indicators(pd.DataFrame(window, columns=COLUMNS)).iloc[-1]
+        price = window[-1][4]
+        for name in INDICATORS:
+            tolerance = TOLERANCE.get(name, DEFAULT_TOLERANCE) * price
+            assert latest[name] == pytest.approx(expected[name], abs=tolerance), (end, name)
+
+
+def test_forming_bar_does_not_change_state():
+    """未收盘K线多次更新只影响snapshot，不推入状态"""
+    candles = random_candles(WINDOW)
+    engine = StreamingIndicators(WINDOW)
+    first = engine.sync(candles)
+
+    forming = candles.copy()
+    forming[-1, 4] *= 1.01
+    engine.sync(forming)
+    assert engine.sync(candles) == first
+    assert engine.last_timestamp == candles[-2][0]
+
+
+def test_closed_last_bar_is_pushed():
+    """收盘推送时最后一根K线已收盘：last_closed推入该K线，之后的同步与逐根推入结果一致"""
+    candles = random_candles(WINDOW + 2)
+    engine = StreamingIndicators(WINDOW)
+    engine.sync(candles[:WINDOW])
+
+    closed = engine.sync(candles[1:WINDOW + 1], last_closed=True)
+    assert engine.last_timestamp == candles[WINDOW][0]
+    # 下一根K线出现前再次同步不会把已推入的K线当作未收盘K线重复计算
+    assert engine.sync(candles[1:WINDOW + 1]) == closed
+
+    expected = StreamingIndicators(WINDOW)
+    expected.sync(candles[:WINDOW])
+    expected.sync(candles[1:WINDOW + 1])
+    assert engine.sync(candles[2:]) == expected.sync(candles[2:])
+
+
+def test_batch_matches_pandas(bot):
+    """批量计算（左侧NaN填充）与pandas逐品种计算一致"""
+    lengths = [WINDOW, 120, 60]
+    frames = [random_candles(n, seed=i) for i, n in enumerate(lengths)]
+    padded = np.full((len(frames), WINDOW, len(COLUMNS)), np.nan)
+    for i, frame in enumerate(frames):
+        padded[i, WINDOW - len(frame):] = frame
+
+    batch = calculate_indicators_batch(padded[:, :, 2], padded[:, :, 3], padded[:, :, 4], padded[:, :, 5])
+    for i, frame in enumerate(frames):
+        expected = bot.calculate_technical_indicators(pd.DataFrame(frame, columns=COLUMNS))
+        for name in INDICATORS:
+            np.testing.assert_allclose(batch[name][i, WINDOW - len(frame):], expected[name].to_numpy(),
+                                       rtol=1e-9, atol=1e-9 * frame[-1][4], err_msg=name)
+
+
+def test_symbols_batch_reuses_batch_levels(bot):
+    """批量分析的支撑阻力位与单品种计算一致"""
+    frames = {'BTC/USDT:USDT': random_candles(WINDOW, seed=5), 'ETH/USDT:USDT': random_candles(80, seed=6)}
+    results = bot.analyze_symbols_batch({symbol: frame.tolist() for symbol, frame in frames.items()})
+
+    for symbol, frame in frames.items():
+        df = bot.calculate_technical_indicators(pd.DataFrame(frame, columns=COLUMNS))
+        expected = bot.get_support_resistance_levels(df)
+        levels = results[symbol]['levels_analysis']
+        assert levels.keys() == expected.keys()
+        for key, value in expected.items():
+            assert levels[key] == pytest.approx(value, rel=1e-9), key
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from llm_client import HedgedLLMClient
+
+
+class StubServer:
+    """本地OpenAI兼容接口：按请求顺序返回预设的 (延迟秒数, 回复内容)"""
+
+    def __init__(self):
+        self.responses = []
+        self.default = (0, '{"signal": "HOLD"}')
+        self.requests = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner = None
+        self.base_url = None
+
+    async def _completions(self, request):
+        await request.json()
+        self.requests += 1
+        delay, content = self.responses.pop(0) if self.responses else self.default
+        await asyncio.sleep(delay)
+        return web.json_response({
+            'id': f"stub-{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'stub',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+        })
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self._completions)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+
+    def start(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(5)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+@pytest.fixture
+def server():
+    stub = StubServer()
+    stub.start()
+    yield stub
+    stub.stop()
+
+
+def make_client(server, **kwargs):
+    options = {'deadline': 5, 'hedge_default_delay': 0.2, 'max_attempts': 3}
+    options.update(kwargs)
+    return HedgedLLMClient(api_key='test', base_url=server.base_url, model='stub', **options)
+
+
+def is_json(content):
+    try:
+        json.loads(content)
+        return True
+    except ValueError:
+        return False
+
+
+MESSAGES = [{'role': 'user', 'content': 'ping'}]
+
+
+def test_hedge_request_wins_when_first_is_slow(server):
+    server.responses = [(4, '{"signal": "SLOW"}'), (0, '{"signal": "BUY"}')]
+    # 桩服务按到达顺序分配回复，对冲等待时间要长于首个请求建立连接的耗时
+    client = make_client(server, hedge_default_delay=1)
+
+    started = time.monotonic()
+    result = client.complete(MESSAGES, validate=is_json)
+    elapsed = time.monotonic() - started
+    client.close()
+
+    assert result == '{"signal": "BUY"}'
+    assert elapsed < 3
+    assert client.stats['hedges'] == 1
+    assert client.stats['hedge_wins'] == 1
+
+
+def test_deadline_returns_none(server):
+    server.default = (3, '{"signal": "HOLD"}')
+    client = make_client(server, deadline=0.5)
+
+    started = time.monotonic()
+    result = client.complete(MESSAGES, validate=is_json)
+    elapsed = time.monotonic() - started
+    client.close()
+
+    assert result is None
+    assert elapsed < 2
+    assert client.stats['timeouts'] == 1
+
+
+def test_invalid_reply_is_resent(server):
+    server.responses = [(0, 'not json'), (0, '{"signal": "SELL"}')]
+    client = make_client(server)
+
+    result = client.complete(MESSAGES, validate=is_json)
+    client.close()
+
+    assert result == '{"signal": "SELL"}'
+    assert client.stats['invalid'] == 1
+    assert client.stats['requests'] == 2
+    assert server.requests == 2
+
+
+def test_client_recreated_with_event_loop(server):
+    """后台事件循环退出后重建，连接池随之重建，后续请求不会复用旧事件循环上的连接"""
+    client = make_client(server, hedge_default_delay=2)
+    assert client.complete(MESSAGES) == '{"signal": "HOLD"}'
+
+    client.close()
+    client._thread.join(5)
+    client._loop.close()
+
+    assert client.complete(MESSAGES) == '{"signal": "HOLD"}'
+    client.close()
+    assert client.stats['errors'] == 0
+    assert client.stats['requests'] == 2
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+
+from market_data import CandleStore, fetch_ohlcv_incremental, load_ohlcv_file
+
+# 2024-01-01 00:00 / 01:00 UTC
+EXPECTED_TIMESTAMPS = [1704067200000, 1704070800000]
+HOUR_MS = 3600 * 1000
+
+
+def write_csv(path, timestamps):
+    lines = ['timestamp,open,high,low,close,volume']
+    for i, timestamp in enumerate(timestamps):
+        lines.append(f"{timestamp},{100 + i},{101 + i},{99 + i},{100.5 + i},{10 + i}")
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+@pytest.mark.parametrize('timestamps', [
+    EXPECTED_TIMESTAMPS,
+    ['2024-01-01 00:00:00', '2024-01-01 01:00:00'],
+    ['2024-01-01T00:00:00Z', '2024-01-01T01:00:00Z'],
+    ['2024-01-01T08:00:00+08:00', '2024-01-01T09:00:00+08:00'],
+], ids=['epoch_ms', 'naive_iso', 'utc_iso', 'offset_iso'])
+def test_csv_timestamps_are_utc_milliseconds(tmp_path, timestamps):
+    path = tmp_path / 'candles.csv'
+    write_csv(path, timestamps)
+
+    candles = load_ohlcv_file(str(path))
+    assert candles['timestamp'].dtype == np.int64
+    assert candles['timestamp'].tolist() == EXPECTED_TIMESTAMPS
+    assert candles['close'].tolist() == [100.5, 101.5]
+
+
+def test_json_rows_are_sorted_and_deduplicated(tmp_path):
+    path = tmp_path / 'candles.json'
+    rows = [[EXPECTED_TIMESTAMPS[1], 1, 1, 1, 1, 1], [EXPECTED_TIMESTAMPS[0], 2, 2, 2, 2, 2],
+            [EXPECTED_TIMESTAMPS[1], 3, 3, 3, 3, 3]]
+    path.write_text(json.dumps(rows), encoding='utf-8')
+
+    candles = load_ohlcv_file(str(path))
+    assert candles['timestamp'].tolist() == EXPECTED_TIMESTAMPS
+    assert candles['open'].tolist() == [2, 3]
+
+
+def test_jsonl_objects_with_iso_timestamps(tmp_path):
+    path = tmp_path / 'candles.jsonl'
+    rows = [{'timestamp': '2024-01-01T00:00:00Z', 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5,
+             'volume': 3, 'funding_rate': None}]
+    path.write_text('\n'.join(json.dumps(row) for row in rows), encoding='utf-8')
+
+    candles = load_ohlcv_file(str(path))
+    assert candles['timestamp'].tolist() == EXPECTED_TIMESTAMPS[:1]
+    assert candles['funding_rate'].tolist() == [0.0]
+
+
+def test_missing_columns_are_reported(tmp_path):
+    path = tmp_path / 'candles.csv'
+    path.write_text('timestamp,open,close\n1,2,3\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='缺少列'):
+        load_ohlcv_file(str(path))
+
+
+class WindowExchange:
+    """只支持整窗口拉取的交易所桩，拉取时调用on_fetch（模拟并发的行情推送）"""
+
+    def __init__(self, now, on_fetch=None):
+        self.now = now
+        self.on_fetch = on_fetch
+
+    def parse_timeframe(self, timeframe):
+        return 3600
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        if self.on_fetch:
+            self.on_fetch()
+        last = self.now // HOUR_MS * HOUR_MS
+        return [[last - i * HOUR_MS, 1, 1, 1, 1, 1] for i in reversed(range(limit))]
+
+
+def test_full_refetch_swaps_window_atomically():
+    """缺口超过窗口时重新拉取：拉取期间缓存保持旧窗口，完成后整体替换"""
+    store = CandleStore(5)
+    store.update([[i * HOUR_MS, 1, 1, 1, 1, 1] for i in range(5)])
+    sizes = []
+    exchange = WindowExchange(now=100 * HOUR_MS, on_fetch=lambda: sizes.append(len(store)))
+
+    added = fetch_ohlcv_incremental(exchange, 'BTC/USDT:USDT', '1h', store)
+    assert sizes == [5]
+    assert added == 5
+    assert store.to_array()[:, 0].tolist() == [(96 + i) * HOUR_MS for i in range(5)]
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from aiohttp import WSMsgType, web
+
+import ws_feed
+from market_data import CandleStore
+from ws_feed import OKXMarketFeed
+
+HOUR_MS = 3600 * 1000
+CAPACITY = 10
+
+
+class StubWSServer:
+    """本地OKX WebSocket替身：/public和/business两个地址，记录订阅，可主动推送和断开连接"""
+
+    def __init__(self):
+        self.connections = {'public': [], 'business': []}
+        self.subscriptions = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner = None
+        self.base_url = None
+
+    async def _handle(self, request):
+        name = request.match_info['name']
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections[name].append(ws)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            if msg.data == 'ping':
+                await ws.send_str('pong')
+                continue
+            payload = json.loads(msg.data)
+            if payload.get('op') == 'subscribe':
+                arg = payload['args'][0]
+                await ws.send_json({'event': 'subscribe', 'arg': arg})
+                self.subscriptions.append((name, arg['channel'], arg['instId']))
+        return ws
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/ws/v5/{name}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"ws://127.0.0.1:{port}/ws/v5"
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(5)
+
+    def start(self):
+        self._thread.start()
+        self._call(self._start())
+
+    def push(self, name, channel, data):
+        """向该地址最新的连接推送一条OKX格式消息"""
+        ws = self.connections[name][-1]
+        self._call(ws.send_json({'arg': {'channel': channel, 'instId': 'BTC-USDT-SWAP'}, 'data': data}))
+
+    def drop(self, name):
+        """断开该地址的所有连接"""
+        for ws in self.connections[name]:
+            self._call(ws.close())
+
+    def stop(self):
+        for name in self.connections:
+            self.drop(name)
+        self._call(self._runner.cleanup())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class FakeExchange:
+    """REST补数据的交易所桩：now之前的每小时K线，收盘价为 100 + 序号"""
+
+    timeframes = {'1h': '1H'}
+
+    def __init__(self, now):
+        self.now = now
+        self.calls = []
+
+    def parse_timeframe(self, timeframe):
+        return 3600
+
+    def milliseconds(self):
+        return self.now
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append({'since': since, 'limit': limit})
+        last = self.now // HOUR_MS
+        indexes = list(range(last + 1))
+        if since is None:
+            indexes = indexes[-limit:]
+        else:
+            indexes = [i for i in indexes if i * HOUR_MS >= since][:limit]
+        return [[i * HOUR_MS, 100 + i, 101 + i, 99 + i, 100 + i, 1.0] for i in indexes]
+
+
+def candle(index, close, confirm='0'):
+    """OKX K线推送格式：字符串数组，第9个字段为confirm"""
+    return [str(index * HOUR_MS), str(close), str(close), str(close), str(close), '1', '1', '1', confirm]
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if condition():
+            return
+        time.sleep(0.02)
+    raise AssertionError("等待超时")
+
+
+@pytest.fixture
+def server():
+    stub = StubWSServer()
+    stub.start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def feed(server, monkeypatch):
+    monkeypatch.setattr(ws_feed, 'RECONNECT_MIN_DELAY', 0.1)
+    exchange = FakeExchange(now=20 * HOUR_MS + 30 * 60 * 1000)
+    closed = []
+    market_feed = OKXMarketFeed(exchange, 'BTC/USDT:USDT', 'BTC-USDT-SWAP', '1h', CandleStore(CAPACITY),
+                                on_candle_closed=closed.append,
+                                public_url=f"{server.base_url}/public",
+                                business_url=f"{server.base_url}/business")
+    market_feed.closed = closed
+    market_feed.start()
+    yield market_feed
+    market_feed.stop()
+
+
+def timestamps(store):
+    return [int(ts // HOUR_MS) for ts in store.to_array()[:, 0]]
+
+
+def test_subscribes_and_backfills_window(server, feed):
+    wait_for(feed.is_live)
+    assert ('business', 'candle1H', 'BTC-USDT-SWAP') in server.subscriptions
+    assert ('public', 'tickers', 'BTC-USDT-SWAP') in server.subscriptions
+    assert feed.exchange.calls == [{'since': None, 'limit': CAPACITY}]
+    assert timestamps(feed.store) == list(range(11, 21))
+
+
+def test_pushes_update_store_and_ticker(server, feed):
+    wait_for(lambda: len(server.subscriptions) == 2 and feed.is_live())
+
+    server.push('business', 'candle1H', [candle(20, 999)])
+    wait_for(lambda: feed.store.to_array()[-1, 4] == 999)
+    assert feed.closed == []
+
+    server.push('business', 'candle1H', [candle(20, 1000, confirm='1')])
+    wait_for(lambda: feed.closed == [20 * HOUR_MS])
+    assert feed.store.to_array()[-1, 4] == 1000
+
+    server.push('public', 'tickers', [{'last': '1001.5', 'bidPx': '1001', 'askPx': '1002', 'ts': '1'}])
+    wait_for(lambda: feed.get_last_price() == 1001.5)
+    assert feed.ticker['bid'] == 1001
+
+
+def test_reconnect_backfills_gap(server, feed):
+    wait_for(lambda: len(server.subscriptions) == 2 and feed.is_live())
+    server.push('business', 'candle1H', [candle(20, 1000, confirm='1'), candle(21, 500)])
+    wait_for(lambda: timestamps(feed.store)[-1] == 21)
+
+    # 断线期间交易所又走了3根K线
+    feed.exchange.now = 24 * HOUR_MS + 10 * 60 * 1000
+    server.drop('business')
+    wait_for(lambda: server.subscriptions.count(('business', 'candle1H', 'BTC-USDT-SWAP')) == 2)
+    wait_for(lambda: feed.is_live() and timestamps(feed.store)[-1] == 24)
+
+    # 从最新K线（含未收盘K线）开始补齐，REST数据替换断线前的未收盘K线
+    assert feed.exchange.calls[-1]['since'] == 21 * HOUR_MS
+    assert timestamps(feed.store) == list(range(15, 25))
+    closes = feed.store.to_array()[:, 4].tolist()
+    assert closes[timestamps(feed.store).index(20)] == 1000
+    assert closes[-4:] == [121, 122, 123, 124]
+
+    # 重连后的推送继续写入缓存，ticker连接不受影响
+    server.push('business', 'candle1H', [candle(24, 777)])
+    wait_for(lambda: feed.store.to_array()[-1, 4] == 777)
+    assert len(server.connections['public']) == 1
@@ -0,0 +1,229 @@
+"""
+交易周期耗时追踪（span）
+每个交易周期记录一条时间线：各阶段（嵌套）的开始时间和耗时，
+写入按大小轮转的JSONL文件，内存中保留最近N个周期，Web界面据此绘制瀑布图。
+
+    with tracer.cycle('trading_bot'):
+        with span('snapshot'):
+            ...
+
+    @traced()
+    def analyze(...): ...
+
+没有进行中的周期时span不做任何记录。线程池中执行的函数用bind()包装，
+即可作为提交时所在span的子span。
+"""
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+TIMELINE_FILE = os.path.join("data", "cycle_timeline.jsonl")  # data目录在Docker中已挂载
+TIMELINE_MAX_BYTES = 5 * 1024 * 1024  # 超过后轮转
+TIMELINE_BACKUP_COUNT = 3  # 保留的轮转文件数（cycle_timeline.jsonl.1 ...）
+RING_SIZE = 50  # 内存中保留的最近周期数
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class _Trace:
+    """一个周期内收集的span（多线程写入）"""
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = datetime.now().strftime(TIME_FORMAT)
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.root = None
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_record(self) -> Dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: (s['start'], s['depth']))
+        return {
+            'cycle': self.name,
+            'started_at': self.started_at,
+            'duration': self.root['duration'] if self.root else 0,
+            'attrs': self.attrs,
+            'spans': spans
+        }
+
+
+class Tracer:
+    """周期时间线记录器（同一时间只有一个进行中的周期）"""
+
+    def __init__(self, path: str = TIMELINE_FILE, max_bytes: int = TIMELINE_MAX_BYTES,
+                 backup_count: int = TIMELINE_BACKUP_COUNT, ring_size: int = RING_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.recent = deque(maxlen=ring_size)  # 最近周期的时间线（进程内）
+
+        self._trace = None
+        self._local = threading.local()  # 每个线程的span栈
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+
+    def _stack(self) -> List[Dict]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def cycle(self, name: str, **attrs):
+        """
+        记录一个周期：结束时把时间线写入文件和内存环形缓冲区
+
+        返回:
+            周期属性字典，可在周期内补充（如是否跳过）
+        """
+        trace = _Trace(name, attrs)
+        self._trace = trace
+        try:
+            with self.span(name):
+                yield trace.attrs
+        finally:
+            self._trace = None
+            record = trace.to_record()
+            self.recent.append(record)
+            self._write(record)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """记录代码块耗时（嵌套时为外层span的子span），返回span字典"""
+        trace = self._trace
+        if trace is None:
+            yield {}
+            return
+
+        stack = self._stack()
+        parent = stack[-1] if stack else trace.root
+        span = {
+            'id': next(self._ids),
+            'parent': parent['id'] if parent else None,
+            'name': name,
+            'depth': parent['depth'] + 1 if parent else 0,
+            'thread': threading.current_thread().name,
+            'start': round(time.perf_counter() - trace.origin, 6),
+        }
+        if attrs:
+            span['attrs'] = attrs
+        if trace.root is None:
+            trace.root = span
+
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span['error'] = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            span['duration'] = round(time.perf_counter() - started, 6)
+            stack.pop()
+            trace.add(span)
+
+    def traced(self, name: Optional[str] = None):
+        """函数装饰器：每次调用记录为一个span（默认以函数名命名）"""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def bind(self, func: Callable, name: Optional[str] = None) -> Callable:
+        """
+        包装提交到其他线程执行的函数，其中的span作为当前span的子span
+
+        参数:
+            name: 给出时整个调用记录为一个span（用于没有@traced的函数）
+        """
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            worker_stack = self._stack()
+            saved = list(worker_stack)
+            worker_stack[:] = [parent] if parent is not None else []
+            try:
+                if name is None:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+            finally:
+                worker_stack[:] = saved
+        return wrapper
+
+    def _write(self, record: Dict):
+        """追加一行时间线，超过大小上限时轮转"""
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+        try:
+            with self._write_lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except Exception as e:
+            print(f"写入周期时间线失败: {e}")
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def read_recent(path: str = TIMELINE_FILE, limit: int = RING_SIZE) -> List[Dict]:
+    """从时间线文件末尾读取最近limit个周期（时间正序），供其他进程（Web界面）使用"""
+    if not os.path.exists(path):
+        return []
+    block = 64 * 1024
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # 从文件末尾向前读取，直到包含足够的行
+        while position > 0 and data.count(b'\n') <= limit:
+            step = min(block, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+
+    records = []
+    for line in data.splitlines()[-limit:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # 截断的首行或写入中的末行
+    return records
+
+
+# 交易程序使用的默认记录器
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
+bind = tracer.bind
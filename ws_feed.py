@@ -0,0 +1,204 @@
+"""
+WebSocket行情模块 - 订阅OKX K线和ticker推送
+后台线程运行，推送的K线直接写入K线缓存，断线重连后通过REST补齐缺口
+"""
+import asyncio
+import json
+import threading
+import time
+
+import websockets
+
+from market_data import fetch_ohlcv_incremental
+
+OKX_WS_PUBLIC_URL = "wss://ws.okx.com:8443/ws/v5/public"
+OKX_WS_BUSINESS_URL = "wss://ws.okx.com:8443/ws/v5/business"  # K线频道在business地址
+
+PING_INTERVAL = 25  # OKX 30秒无消息会断开连接
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+TICKER_MAX_AGE = 10  # ticker超过该秒数视为过期
+CANDLE_MAX_AGE = 120  # 超过该秒数未收到K线推送视为不可用
+
+
+class OKXMarketFeed:
+    """OKX WebSocket行情订阅（K线 + ticker）"""
+
+    def __init__(self, exchange, symbol: str, inst_id: str, timeframe: str, store,
+                 on_candle_closed=None, public_url: str = OKX_WS_PUBLIC_URL,
+                 business_url: str = OKX_WS_BUSINESS_URL):
+        """
+        参数:
+            exchange: ccxt交易所实例，用于重连后的REST补数据
+            symbol: ccxt品种，如 BTC/USDT:USDT
+            inst_id: OKX品种ID，如 BTC-USDT-SWAP
+            timeframe: ccxt周期，如 1h
+            store: market_data.CandleStore
+            on_candle_closed: K线收盘回调 callback(timestamp_ms)，在推送线程中调用
+        """
+        self.exchange = exchange
+        self.symbol = symbol
+        self.inst_id = inst_id
+        self.timeframe = timeframe
+        self.store = store
+        self.on_candle_closed = on_candle_closed
+        self.public_url = public_url
+        self.business_url = business_url
+
+        # OKX K线频道名，如 candle1H
+        bar = getattr(exchange, 'timeframes', {}).get(timeframe, timeframe)
+        self.candle_channel = f"candle{bar}"
+
+        self.ticker = None
+        self.ticker_time = 0
+        self.candles_live = False  # K线连接正常且缺口已补齐
+        self.candle_time = 0
+        self.last_closed_timestamp = None
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._main_task = None
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+    def start(self):
+        """启动后台推送线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._thread_main, name="OKXMarketFeed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        """停止推送线程"""
+        self._stop.set()
+        if self._loop is not None and self._main_task is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._main_task.cancel)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+        if self._thread:
+            self._thread.join(timeout)
+
+    def is_live(self) -> bool:
+        """K线推送是否可用（可跳过REST拉取）"""
+        return (self.candles_live and not self._stop.is_set()
+                and time.time() - self.candle_time <= CANDLE_MAX_AGE)
+
+    def get_last_price(self):
+        """最新成交价，ticker过期时返回None"""
+        if self.ticker is None or time.time() - self.ticker_time > TICKER_MAX_AGE:
+            return None
+        return self.ticker.get('last')
+
+    # ------------------------------------------------------------------
+    # 推送处理
+    # ------------------------------------------------------------------
+    def _handle_candles(self, data):
+        self.candle_time = time.time()
+        for item in data:
+            row = [float(v) for v in item[:6]]
+            row[0] = int(item[0])
+            self.store.update([row])
+
+            # 第9个字段confirm=1表示K线已收盘
+            if len(item) > 8 and item[8] == '1' and row[0] != self.last_closed_timestamp:
+                self.last_closed_timestamp = row[0]
+                if self.on_candle_closed:
+                    try:
+                        self.on_candle_closed(row[0])
+                    except Exception as e:
+                        print(f"⚠️ K线收盘回调异常: {e}")
+
+    def _handle_tickers(self, data):
+        for item in data:
+            self.ticker = {
+                'last': float(item['last']),
+                'bid': float(item['bidPx']) if item.get('bidPx') else None,
+                'ask': float(item['askPx']) if item.get('askPx') else None,
+                'timestamp': int(item['ts']) if item.get('ts') else None,
+            }
+            self.ticker_time = time.time()
+
+    def _backfill(self):
+        """REST补齐断线期间的K线"""
+        added = fetch_ohlcv_incremental(self.exchange, self.symbol, self.timeframe, self.store)
+        if added:
+            print(f"🔁 WebSocket重连，REST补齐 {added} 根K线")
+
+    # ------------------------------------------------------------------
+    # 连接管理
+    # ------------------------------------------------------------------
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        self._main_task = self._loop.create_task(self._main())
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.candles_live = False
+            self._loop.close()
+
+    async def _main(self):
+        await asyncio.gather(
+            self._run_connection(self.business_url, self.candle_channel, self._handle_candles, backfill=True),
+            self._run_connection(self.public_url, 'tickers', self._handle_tickers),
+        )
+
+    async def _run_connection(self, url: str, channel: str, handler, backfill: bool = False):
+        """单个连接：订阅、接收、心跳，断线后指数退避重连"""
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(url, ping_interval=None, open_timeout=10) as ws:
+                    await ws.send(json.dumps({
+                        'op': 'subscribe',
+                        'args': [{'channel': channel, 'instId': self.inst_id}]
+                    }))
+
+                    if backfill:
+                        # 先订阅再补数据，避免订阅前的K线遗漏
+                        await asyncio.get_running_loop().run_in_executor(None, self._backfill)
+                        self.candle_time = time.time()
+                        self.candles_live = True
+
+                    delay = RECONNECT_MIN_DELAY
+                    await self._receive(ws, handler)
+
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"⚠️ WebSocket连接异常({channel}): {e}，{delay}秒后重连")
+            finally:
+                if backfill:
+                    self.candles_live = False
+
+            if self._stop.is_set():
+                break
+            await self._sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _receive(self, ws, handler):
+        while not self._stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=PING_INTERVAL)
+            except asyncio.TimeoutError:
+                await ws.send('ping')
+                continue
+
+            if message == 'pong':
+                continue
+
+            payload = json.loads(message)
+            if payload.get('event') == 'error':
+                raise ConnectionError(f"订阅失败: {payload.get('msg')}")
+            if 'data' in payload:
+                handler(payload['data'])
+
+    async def _sleep(self, seconds: float):
+        """可被stop打断的等待"""
+        end = time.time() + seconds
+        while not self._stop.is_set() and time.time() < end:
+            await asyncio.sleep(min(0.5, end - time.time()))